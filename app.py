@@ -1,13 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import functools
 import json
 import os
-import io
-import requests
-import shutil
-import re
+import time
 from datetime import datetime, timedelta
-from base64 import b64decode
+
+from sheet_cache import CACHE_DIR_NAME, close_workbooks, load_sheet, sheet_versions, typed_frame
+from sheet_schema import compact_frame
+from compliance import COMPLIANCE_DIR_NAME, ComplianceStore
+from metrics import TIMINGS, span
+from workbook_writer import LazySheets, save_sheets
+from record_store import open_store
+from sheet_pager import (
+    MIN_ALIASES, MAX_ALIASES, find_column,
+    filter_positions, page_count, page_positions, page_view, preview_view, merge_page_edits,
+)
+from row_index import InsertIndex
+from event_import import IMPORT_TYPES, read_events_file, validate_events
+from github_sync import (
+    FETCH_UPDATED, FETCH_UNCHANGED, fetch_url, fetch_via_api,
+    PushQueue, push_file, PUSH_PENDING, PUSH_RUNNING, PUSH_RETRYING, PUSH_FAILED, PUSH_DONE,
+)
+from session_store import SessionStore, LOGIN_ALREADY_ACTIVE, LOGIN_FULL
+from fleet_report import CARD_SHEET_RE, card_sheets, fleet_status, read_tonnages
+from service_due import FleetDue
+from report_export import EXPORT_FORMATS, available_formats, export_frame
+from machine_status import (
+    VIEW_OPTIONS, VIEW_CURRENT, VIEW_CUSTOM,
+    SliceIndex, EventIndex, compute_status, compliance_table, filter_compliance,
+)
 
 # محاولة استيراد PyGithub (لرفع التعديلات)
 try:
@@ -20,7 +43,7 @@ except Exception:
 # إعدادات عامة
 # ===============================
 USERS_FILE = "users.json"
-STATE_FILE = "state.json"
+SESSIONS_DB = "sessions.db"
 SESSION_DURATION = timedelta(minutes=10)  # مدة الجلسة 10 دقائق
 MAX_ACTIVE_USERS = 2  # أقصى عدد مستخدمين مسموح
 
@@ -31,6 +54,18 @@ FILE_PATH = "Machine_Service_Lookup.xlsx"
 LOCAL_FILE = "Machine_Service_Lookup.xlsx"
 GITHUB_EXCEL_URL = "https://github.com/mahmedabdallh123/input-data/raw/refs/heads/main/Machine_Service_Lookup.xlsx"
 
+# مخزن البيانات: "xlsx" (الملف نفسه) أو "sqlite" (فهارس + تعديل على مستوى الصف،
+# والملف يُصدّر منه للرفع إلى GitHub ويُستورد إليه بعد التحديث)
+STORAGE_BACKEND = os.environ.get("CMMS_STORAGE", "xlsx")
+DB_FILE = "Machine_Service_Lookup.db"
+
+# قياسات زمن المراحل: سجل JSONL + ملف Prometheus في هذا المجلد (فارغ = في الذاكرة فقط)
+METRICS_DIR = os.environ.get("CMMS_METRICS_DIR", "metrics")
+
+# جداول الامتثال تُبنى في الخلفية بعد تحميل الملف وتحديثه من GitHub والحفظ؛
+# 0 = بدون بناء مسبق (كل جدول يُبنى عند أول فحص للماكينة)
+COMPLIANCE_WARMUP = os.environ.get("CMMS_COMPLIANCE_WARMUP", "1") == "1"
+
 # -------------------------------
 # 🧩 دوال مساعدة للملفات والحالة
 # -------------------------------
@@ -59,64 +94,27 @@ def save_users(users):
         st.error(f"❌ خطأ في حفظ ملف users.json: {e}")
         return False
 
-def load_state():
-    if not os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, indent=4, ensure_ascii=False)
-        return {}
-    try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
-
-def save_state(state):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=4, ensure_ascii=False)
-
-def cleanup_sessions(state):
-    now = datetime.now()
-    changed = False
-    for user, info in list(state.items()):
-        if info.get("active") and "login_time" in info:
-            try:
-                login_time = datetime.fromisoformat(info["login_time"])
-                if now - login_time > SESSION_DURATION:
-                    info["active"] = False
-                    info.pop("login_time", None)
-                    changed = True
-            except:
-                info["active"] = False
-                changed = True
-    if changed:
-        save_state(state)
-    return state
-
-def remaining_time(state, username):
-    if not username or username not in state:
-        return None
-    info = state.get(username)
-    if not info or not info.get("active"):
-        return None
+@st.cache_resource(show_spinner=False)
+def get_timings():
+    """مسجل القياسات للعملية (يُضبط مجلده مرة واحدة)"""
     try:
-        lt = datetime.fromisoformat(info["login_time"])
-        remaining = SESSION_DURATION - (datetime.now() - lt)
-        if remaining.total_seconds() <= 0:
-            return None
-        return remaining
-    except:
-        return None
+        TIMINGS.configure(METRICS_DIR)
+    except OSError:
+        TIMINGS.configure(None)
+    return TIMINGS
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """جلسات المستخدمين (SQLite مشترك بين كل الجلسات)"""
+    return SessionStore(SESSIONS_DB, SESSION_DURATION)
 
 # -------------------------------
 # 🔐 تسجيل الخروج
 # -------------------------------
 def logout_action():
-    state = load_state()
     username = st.session_state.get("username")
-    if username and username in state:
-        state[username]["active"] = False
-        state[username].pop("login_time", None)
-        save_state(state)
+    if username:
+        get_session_store().logout(username)
     # احذف متغيرات الجلسة
     keys = list(st.session_state.keys())
     for k in keys:
@@ -128,7 +126,8 @@ def logout_action():
 # -------------------------------
 def login_ui():
     users = load_users()
-    state = cleanup_sessions(load_state())
+    store = get_session_store()
+    store.expire()
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
         st.session_state.username = None
@@ -139,23 +138,20 @@ def login_ui():
     username_input = st.selectbox("👤 اختر المستخدم", list(users.keys()))
     password = st.text_input("🔑 كلمة المرور", type="password")
 
-    active_users = [u for u, v in state.items() if v.get("active")]
-    active_count = len(active_users)
+    active_count = len(store.active_users())
     st.caption(f"🔒 المستخدمون النشطون الآن: {active_count} / {MAX_ACTIVE_USERS}")
 
     if not st.session_state.logged_in:
         if st.button("تسجيل الدخول"):
             if username_input in users and users[username_input]["password"] == password:
-                if username_input == "admin":
-                    pass
-                elif username_input in active_users:
+                # الفحص والتسجيل في معاملة واحدة (لا سباق بين دخولين متزامنين)
+                result = store.login(username_input, MAX_ACTIVE_USERS, force=username_input == "admin")
+                if result == LOGIN_ALREADY_ACTIVE:
                     st.warning("⚠ هذا المستخدم مسجل دخول بالفعل.")
                     return False
-                elif active_count >= MAX_ACTIVE_USERS:
+                elif result == LOGIN_FULL:
                     st.error("🚫 الحد الأقصى للمستخدمين المتصلين حالياً.")
                     return False
-                state[username_input] = {"active": True, "login_time": datetime.now().isoformat()}
-                save_state(state)
                 st.session_state.logged_in = True
                 st.session_state.username = username_input
                 st.success(f"✅ تم تسجيل الدخول: {username_input}")
@@ -166,7 +162,7 @@ def login_ui():
     else:
         username = st.session_state.username
         st.success(f"✅ مسجل الدخول كـ: {username}")
-        rem = remaining_time(state, username)
+        rem = get_session_store().remaining(username)
         if rem:
             mins, secs = divmod(int(rem.total_seconds()), 60)
             st.info(f"⏳ الوقت المتبقي: {mins:02d}:{secs:02d}")
@@ -180,19 +176,31 @@ def login_ui():
 # -------------------------------
 # 🔄 طرق جلب الملف من GitHub
 # -------------------------------
+def import_if_updated(status):
+    """مع مخزن SQLite: استيراد النسخة الجديدة من الملف"""
+    if status == FETCH_UPDATED:
+        close_workbooks(LOCAL_FILE)
+    if status == FETCH_UPDATED and use_sqlite():
+        with span("sqlite_import", bytes=os.path.getsize(LOCAL_FILE)):
+            get_record_store().import_workbook(LOCAL_FILE)
+    if status == FETCH_UPDATED:
+        warm_compliance()
+    return status
+
+def timed_fetch(method, fetch):
+    """span لتحميل الملف من GitHub (البايتات = حجم الملف إذا تغير)"""
+    with span("github_fetch", method=method) as info:
+        status = fetch()
+        info["status"] = status
+        info["bytes"] = os.path.getsize(LOCAL_FILE) if status == FETCH_UPDATED else 0
+    return status
+
 def fetch_from_github_requests():
-    """تحميل بإستخدام رابط RAW (requests)"""
+    """تحميل بإستخدام رابط RAW (requests) - فقط إذا تغير الملف على GitHub"""
     try:
-        response = requests.get(GITHUB_EXCEL_URL, stream=True, timeout=15)
-        response.raise_for_status()
-        with open(LOCAL_FILE, "wb") as f:
-            shutil.copyfileobj(response.raw, f)
-        # امسح الكاش
-        try:
-            st.cache_data.clear()
-        except:
-            pass
-        return True
+        # الكاش مرتبط ببصمة كل شيت، فالنسخة الجديدة تُحمّل تلقائياً
+        status = timed_fetch("raw", lambda: fetch_url(GITHUB_EXCEL_URL, LOCAL_FILE, timeout=15))
+        return import_if_updated(status)
     except Exception as e:
         st.error(f"⚠ فشل التحديث من GitHub: {e}")
         return False
@@ -203,155 +211,439 @@ def fetch_from_github_api():
         return fetch_from_github_requests()
     
     try:
-        token = st.secrets.get("github", {}).get("token", None)
+        token = github_token()
         if not token:
             return fetch_from_github_requests()
         
         g = Github(token)
         repo = g.get_repo(REPO_NAME)
-        file_content = repo.get_contents(FILE_PATH, ref=BRANCH)
-        content = b64decode(file_content.content)
-        with open(LOCAL_FILE, "wb") as f:
-            f.write(content)
-        try:
-            st.cache_data.clear()
-        except:
-            pass
-        return True
+        status = timed_fetch("api", lambda: fetch_via_api(repo, FILE_PATH, BRANCH, LOCAL_FILE))
+        return import_if_updated(status)
     except Exception as e:
         st.error(f"⚠ فشل تحميل الملف من GitHub: {e}")
         return False
 
 # -------------------------------
-# 📂 تحميل الشيتات (مخبأ) - معدل لقراءة جميع الشيتات
+# 📂 تحميل الشيتات (مخبأ لكل شيت حسب بصمته) - معدل لقراءة جميع الشيتات
 # -------------------------------
-@st.cache_data(show_spinner=False)
-def load_all_sheets():
-    """تحميل جميع الشيتات من ملف Excel"""
+# مفتاح الكاش = (اسم الشيت، بصمة محتواه): تعديل Card12 يغير بصمة Card12 فقط،
+# فيُعاد تحليله هو وفهرسه فقط دون مسح كاش باقي الشيتات
+SHEET_CACHE_ENTRIES = 512
+
+def use_sqlite():
+    return STORAGE_BACKEND == "sqlite"
+
+@st.cache_resource(show_spinner=False)
+def get_record_store():
+    """مخزن SQLite (يُستورد من ملف Excel عند أول تشغيل)"""
+    return open_store(DB_FILE, LOCAL_FILE)
+
+def current_sheet_versions():
+    """{اسم الشيت: بصمة} لنسخة البيانات الحالية"""
+    if use_sqlite():
+        try:
+            return dict(get_record_store().sheet_versions()) or None
+        except Exception:
+            return None
     if not os.path.exists(LOCAL_FILE):
         return None
-    
     try:
-        # قراءة جميع الشيتات
-        sheets = pd.read_excel(LOCAL_FILE, sheet_name=None)
-        
-        if not sheets:
-            return None
-        
-        # تنظيف أسماء الأعمدة لكل شيت
-        for name, df in sheets.items():
-            df.columns = df.columns.astype(str).str.strip()
-        
-        return sheets
-    except Exception as e:
+        return dict(sheet_versions(LOCAL_FILE, dtype=object))
+    except Exception:
         return None
 
-# نسخة مع dtype=object لواجهة التحرير
-@st.cache_data(show_spinner=False)
-def load_sheets_for_edit():
-    """تحميل جميع الشيتات للتحرير"""
-    if not os.path.exists(LOCAL_FILE):
+def read_raw_sheet(sheet_name, version):
+    """قراءة شيت واحد (dtype=object) - أساس عرض التحليل والتحرير"""
+    with span("load_sheet", sheet=sheet_name, backend=STORAGE_BACKEND) as info:
+        if use_sqlite():
+            df = get_record_store().read_sheet(sheet_name)
+        else:
+            df = load_sheet(LOCAL_FILE, sheet_name, version, dtype=object)
+        info["rows"] = len(df)
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=SHEET_CACHE_ENTRIES)
+def load_raw_sheet(sheet_name, version):
+    """النسخة الخام لواجهة التحرير (مخبأة)"""
+    return read_raw_sheet(sheet_name, version)
+
+@st.cache_data(show_spinner=False, max_entries=SHEET_CACHE_ENTRIES)
+def load_typed_sheet(sheet_name, version):
+    """شيت بأنواع أعمدة مستنتجة من النسخة الخام؛ شيتات Card{n} بالمخطط المضغوط
+
+    النسخة الخام لا تُخبأ هنا: جلسات العرض تحتفظ بالنسخة المضغوطة فقط.
+    """
+    df = typed_frame(read_raw_sheet(sheet_name, version))
+    return compact_frame(df) if CARD_SHEET_RE.match(sheet_name) else df
+
+def load_all_sheets():
+    """شيتات العرض (أنواع أعمدة مستنتجة): الأسماء فوراً، وكل شيت يُحلل عند أول طلب فقط
+
+    فحص ماكينة واحدة يحلل ServicePlan وشيت Card{n} الخاص بها فقط.
+    """
+    versions = current_sheet_versions()
+    if not versions:
         return None
-    
-    try:
-        # قراءة جميع الشيتات مع dtype=object للحفاظ على تنسيق البيانات
-        sheets = pd.read_excel(LOCAL_FILE, sheet_name=None, dtype=object)
-        
-        if not sheets:
-            return None
-        
-        # تنظيف أسماء الأعمدة لكل شيت
-        for name, df in sheets.items():
-            df.columns = df.columns.astype(str).str.strip()
-        
-        return sheets
-    except Exception as e:
+    return LazySheets(versions, lambda name: load_typed_sheet(name, versions[name]))
+
+def clear_sheet_caches():
+    """مسح كاش الشيتات والفهارس فقط (بدون باقي الكاش)"""
+    for fn in (load_raw_sheet, load_typed_sheet, build_slice_index, build_event_index):
+        fn.clear()
+    close_workbooks()
+
+# نسخة مع dtype=object لواجهة التحرير (تتبع الشيتات المعدلة لحفظها فقط)
+EDIT_MEMORY_BUDGET = 256 * 1024 * 1024  # حد الشيتات غير المعدلة المحملة في جلسة التحرير
+
+def load_sheets_for_edit():
+    """شيتات التحرير: كل شيت يُحمّل عند أول استخدام فقط"""
+    versions = current_sheet_versions()
+    if not versions:
         return None
+    return LazySheets(versions, lambda name: load_raw_sheet(name, versions[name]), EDIT_MEMORY_BUDGET)
 
 # -------------------------------
-# 🔁 حفظ محلي + رفع على GitHub + مسح الكاش + إعادة تحميل
+# 🔁 حفظ محلي + رفع على GitHub (في الخلفية) + إعادة تحميل
 # -------------------------------
+PUSH_DEBOUNCE_SECONDS = 3  # التعديلات المتتالية خلال هذه المدة تُرفع في commit واحد
+
+def github_token():
+    """توكن GitHub من secrets، أو None إذا لم يوجد (بدون ملف secrets.toml يرفع st.secrets خطأ)"""
+    try:
+        return st.secrets.get("github", {}).get("token", None)
+    except FileNotFoundError:  # StreamlitSecretNotFoundError
+        return None
+
+def github_pusher(token, store, timings):
+    """دالة الرفع لخيط الطابور: المخزن ومسجل القياسات يُمرران من خيط الصفحة (لا Streamlit داخل الخيط)"""
+    def push(message):
+        if store is not None:
+            store.export_workbook(LOCAL_FILE)
+        with timings.span("github_push", bytes=os.path.getsize(LOCAL_FILE)) as info:
+            repo = Github(token).get_repo(REPO_NAME)
+            info["pushed"] = push_file(repo, FILE_PATH, BRANCH, LOCAL_FILE, message)
+    return push
+
+@st.cache_resource(show_spinner=False)
+def get_push_queue(token):
+    """طابور رفع واحد للعملية كلها (مشترك بين كل الجلسات)"""
+    store = get_record_store() if use_sqlite() else None
+    return PushQueue(github_pusher(token, store, get_timings()), debounce=PUSH_DEBOUNCE_SECONDS)
+
+def write_sheets(sheets_dict):
+    """حفظ الشيتات المعدلة فقط في المخزن المختار"""
+    saved = set(getattr(sheets_dict, "dirty", sheets_dict.keys()))
+    if use_sqlite():
+        get_record_store().save_sheets(sheets_dict)
+    else:
+        save_sheets(LOCAL_FILE, sheets_dict)
+        close_workbooks(LOCAL_FILE)
+    warm_compliance(saved)
+
 def save_local_excel_and_push(sheets_dict, commit_message="Update from Streamlit"):
-    # احفظ محلياً
+    # احفظ محلياً (الشيتات المعدلة فقط)
+    dirty = getattr(sheets_dict, "dirty", None)
+    if dirty is None:
+        dirty = set(sheets_dict.keys())
     try:
-        with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-            for name, sh in sheets_dict.items():
-                try:
-                    sh.to_excel(writer, sheet_name=name, index=False)
-                except Exception:
-                    sh.astype(object).to_excel(writer, sheet_name=name, index=False)
+        with span("save_local_excel_and_push", backend=STORAGE_BACKEND, sheets=len(dirty)) as info:
+            info["rows"] = sum(len(sheets_dict[name]) for name in dirty if name in sheets_dict)
+            write_sheets(sheets_dict)
+            info["bytes"] = os.path.getsize(LOCAL_FILE) if not use_sqlite() else 0
     except Exception as e:
         st.error(f"⚠ خطأ أثناء الحفظ المحلي: {e}")
         return load_sheets_for_edit()
 
-    # امسح الكاش
-    try:
-        st.cache_data.clear()
-    except:
-        pass
+    # الرفع عبر PyGithub token في secrets يتم في الخلفية؛ الواجهة لا تنتظر الشبكة
+    token = github_token()
+    if token and GITHUB_AVAILABLE:
+        get_push_queue(token).submit(commit_message)
+        st.session_state["push_queued"] = True
 
-    # حاول الرفع عبر PyGithub token في secrets
-    token = st.secrets.get("github", {}).get("token", None)
-    if not token:
-        return load_sheets_for_edit()
+    return load_sheets_for_edit()
 
-    if not GITHUB_AVAILABLE:
-        return load_sheets_for_edit()
+def push_status_ui():
+    """عرض حالة الرفع إلى GitHub في الشريط الجانبي (للمسؤول أو بعد رفع من هذه الجلسة)"""
+    if st.session_state.get("username") != "admin" and not st.session_state.get("push_queued"):
+        return
+    token = github_token()
+    if not token or not GITHUB_AVAILABLE:
+        return
+    status = get_push_queue(token).status()
+    state = status["state"]
+    if state == PUSH_PENDING:
+        st.info(f"⏳ في انتظار الرفع إلى GitHub ({status['pending']} تعديل)")
+    elif state == PUSH_RUNNING:
+        st.info("⬆ جاري الرفع إلى GitHub...")
+    elif state == PUSH_RETRYING:
+        wait = max(0, int(status["next_retry"] - time.time()))
+        st.warning(f"⚠ فشل الرفع (محاولة {status['attempts']}) - إعادة بعد {wait} ث: {status['last_error']}")
+    elif state == PUSH_FAILED:
+        st.error(f"❌ فشل الرفع إلى GitHub: {status['last_error']} - سيُعاد مع الحفظ التالي")
+    elif state == PUSH_DONE:
+        pushed_at = datetime.fromtimestamp(status["last_push"]).strftime("%H:%M:%S")
+        st.caption(f"✅ آخر رفع إلى GitHub: {pushed_at}")
 
-    try:
-        g = Github(token)
-        repo = g.get_repo(REPO_NAME)
-        with open(LOCAL_FILE, "rb") as f:
-            content = f.read()
+# -------------------------------
+# ➕ إدراج الأحداث بفهرس مرتب (بحث ثنائي بدلاً من مسح الشيت)
+# -------------------------------
+@st.cache_resource(show_spinner=False)
+def get_insert_indexes():
+    """sheet -> (نسخة الشيت، InsertIndex) مشترك بين الجلسات"""
+    return {}
+
+def insert_events(sheets, sheet_name, rows):
+    """إدراج دفعة أحداث rows في الشيت، كل صف في موضعه، في مرور واحد (بدون حفظ)
+
+    يرجع (plan, index) أو None إذا لم يكن في الشيت أعمدة Min_Tones/Max_Tones.
+    الحفظ مرة واحدة بعدها ثم keep_insert_index لإعادة استخدام الفهرس.
+    """
+    # pop: الفهرس يُعدّل في مكانه، فلا تستخدمه جلستان معاً
+    cached = get_insert_indexes().pop(sheet_name, None)
+    if cached is not None and cached[0] == (current_sheet_versions() or {}).get(sheet_name) and sheet_name not in sheets.dirty:
+        index = cached[1]
+    else:
+        index = InsertIndex(sheets[sheet_name].reset_index(drop=True))
+    if not index.ready:
+        return None
+    plan = index.plan(rows)
+    sheets.insert_many(sheet_name, plan)
+    index.apply(plan)
+    return plan, index
 
-        try:
-            contents = repo.get_contents(FILE_PATH, ref=BRANCH)
-            repo.update_file(path=FILE_PATH, message=commit_message, content=content, sha=contents.sha, branch=BRANCH)
-        except Exception:
-            # حاول رفع كملف جديد أو إنشاء
-            try:
-                repo.create_file(path=FILE_PATH, message=commit_message, content=content, branch=BRANCH)
-            except Exception:
-                return load_sheets_for_edit()
+def keep_insert_index(sheets, sheet_name, index):
+    """بعد حفظ ناجح: الفهرس المحدث يطابق النسخة المحفوظة من الشيت"""
+    version = (current_sheet_versions() or {}).get(sheet_name)
+    if sheet_name not in sheets.dirty and version is not None:
+        get_insert_indexes()[sheet_name] = (version, index)
 
-        return load_sheets_for_edit()
-    except Exception:
-        return load_sheets_for_edit()
+# -------------------------------
+# ⏰ جدول الاستحقاق لكل الماكينات (يُحدّث مع كل إضافة/حذف)
+# -------------------------------
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_fleet_due(plan_version):
+    return FleetDue(build_slice_index(plan_version))
+
+def fleet_due():
+    """جدول الاستحقاق بنسخة البيانات الحالية (يعيد حساب الماكينات المتغيرة فقط)"""
+    versions = current_sheet_versions()
+    if not versions or "ServicePlan" not in versions:
+        return None
+    due = get_fleet_due(versions["ServicePlan"])
+    names = dict(card_sheets(versions))
+    due.sync({num: versions[name] for num, name in names.items()},
+             lambda num: load_typed_sheet(names[num], versions[names[num]]))
+    return due
+
+def update_fleet_due(sheets, sheet_name, old_version, added=None, removed=None):
+    """بعد حفظ ناجح: تطبيق الصفوف المضافة/المحذوفة نفسها على جدول الاستحقاق"""
+    match = CARD_SHEET_RE.match(str(sheet_name).strip())
+    if match is None or sheet_name in sheets.dirty:
+        return
+    versions = current_sheet_versions() or {}
+    if "ServicePlan" in versions:
+        get_fleet_due(versions["ServicePlan"]).update(
+            int(match.group(1)), old_version, versions.get(sheet_name), added=added, removed=removed
+        )
 
 # -------------------------------
 # 🧰 دوال مساعدة للمعالجة والنصوص
 # -------------------------------
-def normalize_name(s):
-    if s is None: return ""
-    s = str(s).replace("\n", "+")
-    s = re.sub(r"[^0-9a-zA-Z\u0600-\u06FF\+\s_/.-]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip().lower()
-    return s
-
-def split_needed_services(needed_service_str):
-    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
-        return []
-    parts = re.split(r"\+|,|\n|;", needed_service_str)
-    return [p.strip() for p in parts if p.strip() != ""]
-
-def highlight_cell(val, col_name):
-    color_map = {
-        "Service Needed": "background-color: #fff3cd; color:#856404; font-weight:bold;",
-        "Service Done": "background-color: #d4edda; color:#155724; font-weight:bold;",
-        "Service Didn't Done": "background-color: #f8d7da; color:#721c24; font-weight:bold;",
-        "Date": "background-color: #e7f1ff; color:#004085; font-weight:bold;",
-        "Tones": "background-color: #e8f8f5; color:#0d5c4a; font-weight:bold;",
-        "Min_Tons": "background-color: #ebf5fb; color:#154360; font-weight:bold;",
-        "Max_Tons": "background-color: #f9ebea; color:#641e16; font-weight:bold;",
-        "Event": "background-color: #e2f0d9; color:#2e6f32; font-weight:bold;",
-        "Correction": "background-color: #fdebd0; color:#7d6608; font-weight:bold;",
-        "Servised by": "background-color: #f0f0f0; color:#333; font-weight:bold;",
-        "Card Number": "background-color: #ebdef0; color:#4a235a; font-weight:bold;"
-    }
-    return color_map.get(col_name, "")
-
-def style_table(row):
-    return [highlight_cell(row[col], col) for col in row.index]
+COLOR_MAP = {
+    "Service Needed": "background-color: #fff3cd; color:#856404; font-weight:bold;",
+    "Service Done": "background-color: #d4edda; color:#155724; font-weight:bold;",
+    "Service Didn't Done": "background-color: #f8d7da; color:#721c24; font-weight:bold;",
+    "Date": "background-color: #e7f1ff; color:#004085; font-weight:bold;",
+    "Tones": "background-color: #e8f8f5; color:#0d5c4a; font-weight:bold;",
+    "Min_Tons": "background-color: #ebf5fb; color:#154360; font-weight:bold;",
+    "Max_Tons": "background-color: #f9ebea; color:#641e16; font-weight:bold;",
+    "Event": "background-color: #e2f0d9; color:#2e6f32; font-weight:bold;",
+    "Correction": "background-color: #fdebd0; color:#7d6608; font-weight:bold;",
+    "Servised by": "background-color: #f0f0f0; color:#333; font-weight:bold;",
+    "Card Number": "background-color: #ebdef0; color:#4a235a; font-weight:bold;"
+}
+# فوق هذا العدد من الصفوف يُعرض الجدول بدون ألوان (زمن رسم الألوان يكبر مع عدد الخلايا)
+STYLE_MAX_ROWS = int(os.environ.get("CMMS_STYLE_MAX_ROWS", 2000))
+
+STATUS_TABLE_CSS = """
+.cmms-status-wrap { max-height: 600px; overflow: auto; }
+.cmms-status { border-collapse: collapse; width: 100%; font-size: 0.9rem; }
+.cmms-status th, .cmms-status td { border: 1px solid #ddd; padding: 4px 8px; text-align: left; }
+.cmms-status th { position: sticky; top: 0; background: #fafafa; }
+"""
+
+def status_css(columns):
+    """لون كل عمود كقاعدة CSS واحدة (nth-child): حجمها بعدد الأعمدة لا بعدد الخلايا"""
+    return "\n".join(
+        f".cmms-status td:nth-child({i + 1}) {{ {COLOR_MAP[col]} }}"
+        for i, col in enumerate(columns) if col in COLOR_MAP
+    )
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def status_table_html(query, rows, _df):
+    """HTML الجدول الملون؛ مفتاحه الاستعلام (نسخ الشيتات ونطاق العرض) وعدد الصفوف فلا يُعاد بناؤه لنفس النتيجة"""
+    with span("style_render", rows=rows, cells=rows * len(_df.columns)) as info:
+        table = _df.to_html(index=False, border=0, classes="cmms-status", na_rep="-")
+        html = f"<style>{STATUS_TABLE_CSS}{status_css(tuple(_df.columns))}</style><div class='cmms-status-wrap'>{table}</div>"
+        info["bytes"] = len(html)
+    return html
+
+def show_status_table(df, query):
+    """عرض جدول النتائج: HTML ملون مخبأ حسب الاستعلام، أو بدون ألوان للجداول الكبيرة"""
+    colored = any(col in COLOR_MAP for col in df.columns)
+    if len(df) > STYLE_MAX_ROWS or not colored:
+        st.dataframe(df, use_container_width=True)
+        if colored:
+            st.caption(f"ℹ الألوان معطلة للجداول الأكبر من {STYLE_MAX_ROWS} صف لتسريع العرض.")
+        return
+    st.html(status_table_html(query, len(df), df))
+
+# -------------------------------
+# 📐 فهارس الشرائح والأحداث (تُبنى مرة لكل شيت)
+# -------------------------------
+@st.cache_data(show_spinner=False, max_entries=SHEET_CACHE_ENTRIES)
+def build_slice_index(version):
+    return SliceIndex(load_typed_sheet("ServicePlan", version))
+
+@st.cache_data(show_spinner=False, max_entries=SHEET_CACHE_ENTRIES)
+def build_event_index(sheet_name, version, min_tons=None, max_tons=None):
+    """فهرس أحداث الشيت؛ مع SQLite تُقرأ فقط الأحداث المتقاطعة مع [min_tons, max_tons]"""
+    if use_sqlite() and min_tons is not None:
+        with span("sqlite_range", sheet=sheet_name) as info:
+            events = range_events(get_record_store(), sheet_name, min_tons, max_tons)
+            info["rows"] = len(events)
+        return EventIndex(events)
+    return EventIndex(load_typed_sheet(sheet_name, version))
+
+def event_span(slice_index, slice_pos):
+    """(min_tons, max_tons) يغطي كل أحداث الشرائح المختارة (Max فارغ = بلا حد كما في EventIndex.join)"""
+    mins, maxs = slice_index.mins[slice_pos], slice_index.maxs[slice_pos]
+    has_min = ~np.isnan(mins)
+    if not has_min.any():
+        return float("inf"), float("-inf")
+    return float(mins[has_min].min()), float(np.nan_to_num(maxs[has_min], nan=np.inf).max())
+
+def range_events(store, sheet_name, min_tons, max_tons):
+    """استعلام نطاق مفهرس في مخزن SQLite -> أحداث بأنواع الشيت كاملاً (مخطط مضغوط)"""
+    events = store.read_events(sheet_name, min_tons, max_tons)
+    return compact_frame(typed_frame(events, store.sheet_dtypes(sheet_name)))
+
+# -------------------------------
+# 📋 جداول الامتثال (تُحسب مرة لكل نسخة وتُحفظ بجوار ملف Excel)
+# -------------------------------
+@st.cache_resource(show_spinner=False)
+def get_compliance_store():
+    return ComplianceStore(os.path.join(os.path.dirname(os.path.abspath(LOCAL_FILE)), CACHE_DIR_NAME, COMPLIANCE_DIR_NAME))
+
+def build_compliance(card_num, sheet_name, card_version, plan_version):
+    with span("compliance_table", card=card_num) as info:
+        table = compliance_table(card_num, build_slice_index(plan_version), build_event_index(sheet_name, card_version))
+        info["rows"] = len(table)
+    return table
+
+def card_compliance(card_num, sheet_name, card_version, plan_version):
+    """جدول الامتثال الكامل للماكينة (ذاكرة -> ملف -> حساب)"""
+    return get_compliance_store().get(
+        ComplianceStore.key(card_num, card_version, plan_version),
+        functools.partial(build_compliance, card_num, sheet_name, card_version, plan_version),
+    )
+
+def machine_status(card_num, plan_version, card_version, view_option, current_tons, min_range, max_range):
+    """نتائج الفحص لنطاق العرض (None إذا لا توجد شرائح مطابقة)
+
+    جدول الامتثال الجاهز يُفلتر فقط. مع SQLite قبل جاهزيته: استعلام نطاق مفهرس
+    لأحداث الشرائح المختارة فقط بدلاً من قراءة الشيت كاملاً.
+    """
+    slice_index = build_slice_index(plan_version)
+    sheet_name = f"Card{card_num}"
+    if use_sqlite():
+        table = get_compliance_store().peek(ComplianceStore.key(card_num, card_version, plan_version))
+        if table is None:
+            slice_pos = slice_index.select(view_option, current_tons, min_range, max_range)
+            if len(slice_pos) == 0:
+                return None
+            event_index = build_event_index(sheet_name, card_version, *event_span(slice_index, slice_pos))
+            return compute_status(card_num, slice_index, event_index, view_option, current_tons, min_range, max_range)
+    else:
+        table = card_compliance(card_num, sheet_name, card_version, plan_version)
+    return filter_compliance(table, slice_index, view_option, current_tons, min_range, max_range)
+
+def compliance_builder(card_num, sheet_name, card_version, plan_version):
+    """نفس build_compliance بدوال عادية (بدون كاش Streamlit) للبناء في خيط بالخلفية"""
+    store = get_record_store() if use_sqlite() else None
+    timings = get_timings()
+
+    def typed(name, version):
+        raw = store.read_sheet(name) if store is not None else load_sheet(LOCAL_FILE, name, version, dtype=object)
+        df = typed_frame(raw)
+        return compact_frame(df) if CARD_SHEET_RE.match(name) else df
+
+    def build():
+        with timings.span("compliance_table", card=card_num, warmup=True) as info:
+            slice_index = SliceIndex(typed("ServicePlan", plan_version))
+            if store is not None:
+                # مع SQLite: أحداث نطاق ServicePlan فقط عبر فهرس (card, Min_Tones, Max_Tones)
+                events = range_events(store, sheet_name, *event_span(slice_index, np.arange(len(slice_index.df))))
+            else:
+                events = typed(sheet_name, card_version)
+            table = compliance_table(card_num, slice_index, EventIndex(events))
+            info["rows"] = len(table)
+        return table
+    return build
+
+def warm_compliance(sheet_names=None):
+    """بناء جداول الامتثال لنسخة البيانات الحالية في الخلفية (إذا فُعّل COMPLIANCE_WARMUP)
+
+    sheet_names: الشيتات المحفوظة للتو فقط؛ None = كل الماكينات (بعد التحميل أو التحديث).
+    """
+    if not COMPLIANCE_WARMUP:
+        return
+    versions = current_sheet_versions()
+    if not versions or "ServicePlan" not in versions:
+        return
+    plan_version = versions["ServicePlan"]
+    get_compliance_store().warm({
+        ComplianceStore.key(card_num, versions[name], plan_version):
+            compliance_builder(card_num, name, versions[name], plan_version)
+        for card_num, name in card_sheets(versions) if sheet_names is None or name in sheet_names
+    })
+
+# -------------------------------
+# 📄 عرض الشيت على صفحات (فلترة + صفحة واحدة فقط تُرسل للمتصفح)
+# -------------------------------
+PAGE_SIZES = [50, 100, 250, 500]
+
+def sheet_page_ui(df, key):
+    """فلاتر (الماكينة، نطاق الأطنان، التاريخ) + اختيار الصفحة؛ يرجع صفحة العرض (index = رقم الصف)"""
+    with st.expander("🔎 فلترة", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            card = st.text_input("الماكينة (card):", key=f"{key}_card")
+        with col2:
+            tons_from = st.number_input("من (طن):", min_value=0, step=100, value=None, key=f"{key}_tons_from")
+        with col3:
+            tons_to = st.number_input("إلى (طن):", min_value=0, step=100, value=None, key=f"{key}_tons_to")
+        col4, col5 = st.columns(2)
+        with col4:
+            date_from = st.date_input("من تاريخ:", value=None, key=f"{key}_date_from")
+        with col5:
+            date_to = st.date_input("إلى تاريخ:", value=None, key=f"{key}_date_to")
+
+    positions = filter_positions(df, card.strip() or None, tons_from, tons_to, date_from, date_to)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("عدد الصفوف في الصفحة:", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    pages = page_count(len(positions), page_size)
+    # الفلتر قد يقلل عدد الصفحات: الصفحة المحفوظة من قبل تُقص قبل إنشاء الحقل
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    with col2:
+        page = st.number_input(f"الصفحة (من {pages}):", min_value=1, max_value=pages, step=1, key=page_key)
+    st.caption(f"📄 {len(positions)} صف مطابق من {len(df)}")
+
+    return page_view(df, page_positions(positions, page, page_size))
 
 # -------------------------------
 # 🖥 دالة فحص الماكينة - معدلة لعرض جميع الأحداث
@@ -365,137 +657,117 @@ def check_machine_status(card_num, current_tons, all_sheets):
         st.error("❌ الملف لا يحتوي على شيت ServicePlan.")
         return
     
-    service_plan_df = all_sheets["ServicePlan"]
     card_sheet_name = f"Card{card_num}"
     
     if card_sheet_name not in all_sheets:
         st.warning(f"⚠ لا يوجد شيت باسم {card_sheet_name}")
         return
     
-    card_df = all_sheets[card_sheet_name]
+    versions = current_sheet_versions()
 
     # نطاق العرض
     if "view_option" not in st.session_state:
-        st.session_state.view_option = "الشريحة الحالية فقط"
+        st.session_state.view_option = VIEW_CURRENT
 
     st.subheader("⚙ نطاق العرض")
     view_option = st.radio(
         "اختر نطاق العرض:",
-        ("الشريحة الحالية فقط", "كل الشرائح الأقل", "كل الشرائح الأعلى", "نطاق مخصص", "كل الشرائح"),
+        VIEW_OPTIONS,
         horizontal=True,
         key="view_option"
     )
 
     min_range = st.session_state.get("min_range", max(0, current_tons - 500))
     max_range = st.session_state.get("max_range", current_tons + 500)
-    if view_option == "نطاق مخصص":
+    if view_option == VIEW_CUSTOM:
         col1, col2 = st.columns(2)
         with col1:
             min_range = st.number_input("من (طن):", min_value=0, step=100, value=min_range, key="min_range")
         with col2:
             max_range = st.number_input("إلى (طن):", min_value=min_range, step=100, value=max_range, key="max_range")
 
-    # اختيار الشرائح
-    if view_option == "الشريحة الحالية فقط":
-        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] <= current_tons) & (service_plan_df["Max_Tones"] >= current_tons)]
-    elif view_option == "كل الشرائح الأقل":
-        selected_slices = service_plan_df[service_plan_df["Max_Tones"] <= current_tons]
-    elif view_option == "كل الشرائح الأعلى":
-        selected_slices = service_plan_df[service_plan_df["Min_Tones"] >= current_tons]
-    elif view_option == "نطاق مخصص":
-        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] >= min_range) & (service_plan_df["Max_Tones"] <= max_range)]
-    else:
-        selected_slices = service_plan_df.copy()
+    # نطاق العرض = فلترة جدول الامتثال المحسوب مسبقاً حسب الشرائح المختارة
+    with span("check_machine_status", card=card_num, view=view_option) as info:
+        result_df = machine_status(
+            card_num, versions["ServicePlan"], versions[card_sheet_name],
+            view_option, current_tons, min_range, max_range,
+        )
+        info["rows"] = 0 if result_df is None else len(result_df)
 
-    if selected_slices.empty:
+    if result_df is None:
         st.warning("⚠ لا توجد شرائح مطابقة حسب النطاق المحدد.")
         return
 
-    all_results = []
-    for _, current_slice in selected_slices.iterrows():
-        slice_min = current_slice["Min_Tones"]
-        slice_max = current_slice["Max_Tones"]
-        needed_service_raw = current_slice.get("Service", "")
-        needed_parts = split_needed_services(needed_service_raw)
-        needed_norm = [normalize_name(p) for p in needed_parts]
-
-        mask = (card_df.get("Min_Tones", 0).fillna(0) <= slice_max) & (card_df.get("Max_Tones", 0).fillna(0) >= slice_min)
-        matching_rows = card_df[mask]
-
-        if not matching_rows.empty:
-            # نمر على كل صف (حدث) في الصفوف المطابقة
-            for _, row in matching_rows.iterrows():
-                done_services_set = set()
-                
-                # تحديد الأعمدة التي تحتوي على خدمات منجزة
-                ignore_cols = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
-                for col in matching_rows.columns:
-                    if col not in ignore_cols:
-                        val = str(row.get(col, "")).strip()
-                        if val and val.lower() not in ["nan", "none", ""]:
-                            done_services_set.add(col)
-
-                # جمع بيانات الحدث
-                current_date = str(row.get("Date", "")).strip() if pd.notna(row.get("Date")) else "-"
-                current_tones = str(row.get("Tones", "")).strip() if pd.notna(row.get("Tones")) else "-"
-                current_other = str(row.get("Other", "")).strip() if pd.notna(row.get("Other")) else "-"
-                current_servised_by = str(row.get("Servised by", "")).strip() if pd.notna(row.get("Servised by")) else "-"
-                current_event = str(row.get("Event", "")).strip() if pd.notna(row.get("Event")) else "-"
-                current_correction = str(row.get("Correction", "")).strip() if pd.notna(row.get("Correction")) else "-"
-
-                done_services = sorted(list(done_services_set))
-                done_norm = [normalize_name(c) for c in done_services]
-                not_done = [orig for orig, n in zip(needed_parts, needed_norm) if n not in done_norm]
-
-                all_results.append({
-                    "Card Number": card_num,
-                    "Min_Tons": slice_min,
-                    "Max_Tons": slice_max,
-                    "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
-                    "Service Done": ", ".join(done_services) if done_services else "-",
-                    "Service Didn't Done": ", ".join(not_done) if not_done else "-",
-                    "Tones": current_tones,
-                    "Event": current_event,
-                    "Correction": current_correction,
-                    "Servised by": current_servised_by,
-                    "Date": current_date
-                })
-        else:
-            # إذا لم توجد أحداث، نضيف سجل للشريحة بدون خدمات منجزة
-            all_results.append({
-                "Card Number": card_num,
-                "Min_Tons": slice_min,
-                "Max_Tons": slice_max,
-                "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
-                "Service Done": "-",
-                "Service Didn't Done": ", ".join(needed_parts) if needed_parts else "-",
-                "Tones": "-",
-                "Event": "-",
-                "Correction": "-",
-                "Servised by": "-",
-                "Date": "-"
-            })
-
-    result_df = pd.DataFrame(all_results).dropna(how="all").reset_index(drop=True)
-
+    query = (card_num, versions["ServicePlan"], versions[card_sheet_name], view_option, current_tons, min_range, max_range)
     st.markdown("### 📋 نتائج الفحص - جميع الأحداث")
-    st.dataframe(result_df.style.apply(style_table, axis=1), use_container_width=True)
+    show_status_table(result_df, query)
 
-    # تنزيل النتائج
-    buffer = io.BytesIO()
-    result_df.to_excel(buffer, index=False, engine="openpyxl")
+    # تنزيل النتائج: الملف يُبنى عند الضغط فقط (ومخبأ حسب الاستعلام)
+    download_ui(lambda fmt: export_status(*query, fmt), f"Service_Report_Card{card_num}", key="status_export")
+
+# -------------------------------
+# 💾 تصدير النتائج (عند الطلب فقط)
+# -------------------------------
+@st.cache_data(show_spinner=False, max_entries=32)
+def export_status(card_num, plan_version, card_version, view_option, current_tons, min_range, max_range, fmt):
+    """ملف نتائج الفحص؛ المفتاح هو الاستعلام ونسخ الشيتات (لا يُعاد بناؤه لنفس الاستعلام)"""
+    result_df = machine_status(card_num, plan_version, card_version, view_option, current_tons, min_range, max_range)
+    return timed_export(result_df, fmt, "Service Report")
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def export_report(df, fmt, sheet_name):
+    return timed_export(df, fmt, sheet_name)
+
+def timed_export(df, fmt, sheet_name):
+    with span("export", fmt=fmt, rows=len(df)) as info:
+        data = export_frame(df, fmt, sheet_name)
+        info["bytes"] = len(data)
+    return data
+
+def download_ui(build, file_stem, key):
+    """اختيار الصيغة + زر تنزيل؛ build(fmt) تُستدعى فقط عند الضغط على الزر"""
+    fmt = st.radio("صيغة الملف:", available_formats(), horizontal=True, key=f"{key}_fmt")
+    ext, mime = EXPORT_FORMATS[fmt]
     st.download_button(
-        label="💾 حفظ النتائج كـ Excel",
-        data=buffer.getvalue(),
-        file_name=f"Service_Report_Card{card_num}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        label=f"💾 حفظ النتائج كـ {fmt.upper()}",
+        data=lambda: build(fmt),
+        file_name=f"{file_stem}.{ext}",
+        mime=mime,
+        key=f"{key}_btn",
     )
 
+# -------------------------------
+# 📈 التشخيص: زمن كل مرحلة (للمسؤول فقط)
+# -------------------------------
+def diagnostics_ui():
+    timings = get_timings()
+    with st.expander("📈 التشخيص (زمن المراحل)", expanded=False):
+        summary = timings.summary()
+        if summary.empty:
+            st.caption("لا توجد قياسات بعد.")
+            return
+        st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+        st.caption("p50/p95 من آخر القياسات لكل مرحلة منذ بدء التشغيل.")
+        st.dataframe(timings.recent(20), use_container_width=True, hide_index=True)
+        if timings.directory:
+            st.caption(f"📄 السجل والمقاييس في: {os.path.abspath(timings.directory)}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "⬇ Prometheus", data=timings.prometheus, file_name="cmms.prom",
+                mime="text/plain", key="metrics_prom",
+            )
+        with col2:
+            if st.button("🗑 تصفير القياسات", key="metrics_reset"):
+                timings.reset()
+                st.rerun()
+
 # -------------------------------
 # 🖥 الواجهة الرئيسية المدمجة
 # -------------------------------
 # إعداد الصفحة
 st.set_page_config(page_title="CMMS - Bail Yarn", layout="wide")
+get_timings()
 
 # شريط تسجيل الدخول / معلومات الجلسة في الشريط الجانبي
 with st.sidebar:
@@ -504,25 +776,29 @@ with st.sidebar:
         if not login_ui():
             st.stop()
     else:
-        state = cleanup_sessions(load_state())
         username = st.session_state.username
-        rem = remaining_time(state, username)
+        rem = get_session_store().remaining(username)
         if rem:
             mins, secs = divmod(int(rem.total_seconds()), 60)
             st.success(f"👋 {username} | ⏳ {mins:02d}:{secs:02d}")
         else:
             logout_action()
 
+    push_status_ui()
+
     st.markdown("---")
     st.write("🔧 أدوات:")
     if st.button("🔄 تحديث الملف من GitHub"):
-        if fetch_from_github_requests():
+        fetch_status = fetch_from_github_requests()
+        if fetch_status == FETCH_UPDATED:
             st.rerun()
+        elif fetch_status == FETCH_UNCHANGED:
+            st.info("✅ الملف المحلي مطابق لآخر نسخة على GitHub.")
     
     # زر مسح الكاش
     if st.button("🗑 مسح الكاش"):
         try:
-            st.cache_data.clear()
+            clear_sheet_caches()
             st.rerun()
         except Exception as e:
             st.error(f"❌ خطأ في مسح الكاش: {e}")
@@ -534,9 +810,8 @@ with st.sidebar:
 
 # تحميل الشيتات (عرض وتحليل)
 all_sheets = load_all_sheets()
-
-# تحميل الشيتات للتحرير (dtype=object)
-sheets_edit = load_sheets_for_edit()
+# جداول الامتثال لنسخة البيانات الحالية تُبنى في الخلفية (الجاهز منها يُتجاهل)
+warm_compliance()
 
 # واجهة التبويبات الرئيسية
 st.title("🏭 CMMS - Bail Yarn")
@@ -545,6 +820,13 @@ st.title("🏭 CMMS - Bail Yarn")
 username = st.session_state.get("username")
 is_admin = username == "admin"
 
+if is_admin:
+    with st.sidebar:
+        diagnostics_ui()
+
+# تحميل الشيتات للتحرير (dtype=object) - للمسؤول فقط
+sheets_edit = load_sheets_for_edit() if is_admin else None
+
 # تحديد التبويبات بناءً على نوع المستخدم
 if is_admin:
     tabs = st.tabs(["📊 عرض وفحص الماكينات", "🛠 تعديل وإدارة البيانات", "👥 إدارة المستخدمين", "📞 الدعم الفني"])
@@ -572,6 +854,66 @@ with tabs[0]:
         if st.session_state.get("show_results", False):
             check_machine_status(card_num, current_tons, all_sheets)
 
+        # -------------------------------
+        # 📋 تقرير حالة كل الماكينات
+        # -------------------------------
+        st.markdown("---")
+        with st.expander("📋 تقرير حالة كل الماكينات"):
+            tons_source = st.radio(
+                "مصدر الأطنان الحالية:",
+                ("شيت Machine", "رفع ملف (CSV / Excel)"),
+                horizontal=True,
+                key="fleet_tons_source"
+            )
+            tons_df = None
+            if tons_source == "شيت Machine":
+                tons_df = all_sheets.get("Machine")
+                if tons_df is None:
+                    st.warning("⚠ الملف لا يحتوي على شيت Machine.")
+            else:
+                uploaded = st.file_uploader("ملف الأطنان (أعمدة: card, Current_Tones)", type=["csv", "xlsx"], key="fleet_tons_file")
+                if uploaded is not None:
+                    if uploaded.name.lower().endswith(".csv"):
+                        tons_df = pd.read_csv(uploaded)
+                    else:
+                        tons_df = pd.read_excel(uploaded)
+
+            if st.button("📋 إنشاء التقرير", key="fleet_report_btn"):
+                try:
+                    with st.spinner("جاري فحص كل الماكينات..."):
+                        st.session_state["fleet_report"] = fleet_status(all_sheets, read_tonnages(tons_df))
+                except Exception as e:
+                    st.error(f"❌ تعذر إنشاء التقرير: {e}")
+
+            fleet_df = st.session_state.get("fleet_report")
+            if fleet_df is not None:
+                st.dataframe(fleet_df, use_container_width=True)
+                download_ui(lambda fmt: export_report(fleet_df, fmt, "Fleet Status"), "Fleet_Service_Report", key="fleet_export")
+
+        # -------------------------------
+        # ⏰ الماكينات المستحقة قريباً (بحث في جدول الاستحقاق، بدون فحص كل ماكينة)
+        # -------------------------------
+        due_expander = st.expander("⏰ الماكينات المستحقة قريباً", key="due_expander", on_change="rerun")
+        with due_expander:
+            if due_expander.open:
+                due = fleet_due()
+                if due is None:
+                    st.warning("⚠ الملف لا يحتوي على شيت ServicePlan.")
+                else:
+                    window = st.number_input("التنبيه قبل الخدمة التالية بـ (طن):", min_value=0, step=100, value=500, key="due_window")
+                    try:
+                        tonnages = read_tonnages(all_sheets.get("Machine"))
+                    except ValueError as e:
+                        st.warning(f"⚠ شيت Machine: {e}")
+                        tonnages = {}
+                    if tonnages:
+                        due_df = due.due_soon(tonnages, window)
+                        st.caption(f"🔔 {len(due_df)} ماكينة متأخرة أو مستحقة خلال {window} طن")
+                    else:
+                        due_df = due.table()
+                        st.caption("ℹ لا توجد أطنان حالية (شيت Machine)؛ عرض جدول الاستحقاق لكل الماكينات.")
+                    st.dataframe(due_df, use_container_width=True)
+
 # -------------------------------
 # Tab: تعديل وإدارة البيانات - للمسؤول فقط
 # -------------------------------
@@ -580,241 +922,232 @@ if is_admin and len(tabs) > 1:
         st.header("🛠 تعديل وإدارة البيانات")
 
         # تحقق صلاحية الرفع
-        token_exists = bool(st.secrets.get("github", {}).get("token", None))
+        token_exists = bool(github_token())
         can_push = token_exists and GITHUB_AVAILABLE
 
         if sheets_edit is None:
             st.warning("❗ الملف المحلي غير موجود. اضغط تحديث من GitHub في الشريط الجانبي أولًا.")
         else:
-            tab1, tab2, tab3, tab4 = st.tabs([
+            # on_change="rerun": فقط محتوى التبويب المفتوح يُنفذ (ويحمّل شيته)
+            tab1, tab2, tab3, tab4, tab5 = st.tabs([
                 "عرض وتعديل شيت",
                 "إضافة صف جديد",
                 "إضافة عمود جديد",
-                "🗑 حذف صف"
-            ])
+                "🗑 حذف صف",
+                "📥 استيراد أحداث"
+            ], key="edit_tabs", on_change="rerun")
 
             # -------------------------------
             # Tab 1: تعديل بيانات وعرض
             # -------------------------------
             with tab1:
-                st.subheader("✏ تعديل البيانات")
-                sheet_name = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="edit_sheet")
-                df = sheets_edit[sheet_name].astype(str)
-
-                edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True)
-
-                if st.button("💾 حفظ التعديلات", key=f"save_edit_{sheet_name}"):
-                    if not can_push:
-                        st.warning("🚫 لا تملك صلاحية الرفع إلى GitHub من هذه الجلسة.")
-                    else:
-                        sheets_edit[sheet_name] = edited_df.astype(object)
-                        new_sheets = save_local_excel_and_push(
-                            sheets_edit,
-                            commit_message=f"Edit sheet {sheet_name} by {st.session_state.get('username')}"
-                        )
-                        if isinstance(new_sheets, dict):
-                            sheets_edit = new_sheets
-                        st.dataframe(sheets_edit[sheet_name])
+                if tab1.open:
+                    st.subheader("✏ تعديل البيانات")
+                    sheet_name = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="edit_sheet")
+                    page_df = sheet_page_ui(sheets_edit[sheet_name], key=f"edit_{sheet_name}")
+
+                    # محرر للصفحة الحالية فقط؛ التعديلات تُطبق على الشيت كاملاً برقم الصف
+                    edited_df = st.data_editor(
+                        page_df, num_rows="dynamic", use_container_width=True,
+                        key=f"editor_{sheet_name}_{int(pd.util.hash_pandas_object(page_df).sum())}",
+                    )
+
+                    if st.button("💾 حفظ التعديلات", key=f"save_edit_{sheet_name}"):
+                        merged_df = merge_page_edits(sheets_edit[sheet_name], page_df, edited_df)
+                        if not can_push:
+                            st.warning("🚫 لا تملك صلاحية الرفع إلى GitHub من هذه الجلسة.")
+                        elif merged_df is None:
+                            st.info("لا توجد تعديلات للحفظ.")
+                        else:
+                            sheets_edit[sheet_name] = merged_df
+                            new_sheets = save_local_excel_and_push(
+                                sheets_edit,
+                                commit_message=f"Edit sheet {sheet_name} by {st.session_state.get('username')}"
+                            )
+                            if isinstance(new_sheets, dict):
+                                sheets_edit = new_sheets
+                            st.success("✅ تم حفظ التعديلات.")
 
             # -------------------------------
             # Tab 2: إضافة صف جديد (أحداث متعددة بنفس الرينج)
             # -------------------------------
             with tab2:
-                st.subheader("➕ إضافة صف جديد")
-                sheet_name_add = st.selectbox("اختر الشيت لإضافة صف:", list(sheets_edit.keys()), key="add_sheet")
-                df_add = sheets_edit[sheet_name_add].astype(str).reset_index(drop=True)
+                if tab2.open:
+                    st.subheader("➕ إضافة صف جديد")
+                    sheet_name_add = st.selectbox("اختر الشيت لإضافة صف:", list(sheets_edit.keys()), key="add_sheet")
+                    # نسخة كسولة (copy-on-write): لا تحويل للنصوص إلا للأعمدة المستخدمة عند الإضافة
+                    df_add = sheets_edit[sheet_name_add].reset_index(drop=True)
                 
-                st.markdown("أدخل بيانات الحدث:")
-
-                new_data = {}
-                cols = st.columns(3)
-                for i, col in enumerate(df_add.columns):
-                    with cols[i % 3]:
-                        new_data[col] = st.text_input(f"{col}", key=f"add_{sheet_name_add}_{col}")
-
-                if st.button("💾 إضافة الصف الجديد", key=f"add_row_{sheet_name_add}"):
-
-                    new_row_df = pd.DataFrame([new_data]).astype(str)
-
-                    # البحث عن أعمدة الرينج
-                    min_col, max_col, card_col = None, None, None
-                    for c in df_add.columns:
-                        c_low = c.strip().lower()
-                        if c_low in ("min_tones", "min_tone", "min tones", "min"):
-                            min_col = c
-                        if c_low in ("max_tones", "max_tone", "max tones", "max"):
-                            max_col = c
-                        if c_low in ("card", "machine", "machine_no", "machine id"):
-                            card_col = c
-
-                    if not min_col or not max_col:
-                        st.error("⚠ لم يتم العثور على أعمدة Min_Tones و/أو Max_Tones في الشيت.")
-                    else:
-                        def to_num_or_none(x):
-                            try:
-                                return float(x)
-                            except:
-                                return None
-
-                        new_min_raw = str(new_data.get(min_col, "")).strip()
-                        new_max_raw = str(new_data.get(max_col, "")).strip()
-                        new_min_num = to_num_or_none(new_min_raw)
-                        new_max_num = to_num_or_none(new_max_raw)
-
-                        # البحث عن موضع الإدراج
-                        insert_pos = len(df_add)
-                        mask = pd.Series([False] * len(df_add))
-
-                        if card_col:
-                            new_card = str(new_data.get(card_col, "")).strip()
-                            if new_card != "":
-                                if new_min_num is not None and new_max_num is not None:
-                                    mask = (
-                                        (df_add[card_col].astype(str).str.strip() == new_card) &
-                                        (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
-                                        (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
-                                    )
-                                else:
-                                    mask = (
-                                        (df_add[card_col].astype(str).str.strip() == new_card) &
-                                        (df_add[min_col].astype(str).str.strip() == new_min_raw) &
-                                        (df_add[max_col].astype(str).str.strip() == new_max_raw)
-                                    )
-                        else:
-                            if new_min_num is not None and new_max_num is not None:
-                                mask = (
-                                    (pd.to-numeric(df_add[min_col], errors='coerce') == new_min_num) &
-                                    (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
-                                )
-                            else:
-                                mask = (
-                                    (df_add[min_col].astype(str).str.strip() == new_min_raw) &
-                                    (df_add[max_col].astype(str).str.strip() == new_max_raw)
-                                )
+                    st.markdown("أدخل بيانات الحدث:")
 
-                        if mask.any():
-                            insert_pos = mask[mask].index[-1] + 1
-                        else:
-                            try:
-                                df_add["_min_num"] = pd.to_numeric(df_add[min_col], errors='coerce').fillna(-1)
-                                if new_min_num is not None:
-                                    insert_pos = int((df_add["_min_num"] < new_min_num).sum())
-                                else:
-                                    insert_pos = len(df_add)
-                                df_add = df_add.drop(columns=["_min_num"])
-                            except Exception:
-                                insert_pos = len(df_add)
+                    new_data = {}
+                    cols = st.columns(3)
+                    for i, col in enumerate(df_add.columns):
+                        with cols[i % 3]:
+                            new_data[col] = st.text_input(f"{col}", key=f"add_{sheet_name_add}_{col}")
 
-                        df_top = df_add.iloc[:insert_pos].reset_index(drop=True)
-                        df_bottom = df_add.iloc[insert_pos:].reset_index(drop=True)
-                        df_new = pd.concat(
-                            [df_top, new_row_df.reset_index(drop=True), df_bottom],
-                            ignore_index=True
-                        )
+                    if st.button("💾 إضافة الصف الجديد", key=f"add_row_{sheet_name_add}"):
 
-                        sheets_edit[sheet_name_add] = df_new.astype(object)
+                        new_row_df = pd.DataFrame([new_data]).astype(str)
+                        new_min_raw = str(new_data.get(find_column(df_add, MIN_ALIASES), "")).strip()
+                        new_max_raw = str(new_data.get(find_column(df_add, MAX_ALIASES), "")).strip()
 
-                        if not can_push:
-                            st.warning("🚫 لا تملك صلاحية الرفع (التغييرات ستبقى محلياً).")
-                            # فقط اكتب الملف محلياً
-                            with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                for name, sh in sheets_edit.items():
-                                    try:
-                                        sh.to_excel(writer, sheet_name=name, index=False)
-                                    except:
-                                        sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                            st.dataframe(sheets_edit[sheet_name_add])
+                        # موضع الإدراج ببحث ثنائي في فهرس الشيت (إدراج على مستوى الصف)
+                        version_before = (current_sheet_versions() or {}).get(sheet_name_add)
+                        placed = insert_events(sheets_edit, sheet_name_add, new_row_df)
+                        if placed is None:
+                            st.error("⚠ لم يتم العثور على أعمدة Min_Tones و/أو Max_Tones في الشيت.")
                         else:
-                            new_sheets = save_local_excel_and_push(
-                                sheets_edit,
-                                commit_message=f"Add new row under range {new_min_raw}-{new_max_raw} in {sheet_name_add} by {st.session_state.get('username')}"
-                            )
-                            if isinstance(new_sheets, dict):
-                                sheets_edit = new_sheets
-                            st.dataframe(sheets_edit[sheet_name_add])
+                            plan, index = placed
+                            insert_pos = plan[0][0]
+                            saved_sheets = sheets_edit
+
+                            if not can_push:
+                                st.warning("🚫 لا تملك صلاحية الرفع (التغييرات ستبقى محلياً).")
+                                # فقط اكتب الملف محلياً
+                                write_sheets(sheets_edit)
+                                st.dataframe(preview_view(sheets_edit[sheet_name_add], insert_pos))
+                            else:
+                                new_sheets = save_local_excel_and_push(
+                                    sheets_edit,
+                                    commit_message=f"Add new row under range {new_min_raw}-{new_max_raw} in {sheet_name_add} by {st.session_state.get('username')}"
+                                )
+                                if isinstance(new_sheets, dict):
+                                    sheets_edit = new_sheets
+                                st.dataframe(preview_view(sheets_edit[sheet_name_add], insert_pos))
+                            keep_insert_index(saved_sheets, sheet_name_add, index)
+                            update_fleet_due(saved_sheets, sheet_name_add, version_before, added=new_row_df)
 
             # -------------------------------
             # Tab 3: إضافة عمود جديد
             # -------------------------------
             with tab3:
-                st.subheader("🆕 إضافة عمود جديد")
-                sheet_name_col = st.selectbox("اختر الشيت لإضافة عمود:", list(sheets_edit.keys()), key="add_col_sheet")
-                df_col = sheets_edit[sheet_name_col].astype(str)
-                
-                new_col_name = st.text_input("اسم العمود الجديد:")
-                default_value = st.text_input("القيمة الافتراضية لكل الصفوف (اختياري):", "")
-
-                if st.button("💾 إضافة العمود الجديد", key=f"add_col_{sheet_name_col}"):
-                    if new_col_name:
-                        df_col[new_col_name] = default_value
-                        sheets_edit[sheet_name_col] = df_col.astype(object)
-                        if not can_push:
-                            # حفظ محليًا فقط
-                            with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                for name, sh in sheets_edit.items():
-                                    try:
-                                        sh.to_excel(writer, sheet_name=name, index=False)
-                                    except:
-                                        sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                            st.dataframe(sheets_edit[sheet_name_col])
+                if tab3.open:
+                    st.subheader("🆕 إضافة عمود جديد")
+                    sheet_name_col = st.selectbox("اختر الشيت لإضافة عمود:", list(sheets_edit.keys()), key="add_col_sheet")
+
+                    new_col_name = st.text_input("اسم العمود الجديد:")
+                    default_value = st.text_input("القيمة الافتراضية لكل الصفوف (اختياري):", "")
+
+                    if st.button("💾 إضافة العمود الجديد", key=f"add_col_{sheet_name_col}"):
+                        if new_col_name:
+                            # copy-on-write: العمود الجديد فقط يُنشأ، باقي الأعمدة مشتركة مع الأصل
+                            df_col = sheets_edit[sheet_name_col].copy()
+                            df_col[new_col_name] = default_value
+                            sheets_edit[sheet_name_col] = df_col
+                            if not can_push:
+                                # حفظ محليًا فقط
+                                write_sheets(sheets_edit)
+                                st.dataframe(preview_view(sheets_edit[sheet_name_col], 0))
+                            else:
+                                new_sheets = save_local_excel_and_push(
+                                    sheets_edit,
+                                    commit_message=f"Add new column '{new_col_name}' to {sheet_name_col} by {st.session_state.get('username')}"
+                                )
+                                if isinstance(new_sheets, dict):
+                                    sheets_edit = new_sheets
+                                st.dataframe(preview_view(sheets_edit[sheet_name_col], 0))
                         else:
-                            new_sheets = save_local_excel_and_push(
-                                sheets_edit,
-                                commit_message=f"Add new column '{new_col_name}' to {sheet_name_col} by {st.session_state.get('username')}"
-                            )
-                            if isinstance(new_sheets, dict):
-                                sheets_edit = new_sheets
-                            st.dataframe(sheets_edit[sheet_name_col])
-                    else:
-                        st.warning("⚠ الرجاء إدخال اسم العمود الجديد.")
+                            st.warning("⚠ الرجاء إدخال اسم العمود الجديد.")
 
             # -------------------------------
             # Tab 4: حذف صف
             # -------------------------------
             with tab4:
-                st.subheader("🗑 حذف صف من الشيت")
-                sheet_name_del = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="delete_sheet")
-                df_del = sheets_edit[sheet_name_del].astype(str).reset_index(drop=True)
-
-                st.markdown("### 📋 بيانات الشيت الحالية")
-                st.dataframe(df_del, use_container_width=True)
-
-                st.markdown("### ✏ اختر الصفوف التي تريد حذفها")
-                rows_to_delete = st.text_input("أدخل أرقام الصفوف مفصولة بفاصلة (مثلاً: 0,2,5):")
-                confirm_delete = st.checkbox("✅ أؤكد أني أريد حذف هذه الصفوف بشكل نهائي")
-
-                if st.button("🗑 تنفيذ الحذف", key=f"delete_rows_{sheet_name_del}"):
-                    if not rows_to_delete.strip():
-                        st.warning("⚠ الرجاء إدخال رقم الصف أو أكثر.")
-                    elif not confirm_delete:
-                        st.warning("⚠ برجاء تأكيد الحذف أولاً.")
-                    else:
+                if tab4.open:
+                    st.subheader("🗑 حذف صف من الشيت")
+                    sheet_name_del = st.selectbox("اختر الشيت:", list(sheets_edit.keys()), key="delete_sheet")
+                    df_del = sheets_edit[sheet_name_del]
+
+                    st.markdown("### 📋 بيانات الشيت الحالية")
+                    st.dataframe(sheet_page_ui(df_del, key=f"delete_{sheet_name_del}"), use_container_width=True)
+
+                    st.markdown("### ✏ اختر الصفوف التي تريد حذفها")
+                    rows_to_delete = st.text_input("أدخل أرقام الصفوف مفصولة بفاصلة (مثلاً: 0,2,5):")
+                    confirm_delete = st.checkbox("✅ أؤكد أني أريد حذف هذه الصفوف بشكل نهائي")
+
+                    if st.button("🗑 تنفيذ الحذف", key=f"delete_rows_{sheet_name_del}"):
+                        if not rows_to_delete.strip():
+                            st.warning("⚠ الرجاء إدخال رقم الصف أو أكثر.")
+                        elif not confirm_delete:
+                            st.warning("⚠ برجاء تأكيد الحذف أولاً.")
+                        else:
+                            try:
+                                rows_list = [int(x.strip()) for x in rows_to_delete.split(",") if x.strip().isdigit()]
+                                rows_list = [r for r in rows_list if 0 <= r < len(df_del)]
+
+                                if not rows_list:
+                                    st.warning("⚠ لم يتم العثور على صفوف صحيحة.")
+                                else:
+                                    version_before = (current_sheet_versions() or {}).get(sheet_name_del)
+                                    removed_rows = df_del.iloc[sorted(set(rows_list))]
+                                    sheets_edit.delete_rows(sheet_name_del, rows_list)
+                                    saved_sheets = sheets_edit
+
+                                    if not can_push:
+                                        # حفظ محليًا فقط
+                                        write_sheets(sheets_edit)
+                                        st.dataframe(preview_view(sheets_edit[sheet_name_del], min(rows_list)))
+                                    else:
+                                        new_sheets = save_local_excel_and_push(sheets_edit, commit_message=f"Delete rows {rows_list} from {sheet_name_del} by {st.session_state.get('username')}")
+                                        if isinstance(new_sheets, dict):
+                                            sheets_edit = new_sheets
+                                        st.dataframe(preview_view(sheets_edit[sheet_name_del], min(rows_list)))
+                                    update_fleet_due(saved_sheets, sheet_name_del, version_before, removed=removed_rows)
+                            except Exception as e:
+                                st.error(f"حدث خطأ أثناء الحذف: {e}")
+
+            # -------------------------------
+            # Tab 5: استيراد أحداث من ملف
+            # -------------------------------
+            with tab5:
+                if tab5.open:
+                    st.subheader("📥 استيراد أحداث من ملف")
+                    st.caption("كل صف حدث لكارت: عمود card وأعمدة شيت الكارت (Min_Tones, Max_Tones, ...). كل الأحداث تُحفظ وتُرفع مرة واحدة.")
+                    uploaded = st.file_uploader("اختر ملف CSV أو Excel:", type=list(IMPORT_TYPES), key="import_file")
+
+                    if uploaded is not None:
                         try:
-                            rows_list = [int(x.strip()) for x in rows_to_delete.split(",") if x.strip().isdigit()]
-                            rows_list = [r for r in rows_list if 0 <= r < len(df_del)]
+                            events = read_events_file(uploaded.getvalue(), uploaded.name)
+                            batches, import_errors = validate_events(events, sheets_edit)
+                        except ValueError as e:
+                            st.error(f"⚠ {e}")
+                        else:
+                            valid_count = sum(len(rows) for rows in batches.values())
+                            st.info(f"✅ {valid_count} حدث صالح في {len(batches)} شيت — ❌ {len(import_errors)} صف به أخطاء")
+                            if len(import_errors):
+                                st.dataframe(import_errors, use_container_width=True)
+                                st.download_button(
+                                    label="💾 تنزيل تقرير الأخطاء",
+                                    data=export_frame(import_errors, "csv"),
+                                    file_name="import_errors.csv",
+                                    mime=EXPORT_FORMATS["csv"][1],
+                                    key="import_errors_btn",
+                                )
 
-                            if not rows_list:
-                                st.warning("⚠ لم يتم العثور على صفوف صحيحة.")
-                            else:
-                                df_new = df_del.drop(rows_list).reset_index(drop=True)
-                                sheets_edit[sheet_name_del] = df_new.astype(object)
+                            if st.session_state.get("imported_file") == uploaded.file_id:
+                                st.success("✅ تم استيراد هذا الملف.")
+                            elif valid_count and st.button(f"📥 استيراد {valid_count} حدث", key="import_events"):
+                                # كل الأحداث في مرور واحد لكل شيت، ثم حفظ واحد ورفع واحد
+                                versions_before = current_sheet_versions() or {}
+                                placed = {name: insert_events(sheets_edit, name, rows) for name, rows in batches.items()}
+                                saved_sheets = sheets_edit
+                                commit_message = f"Import {valid_count} events into {len(batches)} sheets by {st.session_state.get('username')}"
 
                                 if not can_push:
-                                    # حفظ محليًا فقط
-                                    with pd.ExcelWriter(LOCAL_FILE, engine="openpyxl") as writer:
-                                        for name, sh in sheets_edit.items():
-                                            try:
-                                                sh.to_excel(writer, sheet_name=name, index=False)
-                                            except:
-                                                sh.astype(object).to_excel(writer, sheet_name=name, index=False)
-                                    st.dataframe(sheets_edit[sheet_name_del])
+                                    st.warning("🚫 لا تملك صلاحية الرفع (التغييرات ستبقى محلياً).")
+                                    write_sheets(sheets_edit)
                                 else:
-                                    new_sheets = save_local_excel_and_push(sheets_edit, commit_message=f"Delete rows {rows_list} from {sheet_name_del} by {st.session_state.get('username')}")
+                                    new_sheets = save_local_excel_and_push(sheets_edit, commit_message=commit_message)
                                     if isinstance(new_sheets, dict):
                                         sheets_edit = new_sheets
-                                    st.dataframe(sheets_edit[sheet_name_del])
-                        except Exception as e:
-                            st.error(f"حدث خطأ أثناء الحذف: {e}")
+                                for name, (plan, index) in placed.items():
+                                    keep_insert_index(saved_sheets, name, index)
+                                    update_fleet_due(saved_sheets, name, versions_before.get(name), added=batches[name])
+
+                                if not saved_sheets.dirty:
+                                    st.session_state["imported_file"] = uploaded.file_id
+                                    st.success(f"✅ تم استيراد {valid_count} حدث إلى: {', '.join(sorted(batches))}")
 
 # -------------------------------
 # Tab: إدارة المستخدمين - للمسؤول فقط
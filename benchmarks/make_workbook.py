@@ -0,0 +1,88 @@
+"""توليد ملف Excel تجريبي بنفس شكل Machine_Service_Lookup.xlsx
+
+مثال:
+    python benchmarks/make_workbook.py out.xlsx --cards 100 --events 2000 --services 12
+"""
+import argparse
+import os
+import random
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workbook_writer import write_workbook  # noqa: E402
+
+SLICE_WIDTH = 150
+MARK = "✔"
+TECHNICIANS = ["محمد عبدالله", "ENG:ZAKRIA", "HOSSAM"]
+
+
+def service_names(n):
+    return [f"service {i + 1}({'X' if i % 2 == 0 else 'o'})" for i in range(n)]
+
+
+def make_service_plan(services, slices, rng):
+    rows = []
+    for i in range(slices):
+        needed = rng.sample(services, rng.randint(1, min(4, len(services))))
+        rows.append({
+            "Min_Tones": i * SLICE_WIDTH + (1 if i else 0),
+            "Max_Tones": (i + 1) * SLICE_WIDTH,
+            "Service": "+".join(needed),
+        })
+    return pd.DataFrame(rows)
+
+
+def make_card(card_num, services, events, slices, rng):
+    rows = []
+    for _ in range(events):
+        s = rng.randrange(slices)
+        row = {
+            "card": card_num,
+            "Min_Tones": s * SLICE_WIDTH + (1 if s else 0),
+            "Max_Tones": (s + 1) * SLICE_WIDTH,
+            "Tones": s * SLICE_WIDTH + rng.randint(1, SLICE_WIDTH),
+        }
+        for svc in services:
+            row[svc] = MARK if rng.random() < 0.3 else None
+        row["Date"] = f"{rng.randint(1, 28)}\\{rng.randint(1, 12)}\\{rng.randint(2023, 2026)}"
+        row["Other"] = None
+        row["Servised by"] = rng.choice(TECHNICIANS) if rng.random() < 0.5 else None
+        row["Event"] = "صيانة دورية" if rng.random() < 0.2 else None
+        row["Correction"] = None
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    return df.sort_values(["Min_Tones", "Max_Tones"], kind="stable").reset_index(drop=True)
+
+
+def make_sheets(cards=24, events=50, services=8, slices=11, seed=0):
+    """الشيتات كـ dict: ServicePlan + Machine + Card{n}"""
+    rng = random.Random(seed)
+    names = service_names(services)
+    sheets = {"ServicePlan": make_service_plan(names, slices, rng)}
+    sheets["Machine"] = pd.DataFrame({
+        "card": range(1, cards + 1),
+        "Current_Tones": [rng.randint(0, slices * SLICE_WIDTH) for _ in range(cards)],
+    })
+    for n in range(1, cards + 1):
+        sheets[f"Card{n}"] = make_card(n, names, events, slices, rng)
+    return sheets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد ملف Excel تجريبي للقياس.")
+    parser.add_argument("output")
+    parser.add_argument("--cards", type=int, default=24)
+    parser.add_argument("--events", type=int, default=50, help="عدد الأحداث في كل شيت Card")
+    parser.add_argument("--services", type=int, default=8)
+    parser.add_argument("--slices", type=int, default=11, help="عدد شرائح ServicePlan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_workbook(args.output, make_sheets(args.cards, args.events, args.services, args.slices, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
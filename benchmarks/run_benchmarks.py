@@ -0,0 +1,221 @@
+"""قياس زمن المراحل الأساسية على ملف تجريبي وتسجيل النتائج لاكتشاف التراجع
+
+مثال:
+    python benchmarks/run_benchmarks.py --cards 100 --events 2000
+    python benchmarks/run_benchmarks.py --workbook Machine_Service_Lookup.xlsx --fail-on-regression
+
+كل تشغيل يُضاف إلى benchmarks/results.jsonl، ويُقارن كل قياس بآخر قياس بنفس
+الإعدادات؛ الأبطأ بأكثر من --threshold يُطبع كتراجع.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from machine_status import (  # noqa: E402
+    VIEW_OPTIONS, VIEW_ALL, SliceIndex, EventIndex, compute_status, compliance_table, filter_compliance,
+)
+from sheet_cache import CACHE_DIR_NAME, load_sheet, read_workbook, sheet_versions, typed_frame, typed_view  # noqa: E402
+from workbook_writer import save_sheets, write_workbook, TrackedSheets  # noqa: E402
+from make_workbook import make_sheets  # noqa: E402
+from report_export import export_frame  # noqa: E402
+
+DEFAULT_RESULTS = os.path.join(ROOT, "benchmarks", "results.jsonl")
+
+
+# -------------------------------
+# ⏱ أدوات القياس
+# -------------------------------
+def timeit(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"min_s": min(times), "median_s": statistics.median(times), "runs": repeat}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def last_results(results_path, params):
+    """آخر قياس لكل مرحلة بنفس الإعدادات"""
+    last = {}
+    if not os.path.exists(results_path):
+        return last
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("params") == params:
+                last[rec["stage"]] = rec
+    return last
+
+
+# -------------------------------
+# 🏁 المراحل
+# -------------------------------
+def run_suite(workbook, repeat, card_num=None):
+    """قياس المراحل على نسخة من الملف في مجلد مؤقت: {stage: timing}"""
+    results = {}
+    tmp_dir = tempfile.mkdtemp(prefix="cmms_bench_")
+    try:
+        path = os.path.join(tmp_dir, "workbook.xlsx")
+        shutil.copy(workbook, path)
+        cache_dir = os.path.join(tmp_dir, CACHE_DIR_NAME)
+
+        def drop_cache():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        # load_all_sheets / load_sheets_for_edit (قراءة واحدة dtype=object ثم العرض المستنتج)
+        results["load_all_sheets[cold]"] = timeit(
+            lambda: typed_view(read_workbook(path, dtype=object)), repeat, setup=drop_cache)
+        results["load_all_sheets[disk-cache]"] = timeit(
+            lambda: typed_view(read_workbook(path, dtype=object)), repeat)
+        results["load_sheets_for_edit[disk-cache]"] = timeit(
+            lambda: read_workbook(path, dtype=object), repeat)
+
+        raw = read_workbook(path, dtype=object)
+        sheets = typed_view(raw)
+        cards = sorted(n for n in sheets if n.startswith("Card"))
+        card_name = f"Card{card_num}" if card_num else max(cards, key=lambda n: len(sheets[n]))
+        card_num = int(card_name[4:])
+        tons = float(sheets[card_name]["Max_Tones"].max() or 0) / 2
+
+        # أول نتيجة لماكينة واحدة بكاش بارد: البصمات ثم تحليل ServicePlan وشيت الماكينة فقط
+        def cold_start():
+            drop_cache()
+            os.utime(path)  # توقيع stat جديد: لا تُستخدم البصمات المحفوظة في الذاكرة
+
+        def first_result():
+            versions = dict(sheet_versions(path, dtype=object))
+            plan = SliceIndex(typed_frame(load_sheet(path, "ServicePlan", versions["ServicePlan"], dtype=object)))
+            card = EventIndex(typed_frame(load_sheet(path, card_name, versions[card_name], dtype=object)))
+            return filter_compliance(compliance_table(card_num, plan, card), plan, VIEW_OPTIONS[0], tons, 0, tons * 2)
+
+        results["first_result[one card, cold]"] = timeit(first_result, repeat, setup=cold_start)
+
+        # check_machine_status (بناء الفهارس ثم الاستعلام بكل نطاقات العرض)
+        results["check_machine_status[index]"] = timeit(
+            lambda: (SliceIndex(sheets["ServicePlan"]), EventIndex(sheets[card_name])), repeat)
+        slice_index, event_index = SliceIndex(sheets["ServicePlan"]), EventIndex(sheets[card_name])
+        results["check_machine_status[query]"] = timeit(
+            lambda: [compute_status(card_num, slice_index, event_index, v, tons, 0, tons * 2) for v in VIEW_OPTIONS],
+            repeat)
+
+        # جدول الامتثال: يُبنى مرة لكل نسخة، ثم كل نطاق عرض فلترة له
+        results["compliance_table[build]"] = timeit(
+            lambda: compliance_table(card_num, slice_index, event_index), repeat)
+        table = compliance_table(card_num, slice_index, event_index)
+        results["check_machine_status[compliance filter]"] = timeit(
+            lambda: [filter_compliance(table, slice_index, v, tons, 0, tons * 2) for v in VIEW_OPTIONS],
+            repeat)
+
+        # تصدير النتائج إلى Excel (أكبر جدول: كل الشرائح)
+        result_df = compute_status(card_num, slice_index, event_index, VIEW_ALL, tons)
+
+        results["excel_export"] = timeit(lambda: export_frame(result_df, "xlsx"), repeat)
+        results["csv_export"] = timeit(lambda: export_frame(result_df, "csv"), repeat)
+
+        # save_local_excel_and_push (الرفع بديل لا يفعل شيئاً سوى قراءة المحتوى)
+        def push_stub():
+            with open(path, "rb") as f:
+                f.read()
+
+        def save_all():
+            write_workbook(path, raw)
+            push_stub()
+        results["save_local_excel_and_push[all sheets]"] = timeit(save_all, repeat)
+
+        def save_one_dirty():
+            tracked = TrackedSheets(raw)
+            tracked[card_name] = raw[card_name]
+            save_sheets(path, tracked)
+            push_stub()
+        results["save_local_excel_and_push[one dirty sheet]"] = timeit(save_one_dirty, repeat)
+
+        info = {"card": card_name, "rows": len(sheets[card_name]), "result_rows": len(result_df),
+                "sheets": len(sheets), "bytes": os.path.getsize(path)}
+        return results, info
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء تحميل وفحص وحفظ الملف.")
+    parser.add_argument("--workbook", help="ملف Excel موجود بدلاً من توليد ملف تجريبي")
+    parser.add_argument("--cards", type=int, default=24)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--services", type=int, default=8)
+    parser.add_argument("--slices", type=int, default=11)
+    parser.add_argument("--card", type=int, help="رقم الماكينة للفحص (افتراضياً الأكبر)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="ملف JSONL لتسجيل النتائج")
+    parser.add_argument("--threshold", type=float, default=0.2, help="نسبة البطء التي تُعد تراجعاً")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    if args.workbook:
+        workbook = args.workbook
+        params = {"workbook": os.path.basename(workbook), "bytes": os.path.getsize(workbook)}
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="cmms_wb_")
+        workbook = os.path.join(tmp_dir, "synthetic.xlsx")
+        write_workbook(workbook, make_sheets(args.cards, args.events, args.services, args.slices))
+        params = {"cards": args.cards, "events": args.events, "services": args.services, "slices": args.slices}
+
+    try:
+        results, info = run_suite(workbook, args.repeat, args.card)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    previous = last_results(args.results, params)
+    commit = git_commit()
+    stamp = datetime.now().isoformat(timespec="seconds")
+    regressions = []
+
+    print(f"{'stage':45s} {'median':>10s} {'min':>10s} {'prev':>10s}")
+    for stage, timing in results.items():
+        prev = previous.get(stage, {}).get("median_s")
+        flag = ""
+        if prev and timing["median_s"] > prev * (1 + args.threshold):
+            flag = "  ⚠ REGRESSION"
+            regressions.append(stage)
+        prev_txt = f"{prev * 1000:9.1f}ms" if prev else f"{'-':>11s}"
+        print(f"{stage:45s} {timing['median_s'] * 1000:9.1f}ms {timing['min_s'] * 1000:9.1f}ms {prev_txt}{flag}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        for stage, timing in results.items():
+            f.write(json.dumps({
+                "timestamp": stamp, "commit": commit, "params": params, "info": info,
+                "stage": stage, **timing,
+            }, ensure_ascii=False) + "\n")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""فحص حالة الماكينات من سطر الأوامر (بدون Streamlit)
+
+مثال:
+    python cmms_cli.py queries.csv --format jsonl > results.jsonl
+    cat queries.csv | python cmms_cli.py - --workbook Machine_Service_Lookup.xlsx
+
+ملف الاستعلامات CSV بعناوين: card, tons, view_option, min_range, max_range
+(view_option و min_range/max_range اختيارية).
+"""
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from machine_status import (
+    VIEW_OPTIONS, VIEW_CURRENT, VIEW_LOWER, VIEW_HIGHER, VIEW_CUSTOM, VIEW_ALL,
+    RESULT_COLUMNS, SliceIndex, EventIndex, compute_status,
+)
+from sheet_cache import read_workbook, typed_view
+from sheet_schema import compact_sheets
+
+DEFAULT_WORKBOOK = "Machine_Service_Lookup.xlsx"
+
+# أسماء مختصرة لنطاقات العرض
+VIEW_ALIASES = {
+    "current": VIEW_CURRENT,
+    "lower": VIEW_LOWER,
+    "higher": VIEW_HIGHER,
+    "custom": VIEW_CUSTOM,
+    "all": VIEW_ALL,
+}
+
+QUERY_COLUMNS = ["query", "card", "tons", "view_option", "error"]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def parse_view_option(value):
+    value = (value or "").strip()
+    if not value:
+        return VIEW_CURRENT
+    if value in VIEW_OPTIONS:
+        return value
+    view = VIEW_ALIASES.get(value.lower())
+    if view is None:
+        raise ValueError(f"نطاق عرض غير معروف: {value}")
+    return view
+
+def _number(value, default=None):
+    value = (value or "").strip() if isinstance(value, str) else value
+    if value in ("", None):
+        return default
+    return float(value)
+
+def _plain(value):
+    """تحويل قيم numpy إلى قيم بايثون عادية (لـ JSON)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# -------------------------------
+# 🖥 مشغل الاستعلامات
+# -------------------------------
+class StatusRunner:
+    """يحمل المصنف مرة واحدة ويجيب استعلامات (card, tons, view_option, range)"""
+
+    def __init__(self, sheets):
+        if "ServicePlan" not in sheets:
+            raise ValueError("الملف لا يحتوي على شيت ServicePlan.")
+        self.sheets = sheets
+        self.slice_index = SliceIndex(sheets["ServicePlan"])
+        self._event_indexes = {}
+
+    @classmethod
+    def from_workbook(cls, path):
+        return cls(compact_sheets(typed_view(read_workbook(path, dtype=object))))
+
+    def event_index(self, card_num):
+        index = self._event_indexes.get(card_num)
+        if index is None:
+            sheet_name = f"Card{card_num}"
+            if sheet_name not in self.sheets:
+                raise KeyError(f"لا يوجد شيت باسم {sheet_name}")
+            index = self._event_indexes[card_num] = EventIndex(self.sheets[sheet_name])
+        return index
+
+    def run(self, card_num, tons, view_option=VIEW_CURRENT, min_range=None, max_range=None):
+        if min_range is None:
+            min_range = max(0, tons - 500)
+        if max_range is None:
+            max_range = tons + 500
+        return compute_status(card_num, self.slice_index, self.event_index(card_num), view_option, tons, min_range, max_range)
+
+    def iter_records(self, queries):
+        """سجل لكل صف نتيجة؛ الاستعلام الفاشل يعطي سجلاً واحداً فيه error"""
+        for i, q in enumerate(queries):
+            base = {"query": i, "card": q.get("card"), "tons": q.get("tons")}
+            try:
+                card_num = int(_number(q.get("card")))
+                tons = _number(q.get("tons"), 0)
+                view_option = parse_view_option(q.get("view_option"))
+                base.update(card=card_num, tons=tons, view_option=view_option)
+                result = self.run(card_num, tons, view_option, _number(q.get("min_range")), _number(q.get("max_range")))
+            except Exception as e:
+                yield {**base, "error": e.args[0] if isinstance(e, KeyError) else str(e)}
+                continue
+            if result is None:
+                yield {**base, "error": "لا توجد شرائح مطابقة حسب النطاق المحدد."}
+                continue
+            for row in result.itertuples(index=False):
+                yield {**base, **{col: _plain(v) for col, v in zip(RESULT_COLUMNS, row)}}
+
+
+# -------------------------------
+# ⌨ سطر الأوامر
+# -------------------------------
+def write_records(records, out, fmt):
+    if fmt == "jsonl":
+        for rec in records:
+            out.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=QUERY_COLUMNS + RESULT_COLUMNS, restval="")
+        writer.writeheader()
+        for rec in records:
+            writer.writerow(rec)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="فحص حالة الماكينات لعدد كبير من الاستعلامات دون واجهة.")
+    parser.add_argument("queries", nargs="?", default="-", help="ملف CSV للاستعلامات أو - للقراءة من stdin")
+    parser.add_argument("--workbook", default=DEFAULT_WORKBOOK, help="مسار ملف Excel")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="صيغة المخرجات")
+    parser.add_argument("--output", default="-", help="ملف المخرجات أو - لـ stdout")
+    args = parser.parse_args(argv)
+
+    runner = StatusRunner.from_workbook(args.workbook)
+
+    in_file = sys.stdin if args.queries == "-" else open(args.queries, "r", encoding="utf-8-sig", newline="")
+    out_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        write_records(runner.iter_records(csv.DictReader(in_file)), out_file, args.format)
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
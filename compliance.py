@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ===============================
+# جداول الامتثال المحسوبة مسبقاً (ملف لكل ماكينة بجوار ملف Excel)
+# ===============================
+COMPLIANCE_DIR_NAME = "compliance"
+FORMAT_VERSION = "3"  # يتغير إذا تغير شكل الجدول فتُهمل الملفات القديمة
+
+
+class ComplianceStore:
+    """جدول compliance_table لكل (ماكينة، نسخة شيتها، نسخة ServicePlan)
+
+    البحث: ذاكرة -> ملف pickle في directory -> build() ثم الحفظ.
+    warm() يبني في خيط بالخلفية جداول النسخ التي لا ملف لها بعد (بعد التحميل أو التحديث أو الحفظ).
+    """
+
+    def __init__(self, directory, memory_entries=64):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = {}
+        self._ready = set()  # مفاتيح لها ملف (لا يُعاد فحصها في warm)
+
+    # -------------------------------
+    # 🧰 الملفات
+    # -------------------------------
+    @staticmethod
+    def key(card_num, card_version, plan_version):
+        raw = f"{FORMAT_VERSION}|{card_num}|{card_version}|{plan_version}"
+        return f"{card_num}-{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _remember(self, key, table):
+        with self._lock:
+            self._memory[key] = table
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _save(self, key, table):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{key}", suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            table.to_pickle(tmp)
+            os.replace(tmp, self._path(key))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._ready.add(key)
+        self._prune(key)
+
+    def _prune(self, key):
+        """حذف ملفات النسخ الأقدم لنفس الماكينة (وملفات الصيغ القديمة بدون رقم ماكينة)"""
+        prefix = key.split("-", 1)[0] + "-"
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".pkl") and name != f"{key}.pkl" and (name.startswith(prefix) or "-" not in name):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                with self._lock:
+                    self._ready.discard(name[:-len(".pkl")])
+
+    # -------------------------------
+    # 🔎 البحث والبناء
+    # -------------------------------
+    def peek(self, key):
+        """الجدول المحفوظ للمفتاح (ذاكرة أو ملف) أو None بدون بناء"""
+        with self._lock:
+            table = self._memory.get(key)
+            if table is not None:
+                self._memory.move_to_end(key)
+                return table
+        try:
+            table = pd.read_pickle(self._path(key))
+        except Exception:
+            return None
+        self._remember(key, table)
+        return table
+
+    def get(self, key, build):
+        """الجدول المحفوظ للمفتاح أو build() (ويُحفظ)"""
+        table = self.peek(key)
+        if table is None:
+            table = build()
+            try:
+                self._save(key, table)
+            except OSError:
+                pass
+            self._remember(key, table)
+        return table
+
+    def warm(self, builds):
+        """builds: {key: build}؛ يبني في الخلفية الجداول التي لا يوجد لها ملف
+
+        build هنا يجب ألا يعتمد على كاش Streamlit (الخيط بدون جلسة).
+        المفاتيح الجاهزة تُتجاهل، فاستدعاؤه مع كل تشغيل للصفحة رخيص.
+        """
+        with self._lock:
+            self._pending.update((key, build) for key, build in builds.items() if key not in self._ready)
+            if self._thread is None and self._pending:
+                self._thread = threading.Thread(target=self._run, name="compliance-warm", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                builds, self._pending = self._pending, {}
+                if not builds:
+                    self._thread = None
+                    return
+            for key, build in builds.items():
+                if os.path.exists(self._path(key)):
+                    with self._lock:
+                        self._ready.add(key)
+                    continue
+                try:
+                    # للقرص فقط: الذاكرة تبقى لجداول الماكينات التي تُفحص فعلاً
+                    self._save(key, build())
+                except Exception:
+                    pass  # يُبنى عند أول طلب للماكينة
+
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
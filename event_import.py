@@ -0,0 +1,112 @@
+import datetime
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from sheet_pager import CARD_ALIASES, MIN_ALIASES, MAX_ALIASES, DATE_ALIASES, find_column, parse_dates
+
+# ===============================
+# استيراد أحداث الصيانة دفعة واحدة من ملف (CSV أو Excel)
+# ===============================
+IMPORT_TYPES = ("csv", "xlsx")
+ERROR_COLUMNS = ["الصف", "الكارت", "الخطأ"]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def _as_text(value):
+    """قيمة الخلية كنص كما تُكتب في حقول الإدخال (الفارغ "")"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return f"{value.day}\\{value.month}\\{value.year}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def read_events_file(data, filename):
+    """محتوى الملف المرفوع (bytes) كـ DataFrame نصوص؛ ValueError لغير csv/xlsx"""
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    if ext == "csv":
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    elif ext == "xlsx":
+        df = pd.read_excel(io.BytesIO(data), dtype=object)
+    else:
+        raise ValueError(f"صيغة ملف غير مدعومة: {filename} (المسموح: {', '.join(IMPORT_TYPES)})")
+    df.columns = [str(c).strip() for c in df.columns]
+    return df.map(_as_text).astype(object)
+
+
+# -------------------------------
+# ✅ التحقق (على الأعمدة كاملة، لا صفاً بصف)
+# -------------------------------
+def validate_events(df, sheets):
+    """فرز أحداث الملف على شيتات Card{n} مع تقرير أخطاء لكل صف
+
+    sheets: الشيتات (dict أو LazySheets)؛ تُقرأ فقط الشيتات المذكورة في الملف.
+    يرجع ({اسم الشيت: صفوف صالحة بأعمدة الشيت}, DataFrame الأخطاء).
+    ValueError إذا كان الملف نفسه ناقصاً (بدون أعمدة card أو الرينج).
+    """
+    card_col = find_column(df, CARD_ALIASES)
+    min_col, max_col = find_column(df, MIN_ALIASES), find_column(df, MAX_ALIASES)
+    if card_col is None:
+        raise ValueError("الملف لا يحتوي على عمود card.")
+    if min_col is None or max_col is None:
+        raise ValueError("الملف لا يحتوي على أعمدة Min_Tones و/أو Max_Tones.")
+
+    df = df.reset_index(drop=True)
+    errors = pd.Series([[] for _ in range(len(df))], dtype=object)
+
+    def fail(mask, message):
+        for i in np.flatnonzero(np.asarray(mask, dtype=bool)):
+            errors[i].append(message)
+
+    cards = pd.to_numeric(df[card_col], errors="coerce")
+    bad_card = cards.isna() | (cards % 1 != 0)
+    fail(bad_card, "رقم الكارت غير صحيح")
+    sheet_names = pd.Series("", index=df.index, dtype=object)
+    sheet_names[~bad_card] = "Card" + cards[~bad_card].astype(np.int64).astype(str)
+    fail(~bad_card & ~sheet_names.isin(list(sheets.keys())), "لا يوجد شيت لهذا الكارت")
+
+    mins = pd.to_numeric(df[min_col], errors="coerce")
+    maxs = pd.to_numeric(df[max_col], errors="coerce")
+    fail(mins.isna(), "Min_Tones ليس رقماً")
+    fail(maxs.isna(), "Max_Tones ليس رقماً")
+    fail(mins > maxs, "Min_Tones أكبر من Max_Tones")
+
+    date_col = find_column(df, DATE_ALIASES)
+    if date_col is not None:
+        filled = df[date_col] != ""
+        fail(filled & parse_dates(df[date_col].where(filled)).isna(), "تاريخ غير مفهوم")
+
+    # أعمدة كل شيت: مطابقة الأسماء بدون حساسية لحالة الأحرف
+    renamed = {}
+    for sheet in sheet_names[sheet_names.isin(list(sheets.keys()))].unique():
+        rows = sheet_names == sheet
+        columns = list(sheets[sheet].columns)
+        if find_column(sheets[sheet], MIN_ALIASES) is None or find_column(sheets[sheet], MAX_ALIASES) is None:
+            fail(rows, "الشيت لا يحتوي على أعمدة Min_Tones/Max_Tones")
+            continue
+        by_key = {str(c).strip().lower(): c for c in columns}
+        mapping = {c: by_key[c.lower()] for c in df.columns if c.lower() in by_key}
+        for col in df.columns:
+            if col not in mapping and col != card_col:
+                fail(rows & (df[col] != ""), f"العمود {col} غير موجود في الشيت")
+        renamed[sheet] = (mapping, columns)
+
+    ok = errors.map(len) == 0
+    batches = {}
+    for sheet, (mapping, columns) in renamed.items():
+        rows = df.loc[ok & (sheet_names == sheet), list(mapping)].rename(columns=mapping)
+        if len(rows):
+            batches[sheet] = rows.reindex(columns=columns, fill_value="")
+
+    report = pd.DataFrame({
+        ERROR_COLUMNS[0]: np.arange(len(df)) + 2,  # +2: رقم الصف في الملف (بعد صف العناوين)
+        ERROR_COLUMNS[1]: df[card_col],
+        ERROR_COLUMNS[2]: errors.map("؛ ".join),
+    })[~ok].reset_index(drop=True)
+    return batches, report
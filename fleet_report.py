@@ -0,0 +1,104 @@
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from machine_status import VIEW_CURRENT, RESULT_COLUMNS, SliceIndex, EventIndex, compute_status
+
+# ===============================
+# إعدادات تقرير كل الماكينات
+# ===============================
+CARD_SHEET_RE = re.compile(r"^Card(\d+)$")
+MIN_CARDS_FOR_POOL = 4  # أقل من ذلك يُحسب في نفس العملية (تكلفة تشغيل العمليات أكبر)
+
+CARD_COL_NAMES = ("card", "card number", "card_no", "machine", "machine_no", "machine id")
+TONS_COL_NAMES = ("current_tones", "current tones", "current_tons", "tones", "tons", "current")
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def card_sheets(sheets):
+    """شيتات Card{n} مرتبة حسب الرقم: [(رقم الماكينة، اسم الشيت)]"""
+    cards = []
+    for name in sheets:
+        m = CARD_SHEET_RE.match(str(name).strip())
+        if m:
+            cards.append((int(m.group(1)), name))
+    return sorted(cards)
+
+def _find_col(df, names):
+    cols = {str(c).strip().lower(): c for c in reversed(list(df.columns))}
+    for name in names:
+        if name in cols:
+            return cols[name]
+    return None
+
+def read_tonnages(df):
+    """جدول الأطنان الحالية -> {رقم الماكينة: الأطنان} (يتجاهل الصفوف الفارغة)"""
+    if df is None or df.empty:
+        return {}
+    card_col = _find_col(df, CARD_COL_NAMES)
+    tons_col = _find_col(df, TONS_COL_NAMES)
+    if card_col is None or tons_col is None:
+        raise ValueError("لم يتم العثور على عمودي رقم الماكينة والأطنان الحالية (card / Current_Tones).")
+    cards = pd.to_numeric(df[card_col], errors="coerce")
+    tons = pd.to_numeric(df[tons_col], errors="coerce")
+    valid = cards.notna() & tons.notna()
+    return dict(zip(cards[valid].astype(int), tons[valid]))
+
+
+# -------------------------------
+# ⚙ عمال الحساب (عملية لكل نواة)
+# -------------------------------
+_worker_slice_index = None
+
+def _init_worker(service_plan_df):
+    # فهرس الشرائح يُبنى مرة واحدة لكل عملية
+    global _worker_slice_index
+    _worker_slice_index = SliceIndex(service_plan_df)
+
+def _card_status(task):
+    card_num, tons, card_df, view_option, min_range, max_range = task
+    return compute_status(card_num, _worker_slice_index, EventIndex(card_df), view_option, tons, min_range, max_range)
+
+
+# -------------------------------
+# 📋 تقرير كل الماكينات
+# -------------------------------
+def fleet_status(sheets, tonnages, view_option=VIEW_CURRENT, min_range=None, max_range=None, workers=None):
+    """حالة كل شيتات Card{n} في جدول واحد، موزعة على عدة عمليات
+
+    tonnages: {رقم الماكينة: الأطنان الحالية}؛ الماكينات بدون أطنان تُتجاهل.
+    """
+    if "ServicePlan" not in sheets:
+        raise ValueError("الملف لا يحتوي على شيت ServicePlan.")
+
+    tasks = [
+        (card_num, tonnages[card_num], sheets[name], view_option, min_range, max_range)
+        for card_num, name in card_sheets(sheets)
+        if card_num in tonnages
+    ]
+    if not tasks:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1 or len(tasks) < MIN_CARDS_FOR_POOL:
+        _init_worker(sheets["ServicePlan"])
+        results = [_card_status(t) for t in tasks]
+    else:
+        # spawn آمن مع خيوط سيرفر Streamlit
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(sheets["ServicePlan"],),
+        ) as pool:
+            results = list(pool.map(_card_status, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    results = [r for r in results if r is not None and not r.empty]
+    if not results:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from base64 import b64decode
+
+import requests
+
+from sheet_cache import file_sha256
+
+# ===============================
+# مزامنة ملف Excel مع GitHub
+# ===============================
+FETCH_UPDATED = "updated"      # تم تنزيل نسخة جديدة واستبدال الملف
+FETCH_UNCHANGED = "unchanged"  # الملف على GitHub لم يتغير، لم يُلمس الملف المحلي
+
+CHUNK_SIZE = 1 << 16
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def _meta_path(path):
+    return path + ".fetch.json"
+
+def _read_meta(path):
+    """بيانات آخر تنزيل ({} إذا لم يوجد الملف أو كان تالفاً)"""
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except Exception:
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+def _write_meta(path, meta):
+    tmp = _meta_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(path))
+
+def _local_sha256(path):
+    return file_sha256(path) if os.path.exists(path) else None
+
+def git_blob_sha(path):
+    """SHA الخاص بـ git لمحتوى الملف (نفس sha في GitHub API)"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _swap_in(chunks, path):
+    """كتابة المحتوى لملف مؤقت بجوار الملف ثم استبداله ذرياً إن اختلف
+
+    القارئ يرى إما الملف القديم كاملاً أو الجديد كاملاً.
+    يرجع (status, sha256 للمحتوى الجديد).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".~fetch", suffix=".xlsx", dir=directory)
+    h = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                if chunk:
+                    h.update(chunk)
+                    f.write(chunk)
+        digest = h.hexdigest()
+        if digest == _local_sha256(path):
+            os.remove(tmp)
+            return FETCH_UNCHANGED, digest
+        os.replace(tmp, path)
+        return FETCH_UPDATED, digest
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# -------------------------------
+# 🔄 التحميل المشروط
+# -------------------------------
+def fetch_url(url, path, timeout=15, session=None):
+    """تحميل من رابط RAW مع If-None-Match؛ يرجع FETCH_UPDATED أو FETCH_UNCHANGED
+
+    الـ ETag يُرسل فقط إذا كان الملف المحلي هو نفس آخر نسخة تم تنزيلها،
+    فالتعديلات المحلية لا تمنع استرجاع النسخة الأصلية.
+    """
+    http = session or requests
+    meta = _read_meta(path)
+    local_sha = _local_sha256(path)
+    headers = {}
+    if meta.get("etag") and local_sha and meta.get("sha256") == local_sha:
+        headers["If-None-Match"] = meta["etag"]
+
+    with http.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return FETCH_UNCHANGED
+        response.raise_for_status()
+        status, digest = _swap_in(response.iter_content(CHUNK_SIZE), path)
+        etag = response.headers.get("ETag")
+
+    _write_meta(path, {"etag": etag, "sha256": digest, "url": url})
+    return status
+
+def fetch_via_api(repo, file_path, branch, path):
+    """تحميل عبر GitHub API (PyGithub repo)؛ يتخطى التنزيل إذا تطابق blob SHA"""
+    file_content = repo.get_contents(file_path, ref=branch)
+    if file_content.sha == git_blob_sha(path):
+        return FETCH_UNCHANGED
+    if file_content.content:
+        content = b64decode(file_content.content)
+    else:
+        # الملفات الأكبر من 1MB لا يرجع محتواها مع get_contents
+        content = b64decode(repo.get_git_blob(file_content.sha).content)
+    status, digest = _swap_in([content], path)
+    _write_meta(path, {"etag": None, "sha256": digest, "blob_sha": file_content.sha})
+    return status
+
+
+# -------------------------------
+# ⬆ الرفع إلى GitHub
+# -------------------------------
+def push_file(repo, file_path, branch, path, message):
+    """رفع الملف المحلي (update أو create)؛ يتخطى الرفع إذا طابق blob SHA"""
+    try:
+        contents = repo.get_contents(file_path, ref=branch)
+    except Exception as e:
+        if getattr(e, "status", None) != 404:
+            raise
+        contents = None
+    if contents is not None and contents.sha == git_blob_sha(path):
+        return False
+    with open(path, "rb") as f:
+        content = f.read()
+    if contents is None:
+        repo.create_file(path=file_path, message=message, content=content, branch=branch)
+    else:
+        repo.update_file(path=file_path, message=message, content=content, sha=contents.sha, branch=branch)
+    return True
+
+
+PUSH_IDLE = "idle"          # لا يوجد ما يُرفع
+PUSH_PENDING = "pending"    # في انتظار توقف التعديلات (debounce)
+PUSH_RUNNING = "pushing"    # جاري الرفع
+PUSH_RETRYING = "retrying"  # فشل الرفع وسيُعاد بعد مهلة
+PUSH_FAILED = "failed"      # استُنفدت المحاولات؛ يُعاد مع أول حفظ تالٍ
+PUSH_DONE = "done"          # آخر رفع نجح
+WAIT_STEP = 0.1             # أقصى انتظار متواصل (ثوان) قبل إعادة قراءة الساعة
+
+
+class PushQueue:
+    """عامل في الخلفية يدمج الحفظ المتتالي في commit واحد
+
+    push_fn(message) ترفع الملف المحلي بحالته وقت الرفع، فالتعديلات التي
+    تصل خلال مهلة الـ debounce أو أثناء انتظار إعادة المحاولة تُرفع معاً.
+    clock: ساعة المهل والأوقات في الحالة (time.time افتراضياً؛ ساعة وهمية في الاختبارات).
+    """
+
+    def __init__(self, push_fn, debounce=3.0, retries=5, backoff=2.0, max_backoff=60.0, clock=time.time):
+        self.push_fn = push_fn
+        self.debounce = debounce
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._inbox = []          # (وقت الحفظ، الرسالة) لم يأخذها العامل بعد
+        self._thread = None
+        self._messages = []
+        self._last_submit = None  # وقت آخر حفظ في الرسائل المجمعة
+        self._state = {"state": PUSH_IDLE, "pending": 0, "attempts": 0,
+                       "last_push": None, "last_error": None, "next_retry": None}
+
+    def submit(self, message):
+        """تسجيل حفظ جديد (يرجع فوراً)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="github-push", daemon=True)
+                self._thread.start()
+            if self._state["state"] in (PUSH_IDLE, PUSH_DONE, PUSH_FAILED):
+                self._state.update(state=PUSH_PENDING, pending=self._state["pending"] + 1)
+            self._inbox.append((self.clock(), message))
+            self._arrived.notify()
+
+    def status(self):
+        with self._lock:
+            return dict(self._state)
+
+    def wait(self, timeout=None):
+        """انتظار انتهاء كل ما في الطابور (للاختبار والإغلاق)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                state = dict(self._state)
+                empty = not self._inbox
+            if empty and state["state"] in (PUSH_IDLE, PUSH_DONE, PUSH_FAILED):
+                return state
+            if deadline is not None and time.monotonic() >= deadline:
+                return state
+            time.sleep(0.05)
+
+    def _set(self, **changes):
+        with self._lock:
+            self._state.update(changes)
+
+    def _next(self, deadline=None):
+        """(وقت الحفظ، الرسالة) التالية، أو None إذا وصلت clock إلى deadline قبلها"""
+        with self._lock:
+            while not self._inbox:
+                if deadline is None:
+                    self._arrived.wait()
+                    continue
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return None
+                # المهلة تُقاس بـ clock، فيُعاد فحصها كل WAIT_STEP ثانية على الأكثر
+                self._arrived.wait(min(remaining, WAIT_STEP))
+            return self._inbox.pop(0)
+
+    def _take(self, item):
+        submitted, message = item
+        self._messages.append(message)
+        self._last_submit = submitted
+        self._set(state=PUSH_PENDING, pending=len(self._messages))
+
+    def _collect(self, deadline, timeout):
+        """جمع الرسائل حتى deadline؛ كل حفظ جديد يمد المهلة timeout من وقت الحفظ"""
+        while True:
+            item = self._next(deadline)
+            if item is None:
+                return
+            self._take(item)
+            deadline = self._last_submit + timeout
+
+    def _commit_message(self):
+        unique = list(dict.fromkeys(self._messages))
+        if len(unique) == 1:
+            return unique[0]
+        return f"{unique[-1]} (+{len(unique) - 1} more)\n\n" + "\n".join(f"- {m}" for m in unique)
+
+    def _run(self):
+        while True:
+            if not self._messages:
+                self._take(self._next())
+                self._set(attempts=0)
+            self._collect(self._last_submit + self.debounce, self.debounce)
+
+            self._set(state=PUSH_RUNNING)
+            try:
+                self.push_fn(self._commit_message())
+            except Exception as e:
+                attempts = self.status()["attempts"] + 1
+                if attempts > self.retries:
+                    # تبقى الرسائل لتُدمج مع الحفظ التالي
+                    self._set(state=PUSH_FAILED, attempts=attempts, last_error=str(e), next_retry=None)
+                    self._take(self._next())
+                    self._set(attempts=0)
+                    continue
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                next_retry = self.clock() + delay
+                self._set(state=PUSH_RETRYING, attempts=attempts, last_error=str(e), next_retry=next_retry)
+                self._collect(next_retry, delay)
+                continue
+
+            self._messages = []
+            with self._lock:
+                self._state.update(state=PUSH_DONE if not self._inbox else PUSH_PENDING, pending=0, attempts=0,
+                                   last_push=self.clock(), last_error=None, next_retry=None)
@@ -0,0 +1,319 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ===============================
+# إعدادات فحص الماكينة
+# ===============================
+VIEW_CURRENT = "الشريحة الحالية فقط"
+VIEW_LOWER = "كل الشرائح الأقل"
+VIEW_HIGHER = "كل الشرائح الأعلى"
+VIEW_CUSTOM = "نطاق مخصص"
+VIEW_ALL = "كل الشرائح"
+VIEW_OPTIONS = (VIEW_CURRENT, VIEW_LOWER, VIEW_HIGHER, VIEW_CUSTOM, VIEW_ALL)
+
+# أعمدة ليست خدمات
+IGNORE_COLS = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
+
+# أعمدة تُعرض كما هي من صف الحدث
+TEXT_COLS = ("Tones", "Event", "Correction", "Servised by", "Date")
+
+SLICE_COL = "Slice"  # رقم صف الشريحة في ServicePlan (في جدول الامتثال فقط)
+
+RESULT_COLUMNS = [
+    "Card Number", "Min_Tons", "Max_Tons", "Service Needed", "Service Done",
+    "Service Didn't Done", "Tones", "Event", "Correction", "Servised by", "Date",
+]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة للنصوص
+# -------------------------------
+@lru_cache(maxsize=8192)
+def normalize_name(s):
+    if s is None: return ""
+    s = str(s).replace("\n", "+")
+    s = re.sub(r"[^0-9a-zA-Z\u0600-\u06FF\+\s_/.-]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+def split_needed_services(needed_service_str):
+    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
+        return []
+    parts = re.split(r"\+|,|\n|;", needed_service_str)
+    return [p.strip() for p in parts if p.strip() != ""]
+
+
+def _numeric_column(df, col):
+    """عمود رقمي (القيم الفارغة أو غير الرقمية = 0) أو أصفار إذا لم يوجد العمود"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=float)
+    return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+# -------------------------------
+# 🔢 قاموس الخدمات (اسم مطبع -> رقم بت)
+# -------------------------------
+class ServiceVocabulary:
+    """قاموس أسماء الخدمات المطلوبة في ServicePlan: كل اسم مطبع له بت
+
+    الخدمات المطلوبة لكل شريحة والمنفذة لكل حدث تُخزن كأقنعة بت،
+    فالخدمات غير المنفذة = needed & ~done.
+    """
+
+    def __init__(self, names=()):
+        self.names = tuple(dict.fromkeys(names))
+        self.bits = {name: i for i, name in enumerate(self.names)}
+        # int64 يكفي حتى 63 خدمة، وبعدها أعداد بايثون (بدون حد)
+        self.dtype = np.int64 if len(self.names) < 64 else object
+
+    def bit(self, norm):
+        i = self.bits.get(norm)
+        return 0 if i is None else 1 << i
+
+    def mask(self, norms):
+        m = 0
+        for n in norms:
+            m |= self.bit(n)
+        return m
+
+    def to_array(self, masks):
+        return np.array(masks, dtype=self.dtype)
+
+
+# -------------------------------
+# 📐 فهرس شرائح ServicePlan
+# -------------------------------
+class SliceIndex:
+    """فهرس شرائح ServicePlan: مصفوفات Min/Max مرتبة لاختيار الشرائح بالبحث الثنائي"""
+
+    def __init__(self, service_plan_df):
+        self.df = service_plan_df.reset_index(drop=True)
+        self.mins = pd.to_numeric(self.df["Min_Tones"], errors="coerce").to_numpy(dtype=float)
+        self.maxs = pd.to_numeric(self.df["Max_Tones"], errors="coerce").to_numpy(dtype=float)
+        self._by_min = np.argsort(self.mins, kind="stable")
+        self._by_max = np.argsort(self.maxs, kind="stable")
+        self._sorted_mins = self.mins[self._by_min]
+        self._sorted_maxs = self.maxs[self._by_max]
+
+        # الخدمات المطلوبة لكل شريحة (تُقسم وتُطبع مرة واحدة)
+        self.needed = [split_needed_services(v) for v in self.df.get("Service", pd.Series([""] * len(self.df)))]
+        self.needed_norm = [[normalize_name(p) for p in parts] for parts in self.needed]
+        self.vocab = ServiceVocabulary(n for norms in self.needed_norm for n in norms)
+        self.needed_bits = [[self.vocab.bit(n) for n in norms] for norms in self.needed_norm]
+        self.needed_masks = self.vocab.to_array([self.vocab.mask(norms) for norms in self.needed_norm])
+        self.needed_label = [" + ".join(parts) if parts else "-" for parts in self.needed]
+        self.needed_text = [", ".join(parts) if parts else "-" for parts in self.needed]
+
+    def _min_at_least(self, value):
+        return self._by_min[np.searchsorted(self._sorted_mins, value, side="left"):]
+
+    def _min_at_most(self, value):
+        return self._by_min[:np.searchsorted(self._sorted_mins, value, side="right")]
+
+    def _max_at_most(self, value):
+        return self._by_max[:np.searchsorted(self._sorted_maxs, value, side="right")]
+
+    def select(self, view_option, current_tons, min_range=None, max_range=None):
+        """مواضع الشرائح المختارة حسب نطاق العرض (بترتيب ServicePlan الأصلي)"""
+        if view_option == VIEW_CURRENT:
+            pos = self._min_at_most(current_tons)
+            pos = pos[self.maxs[pos] >= current_tons]
+        elif view_option == VIEW_LOWER:
+            pos = self._max_at_most(current_tons)
+        elif view_option == VIEW_HIGHER:
+            pos = self._min_at_least(current_tons)
+        elif view_option == VIEW_CUSTOM:
+            pos = self._min_at_least(min_range)
+            pos = pos[self.maxs[pos] <= max_range]
+        else:
+            pos = np.arange(len(self.df))
+        # استبعاد القيم الفارغة (NaN تُرتب في النهاية)
+        if view_option != VIEW_ALL:
+            pos = pos[~(np.isnan(self.mins[pos]) | np.isnan(self.maxs[pos]))]
+        return np.sort(pos)
+
+
+# -------------------------------
+# 📐 فهرس أحداث شيت الماكينة
+# -------------------------------
+class EventIndex:
+    """فهرس فترات أحداث Card{n}: مرتبة حسب Min_Tones مع أقصى طول فترة
+
+    الحدث يتقاطع مع الشريحة إذا Min_Tones <= slice_max و Max_Tones >= slice_min،
+    فالمرشحون هم نافذة متصلة في الترتيب حسب Min_Tones بين
+    slice_min - أقصى_طول و slice_max، ثم فلترة Max_Tones داخل النافذة.
+
+    يُبنى معه مرة واحدة لكل شيت مصفوفة "الخدمة منفذة" (أحداث × أعمدة خدمات)
+    ونصوص أعمدة العرض لكل حدث.
+    """
+
+    def __init__(self, card_df):
+        self.df = card_df.reset_index(drop=True)
+        self.mins = _numeric_column(self.df, "Min_Tones")
+        self.maxs = _numeric_column(self.df, "Max_Tones")
+        self._order = np.argsort(self.mins, kind="stable")
+        self._sorted_mins = self.mins[self._order]
+        spans = self.maxs - self.mins
+        self._max_span = float(spans.max()) if len(spans) and spans.max() > 0 else 0.0
+
+        # مصفوفة الخدمات المنفذة (الأعمدة مرتبة أبجدياً كما تُعرض)
+        self.service_cols = sorted(c for c in self.df.columns if c not in IGNORE_COLS)
+        self.done_matrix = np.column_stack(
+            [service_performed(self.df[c]) for c in self.service_cols]
+        ) if self.service_cols else np.zeros((len(self.df), 0), dtype=bool)
+
+        # كل نمط خدمات منفذة مختلف يُحسب نصه مرة واحدة
+        patterns, self.pattern_ids = np.unique(self.done_matrix, axis=0, return_inverse=True)
+        self.pattern_ids = self.pattern_ids.reshape(-1)
+        cols = np.array(self.service_cols, dtype=object)
+        self.pattern_done = [list(cols[p]) for p in patterns]
+        self.pattern_done_text = [", ".join(done) if done else "-" for done in self.pattern_done]
+        self._pattern_masks = {}
+
+        self.text = {col: _text_column(self.df, col) for col in TEXT_COLS}
+
+    def done_masks(self, vocab):
+        """قناع بت الخدمات المنفذة لكل حدث حسب القاموس"""
+        masks = self._pattern_masks.get(vocab.names)
+        if masks is None:
+            masks = vocab.to_array([
+                vocab.mask(normalize_name(c) for c in done) for done in self.pattern_done
+            ])
+            self._pattern_masks[vocab.names] = masks
+        return masks[self.pattern_ids]
+
+    def join(self, slice_mins, slice_maxs):
+        """ربط كل الشرائح بالأحداث المتقاطعة معها في مسح واحد
+
+        يرجع (slice_pos, event_pos) مرتبة حسب الشريحة ثم ترتيب الصف في الشيت.
+        """
+        slice_mins = np.asarray(slice_mins, dtype=float)
+        slice_maxs = np.asarray(slice_maxs, dtype=float)
+        lo = np.searchsorted(self._sorted_mins, slice_mins - self._max_span, side="left")
+        hi = np.searchsorted(self._sorted_mins, slice_maxs, side="right")
+        lengths = np.clip(hi - lo, 0, None)
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        slice_pos = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+        event_pos = self._order[starts + np.arange(total)]
+
+        keep = self.maxs[event_pos] >= slice_mins[slice_pos]
+        slice_pos, event_pos = slice_pos[keep], event_pos[keep]
+        order = np.lexsort((event_pos, slice_pos))
+        return slice_pos[order], event_pos[order]
+
+
+def service_performed(col):
+    """خلية خدمة منفذة = غير فارغة وليست نص nan/none (أو True في عمود sparse من المخطط المضغوط)"""
+    if isinstance(col.dtype, pd.SparseDtype):
+        return col.to_numpy(dtype=bool)
+    done = col.notna().to_numpy(copy=True)
+    if done.any() and not pd.api.types.is_numeric_dtype(col):
+        text = col[done].astype(str).str.strip().str.lower()
+        done[done] = ~text.isin(["nan", "none", ""]).to_numpy()
+    return done
+
+def _text_column(df, col):
+    """نص العمود لكل حدث ("-" للفارغ أو إذا لم يوجد العمود)"""
+    out = np.full(len(df), "-", dtype=object)
+    if col in df.columns:
+        values = df[col]
+        mask = values.notna().to_numpy()
+        out[mask] = [str(v).strip() for v in values[mask]]
+    return out
+
+
+# -------------------------------
+# 🖥 حساب حالة الماكينة (بدون واجهة)
+# -------------------------------
+def _unique_pairs(rows, masks):
+    """مثل np.unique(axis=0) لأقنعة أعداد بايثون (أكثر من 63 خدمة)"""
+    seen = {}
+    ids = np.array([seen.setdefault((int(r), m), len(seen)) for r, m in zip(rows, masks)], dtype=np.intp)
+    return list(seen), ids
+
+def compute_status(card_num, slice_index, event_index, view_option, current_tons, min_range=None, max_range=None,
+                   with_slice=False):
+    """جدول نتائج الفحص لكل (شريحة، حدث) - None إذا لا توجد شرائح مطابقة
+
+    with_slice=True يضيف عمود SLICE_COL (رقم صف الشريحة في ServicePlan).
+    """
+    slice_pos = slice_index.select(view_option, current_tons, min_range, max_range)
+    if len(slice_pos) == 0:
+        return None
+
+    join_slice, join_event = event_index.join(slice_index.mins[slice_pos], slice_index.maxs[slice_pos])
+
+    # الخدمات غير المنفذة: AND-NOT واحد لكل صف، ثم نص لكل (شريحة، قناع) مختلف
+    vocab = slice_index.vocab
+    join_plan = slice_pos[join_slice]
+    missing = slice_index.needed_masks[join_plan] & ~event_index.done_masks(vocab)[join_event]
+    if vocab.dtype is object:
+        combos, combo_ids = _unique_pairs(join_plan, missing)
+    else:
+        combos, combo_ids = np.unique(np.column_stack([join_plan, missing]), axis=0, return_inverse=True)
+    combo_not_done = []
+    for plan_row, mask in combos:
+        not_done = [orig for orig, bit in zip(slice_index.needed[plan_row], slice_index.needed_bits[plan_row]) if mask & bit]
+        combo_not_done.append(", ".join(not_done) if not_done else "-")
+    combo_not_done = np.array(combo_not_done, dtype=object)
+
+    # شرائح بدون أحداث: سجل واحد بدون خدمات منجزة (event = -1)
+    empty_slices = np.setdiff1d(np.arange(len(slice_pos)), join_slice)
+    row_slice = np.concatenate([join_slice, empty_slices])
+    row_event = np.concatenate([join_event, np.full(len(empty_slices), -1, dtype=np.intp)])
+    order = np.lexsort((row_event, row_slice))
+    row_slice, row_event = row_slice[order], row_event[order]
+    has_event = row_event >= 0
+    events = row_event[has_event]
+    plan_rows = slice_pos[row_slice]
+    plan = slice_index.df.iloc[plan_rows]
+
+    def per_event(values, empty):
+        out = np.full(len(row_slice), empty, dtype=object)
+        out[has_event] = values
+        return out
+
+    not_done = np.array(slice_index.needed_text, dtype=object)[plan_rows]
+    not_done[has_event] = combo_not_done[combo_ids.reshape(-1)][order[has_event]]
+
+    result = pd.DataFrame({
+        "Card Number": card_num,
+        "Min_Tons": plan["Min_Tones"].to_numpy(),
+        "Max_Tons": plan["Max_Tones"].to_numpy(),
+        "Service Needed": np.array(slice_index.needed_label, dtype=object)[plan_rows],
+        "Service Done": per_event(np.array(event_index.pattern_done_text, dtype=object)[event_index.pattern_ids[events]], "-"),
+        "Service Didn't Done": not_done,
+        "Tones": per_event(event_index.text["Tones"][events], "-"),
+        "Event": per_event(event_index.text["Event"][events], "-"),
+        "Correction": per_event(event_index.text["Correction"][events], "-"),
+        "Servised by": per_event(event_index.text["Servised by"][events], "-"),
+        "Date": per_event(event_index.text["Date"][events], "-"),
+    }, columns=RESULT_COLUMNS)
+    if with_slice:
+        result.insert(0, SLICE_COL, plan_rows)
+    return result.dropna(how="all").reset_index(drop=True)
+
+
+# -------------------------------
+# 📋 جدول الامتثال الكامل (يُحسب مرة لكل نسخة ثم يُفلتر)
+# -------------------------------
+def compliance_table(card_num, slice_index, event_index):
+    """كل (شريحة، حدث) للماكينة مع رقم الشريحة؛ كل أوضاع العرض فلترة له"""
+    table = compute_status(card_num, slice_index, event_index, VIEW_ALL, 0, with_slice=True)
+    return table if table is not None else pd.DataFrame(columns=[SLICE_COL] + RESULT_COLUMNS)
+
+def filter_compliance(table, slice_index, view_option, current_tons, min_range=None, max_range=None):
+    """نفس ناتج compute_status لنطاق العرض، من الجدول الكامل"""
+    slice_pos = slice_index.select(view_option, current_tons, min_range, max_range)
+    if len(slice_pos) == 0:
+        return None
+    rows = table[SLICE_COL].isin(slice_pos).to_numpy()
+    return table[rows].drop(columns=SLICE_COL).reset_index(drop=True)
@@ -0,0 +1,229 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ===============================
+# قياس زمن المراحل (spans) + سجل JSONL + ملف Prometheus
+# ===============================
+SPANS_FILE = "spans.jsonl"
+PROM_FILE = "cmms.prom"
+WINDOW = 1000                    # آخر N قياس لكل مرحلة لحساب p50/p95
+QUANTILES = (0.5, 0.95)
+MAX_LOG_BYTES = 16 * 1024 * 1024  # عند تجاوزه يُنقل السجل إلى spans.jsonl.1
+PROM_INTERVAL = 5.0              # أقل مدة (ثوان) بين كتابتين لملف Prometheus
+SUMMARY_COLUMNS = ["المرحلة", "العدد", "p50 (ms)", "p95 (ms)", "الأقصى (ms)", "الصفوف", "البايتات", "الأخطاء"]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(prefix=".prom", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Stage:
+    """إحصاءات مرحلة واحدة: آخر WINDOW زمن + مجاميع منذ بدء العملية"""
+
+    def __init__(self, window):
+        self.durations = deque(maxlen=window)
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0.0
+        self.bytes = 0.0
+        self.errors = 0
+
+    def add(self, seconds, fields, error):
+        self.durations.append(seconds)
+        self.count += 1
+        self.seconds += seconds
+        self.rows += _number(fields.get("rows", 0))
+        self.bytes += _number(fields.get("bytes", 0))
+        self.errors += error is not None
+
+    def quantiles(self):
+        if not self.durations:
+            return [0.0] * len(QUANTILES)
+        return list(np.quantile(np.fromiter(self.durations, dtype=float), QUANTILES))
+
+
+# -------------------------------
+# ⏱ المسجل
+# -------------------------------
+class Timings:
+    """مسجل مراحل مشترك بين كل الجلسات والخيوط
+
+    with span("read_excel", rows=...) as info: ... ؛ info (dict) يمكن ملؤه داخل
+    الـ span بعدد الصفوف والبايتات بعد معرفتها. بدون directory تبقى القياسات في الذاكرة.
+    """
+
+    def __init__(self, directory=None, window=WINDOW, prom_interval=PROM_INTERVAL):
+        self.directory = directory
+        self.window = window
+        self.prom_interval = prom_interval
+        self._stages = {}
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._prom_written = 0.0
+        self._flush_timer = None
+
+    def configure(self, directory):
+        """مجلد ملفات السجل (None يوقف الكتابة على القرص)"""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory or None
+
+    @contextmanager
+    def span(self, stage, **fields):
+        info = dict(fields)
+        error = None
+        start = time.perf_counter()
+        try:
+            yield info
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, error, **info)
+
+    def record(self, stage, seconds, error=None, **fields):
+        entry = {"ts": round(time.time(), 3), "stage": stage, "ms": round(seconds * 1000, 3), **fields}
+        if error is not None:
+            entry["error"] = error
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = _Stage(self.window)
+            stats.add(seconds, fields, error)
+            self._recent.append(entry)
+        if self.directory:
+            try:
+                self._append(entry)
+            except OSError:
+                pass  # القياس لا يوقف التطبيق
+            self._schedule_flush()
+
+    # -------------------------------
+    # 💾 الملفات
+    # -------------------------------
+    def _append(self, entry):
+        path = os.path.join(self.directory, SPANS_FILE)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._io_lock:
+            try:
+                if os.path.getsize(path) > MAX_LOG_BYTES:
+                    os.replace(path, path + ".1")
+            except OSError:
+                pass
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _schedule_flush(self):
+        """ملف Prometheus يُكتب مرة كل prom_interval على الأكثر (بمؤقت في الخلفية)"""
+        with self._lock:
+            if self._flush_timer is not None:
+                return
+            delay = max(0.0, self._prom_written + self.prom_interval - time.monotonic())
+            self._flush_timer = threading.Timer(delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """كتابة ملف Prometheus الآن"""
+        with self._lock:
+            self._flush_timer = None
+        if not self.directory:
+            return
+        text = self.prometheus()
+        with self._io_lock:
+            try:
+                _write_atomic(os.path.join(self.directory, PROM_FILE), text)
+            except OSError:
+                pass
+            self._prom_written = time.monotonic()
+
+    # -------------------------------
+    # 📊 الملخصات
+    # -------------------------------
+    def prometheus(self):
+        """نص بصيغة Prometheus (textfile collector)"""
+        lines = [
+            "# HELP cmms_stage_seconds Duration of CMMS stages (quantiles over the last spans).",
+            "# TYPE cmms_stage_seconds summary",
+        ]
+        totals = []
+        with self._lock:
+            for stage, stats in sorted(self._stages.items()):
+                name = _label(stage)
+                for q, value in zip(QUANTILES, stats.quantiles()):
+                    lines.append(f'cmms_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'cmms_stage_seconds_sum{{stage="{name}"}} {stats.seconds:.6f}')
+                lines.append(f'cmms_stage_seconds_count{{stage="{name}"}} {stats.count}')
+                totals.append((name, stats.rows, stats.bytes, stats.errors))
+        for metric, column, help_text in (
+            ("cmms_stage_rows_total", 1, "Rows processed by CMMS stages."),
+            ("cmms_stage_bytes_total", 2, "Bytes read or written by CMMS stages."),
+            ("cmms_stage_errors_total", 3, "CMMS stages that raised an exception."),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{stage="{row[0]}"}} {row[column]:g}' for row in totals)
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """جدول لكل مرحلة: العدد، p50/p95/الأقصى (ms) من آخر القياسات، ومجاميع الصفوف والبايتات"""
+        rows = []
+        with self._lock:
+            for stage, stats in sorted(self._stages.items()):
+                p50, p95 = stats.quantiles()
+                rows.append([
+                    stage, stats.count, p50 * 1000, p95 * 1000, max(stats.durations, default=0.0) * 1000,
+                    int(stats.rows), int(stats.bytes), stats.errors,
+                ])
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+    def recent(self, limit=50):
+        """آخر limit قياس (الأحدث أولاً)"""
+        with self._lock:
+            entries = list(self._recent)[-limit:]
+        recent = pd.DataFrame(entries[::-1])
+        if not recent.empty:
+            recent["ts"] = pd.to_datetime(recent["ts"], unit="s")
+        return recent
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+
+
+# مسجل واحد للعملية (مثل logging)؛ الوحدات تستدعي span() مباشرة
+TIMINGS = Timings()
+
+def span(stage, **fields):
+    return TIMINGS.span(stage, **fields)
@@ -0,0 +1,441 @@
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from sheet_cache import read_workbook, typed_frame
+from workbook_writer import write_workbook
+
+# ===============================
+# مخزن SQLite لشيتات المصنف (اختياري بدلاً من ملف Excel)
+# ===============================
+# كل صف في جدول rows واحد؛ القيم كاملة في data (JSON بترتيب أعمدة الشيت)
+# ومعها أعمدة مفهرسة للاستعلام: card و Min_Tones و Max_Tones و Date.
+# pos مفتاح ترتيب بفجوات (ليس رقم الصف): الإدراج يأخذ مفاتيح بين جاريه
+# بدون تحريك باقي الصفوف، ويُعاد الترقيم فقط إذا ضاقت الفجوة.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sheets (
+    name     TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    columns  TEXT NOT NULL,
+    version  INTEGER NOT NULL,
+    dtypes   TEXT
+);
+CREATE TABLE IF NOT EXISTS rows (
+    id        INTEGER PRIMARY KEY,
+    sheet     TEXT NOT NULL,
+    pos       REAL NOT NULL,
+    card      INTEGER,
+    Min_Tones REAL,
+    Max_Tones REAL,
+    Date      TEXT,
+    data      TEXT NOT NULL
+);
+"""
+# بعد _migrate (قواعد قديمة بدون الأعمدة المفهرسة)
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_rows_sheet_pos ON rows (sheet, pos);
+CREATE INDEX IF NOT EXISTS idx_rows_card_range ON rows (card, Min_Tones, Max_Tones);
+CREATE INDEX IF NOT EXISTS idx_rows_date ON rows (Date);
+"""
+_KEY_COLUMNS = (("card", "INTEGER"), ("Min_Tones", "REAL"), ("Max_Tones", "REAL"), ("Date", "TEXT"))
+
+_CARD_SHEET_RE = re.compile(r"^Card(\d+)$")
+_DATE_RE = re.compile(r"^\s*(\d{1,2})\s*[\\/.-]\s*(\d{1,2})\s*[\\/.-]\s*(\d{4})\s*$")
+_NUMERIC_DTYPES = {"int64", "float64"}
+POS_GAP = 1024.0  # المسافة بين مفاتيح الصفوف المتتالية بعد الكتابة الكاملة أو إعادة الترقيم
+
+
+# -------------------------------
+# 🧰 تحويل القيم
+# -------------------------------
+def _encode(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"$time": value.isoformat()}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+def _decode(value):
+    if isinstance(value, dict):
+        if "$datetime" in value:
+            return datetime.datetime.fromisoformat(value["$datetime"])
+        if "$date" in value:
+            return datetime.date.fromisoformat(value["$date"])
+        if "$time" in value:
+            return datetime.time.fromisoformat(value["$time"])
+    return value
+
+def _tons(df, col):
+    """مثل EventIndex: القيم الفارغة أو غير الرقمية = 0 (فيطابق استعلام النطاق ربط الأحداث بالشرائح)"""
+    if col not in df.columns:
+        return [0.0] * len(df)
+    return pd.to_numeric(df[col], errors="coerce").fillna(0).astype(float).tolist()
+
+def _date_key(value):
+    """التاريخ بصيغة YYYY-MM-DD للفهرسة (التواريخ النصية بصيغة يوم\\شهر\\سنة)"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime("%Y-%m-%d")
+    match = _DATE_RE.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+    day, month, year = (int(g) for g in match.groups())
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+def _card_number(sheet_name):
+    match = _CARD_SHEET_RE.match(sheet_name)
+    return int(match.group(1)) if match else None
+
+def _key_rows(name, df):
+    """(card, Min_Tones, Max_Tones, Date) لكل صف؛ card رقم شيت Card{n} (None لباقي الشيتات)"""
+    card = _card_number(name)
+    dates = [_date_key(v) for v in df["Date"]] if "Date" in df.columns else [None] * len(df)
+    return [(card, lo, hi, date) for lo, hi, date in zip(_tons(df, "Min_Tones"), _tons(df, "Max_Tones"), dates)]
+
+def _dtypes(df):
+    """أنواع typed_frame لأعمدة الشيت (لتطابقها الأجزاء المقروءة باستعلام نطاق)"""
+    return {str(col): str(dtype) for col, dtype in typed_frame(df).dtypes.items()}
+
+def _merge_dtypes(old, new):
+    """أنواع الشيت بعد إضافة صفوف بأنواع new؛ None إذا لم تُعرف بدون قراءة الشيت كاملاً"""
+    merged = {}
+    for col, a in old.items():
+        b = new.get(col, a)
+        if a == b:
+            merged[col] = a
+        elif {a, b} <= _NUMERIC_DTYPES:
+            merged[col] = "float64"
+        elif "object" in (a, b):
+            merged[col] = "object"
+        else:
+            return None
+    return merged
+
+class RecordStore:
+    """شيتات المصنف في SQLite: استعلامات نطاق مفهرسة وإضافة/حذف على مستوى الصف
+
+    ملف Excel يبقى صيغة التبادل (import_workbook / export_workbook) للمزامنة مع GitHub.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._connection()
+        db.executescript(_SCHEMA)
+        self._migrate(db)
+        db.executescript(_INDEXES)
+        db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+        db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+        self.store_id = db.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+
+    # -------------------------------
+    # 🧰 الاتصال والمعاملات
+    # -------------------------------
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _write(self):
+        return _Transaction(self._connection())
+
+    def _migrate(self, db):
+        """قاعدة من نسخة بدون الأعمدة المفهرسة: إضافتها وملؤها من data"""
+        if "dtypes" not in {r[1] for r in db.execute("PRAGMA table_info(sheets)")}:
+            db.execute("ALTER TABLE sheets ADD COLUMN dtypes TEXT")
+        existing = {r[1] for r in db.execute("PRAGMA table_info(rows)")}
+        missing = [(col, kind) for col, kind in _KEY_COLUMNS if col not in existing]
+        if not missing:
+            return
+        with _Transaction(db) as db:
+            for col, kind in missing:
+                db.execute(f"ALTER TABLE rows ADD COLUMN {col} {kind}")
+            for name in [r[0] for r in db.execute("SELECT name FROM sheets")]:
+                ids = [r[0] for r in db.execute("SELECT id FROM rows WHERE sheet = ? ORDER BY pos", (name,))]
+                df = self._frame(self._columns(db, name), db.execute(
+                    "SELECT data FROM rows WHERE sheet = ? ORDER BY pos", (name,)).fetchall())
+                db.executemany(
+                    "UPDATE rows SET card = ?, Min_Tones = ?, Max_Tones = ?, Date = ? WHERE id = ?",
+                    (keys + (id_,) for keys, id_ in zip(_key_rows(name, df), ids)),
+                )
+
+    def _touch(self, db, name):
+        """رقم نسخة جديد للشيت (مفتاح الكاش يتغير لهذا الشيت فقط)"""
+        generation = int(db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]) + 1
+        db.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (str(generation),))
+        db.execute("UPDATE sheets SET version = ? WHERE name = ?", (generation, name))
+
+    def _columns(self, db, name):
+        row = db.execute("SELECT columns FROM sheets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def _insert(self, db, name, df, keys):
+        db.executemany(
+            "INSERT INTO rows (sheet, pos, card, Min_Tones, Max_Tones, Date, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((name, key, *index_keys, json.dumps([_encode(v) for v in values], ensure_ascii=False))
+             for key, index_keys, values in zip(keys, _key_rows(name, df), df.itertuples(index=False, name=None))),
+        )
+
+    def _replace(self, db, name, df):
+        columns = json.dumps([str(c) for c in df.columns], ensure_ascii=False)
+        dtypes = json.dumps(_dtypes(df), ensure_ascii=False)
+        exists = db.execute("SELECT 1 FROM sheets WHERE name = ?", (name,)).fetchone()
+        if exists:
+            db.execute("UPDATE sheets SET columns = ?, dtypes = ? WHERE name = ?", (columns, dtypes, name))
+            db.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+        else:
+            position = db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM sheets").fetchone()[0]
+            db.execute(
+                "INSERT INTO sheets (name, position, columns, version, dtypes) VALUES (?, ?, ?, 0, ?)",
+                (name, position, columns, dtypes),
+            )
+        self._insert(db, name, df, [(i + 1) * POS_GAP for i in range(len(df))])
+        self._touch(db, name)
+
+    def _frame(self, columns, rows):
+        data = [[_decode(v) for v in json.loads(r[0])] for r in rows]
+        return pd.DataFrame(data, columns=columns, dtype=object) if data else pd.DataFrame(columns=columns, dtype=object)
+
+    # -------------------------------
+    # 📖 القراءة
+    # -------------------------------
+    def is_empty(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sheets").fetchone()[0] == 0
+
+    def sheet_names(self):
+        return [r[0] for r in self._connection().execute("SELECT name FROM sheets ORDER BY position")]
+
+    def sheet_versions(self):
+        """[(اسم الشيت، نسخة)]؛ النسخة تتغير فقط عند تعديل هذا الشيت"""
+        rows = self._connection().execute("SELECT name, version FROM sheets ORDER BY position")
+        return [(name, f"{self.store_id}:{version}") for name, version in rows]
+
+    def read_sheet(self, name):
+        """الشيت كاملاً (dtype=object) بنفس ترتيب الصفوف"""
+        db = self._connection()
+        columns = self._columns(db, name)
+        rows = db.execute("SELECT data FROM rows WHERE sheet = ? ORDER BY pos", (name,)).fetchall()
+        return self._frame(columns, rows)
+
+    def read_sheets(self):
+        return {name: self.read_sheet(name) for name in self.sheet_names()}
+
+    def sheet_dtypes(self, name):
+        """{عمود: نوع typed_frame} للشيت كاملاً (يُحسب من الشيت فقط إذا لم يُعرف بعد حذف صفوف)"""
+        db = self._connection()
+        row = db.execute("SELECT dtypes, version FROM sheets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        if row[0] is not None:
+            return json.loads(row[0])
+        dtypes = _dtypes(self.read_sheet(name))
+        with self._write() as db:
+            db.execute("UPDATE sheets SET dtypes = ? WHERE name = ? AND version = ?",
+                       (json.dumps(dtypes, ensure_ascii=False), name, row[1]))
+        return dtypes
+
+    def read_events(self, sheet_name, min_tons, max_tons):
+        """أحداث Card{n} المتقاطعة مع [min_tons, max_tons] عبر فهرس (card, Min_Tones, Max_Tones)
+
+        نفس شرط EventIndex.join: Min_Tones <= max_tons و Max_Tones >= min_tons.
+        """
+        card = _card_number(sheet_name)
+        if card is None:
+            raise ValueError(f"{sheet_name} ليس شيت Card")
+        db = self._connection()
+        columns = self._columns(db, sheet_name)
+        rows = db.execute(
+            "SELECT data FROM rows WHERE card = ? AND Min_Tones <= ? AND Max_Tones >= ? AND sheet = ? ORDER BY pos",
+            (card, max_tons, min_tons, sheet_name),
+        ).fetchall()
+        return self._frame(columns, rows)
+
+    def events_between(self, start, end):
+        """(اسم الشيت، الصف) للأحداث بين تاريخين (YYYY-MM-DD) عبر فهرس Date"""
+        db = self._connection()
+        rows = db.execute(
+            "SELECT sheet, data FROM rows WHERE Date >= ? AND Date <= ? ORDER BY Date, sheet, pos",
+            (start, end),
+        ).fetchall()
+        columns = {}
+        out = []
+        for sheet, data in rows:
+            if sheet not in columns:
+                columns[sheet] = self._columns(db, sheet)
+            out.append((sheet, dict(zip(columns[sheet], (_decode(v) for v in json.loads(data))))))
+        return out
+
+    # -------------------------------
+    # ✏ الكتابة
+    # -------------------------------
+    def replace_sheet(self, name, df):
+        with self._write() as db:
+            self._replace(db, name, df)
+
+    def delete_sheet(self, name):
+        with self._write() as db:
+            db.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+            db.execute("DELETE FROM sheets WHERE name = ?", (name,))
+
+    def _neighbour_keys(self, db, name, position):
+        """مفتاحا الصفين قبل الموضع position وعنده (None إذا لم يوجد)"""
+        before = after = None
+        if position > 0:
+            rows = db.execute(
+                "SELECT pos FROM rows WHERE sheet = ? ORDER BY pos LIMIT 2 OFFSET ?", (name, position - 1)
+            ).fetchall()
+            before = rows[0][0] if rows else db.execute(
+                "SELECT MAX(pos) FROM rows WHERE sheet = ?", (name,)).fetchone()[0]
+            after = rows[1][0] if len(rows) > 1 else None
+        else:
+            row = db.execute("SELECT pos FROM rows WHERE sheet = ? ORDER BY pos LIMIT 1", (name,)).fetchone()
+            after = row[0] if row else None
+        return before, after
+
+    def _renumber(self, db, name):
+        """مفاتيح بفجوات متساوية من جديد (عندما لا يبقى مكان بين صفين)"""
+        ids = [r[0] for r in db.execute("SELECT id FROM rows WHERE sheet = ? ORDER BY pos", (name,))]
+        db.executemany("UPDATE rows SET pos = ? WHERE id = ?", (((i + 1) * POS_GAP, id_) for i, id_ in enumerate(ids)))
+
+    def _gap_keys(self, db, name, position, count):
+        """count مفتاحاً متزايداً بين جاري الموضع position (بدون تحريك أي صف)"""
+        before, after = self._neighbour_keys(db, name, position)
+        if after is None:
+            start = POS_GAP if before is None else before + POS_GAP
+            return [start + i * POS_GAP for i in range(count)]
+        low = 0.0 if before is None else before
+        step = (after - low) / (count + 1)
+        keys = [low + (i + 1) * step for i in range(count)]
+        if all(low < a < b for a, b in zip(keys, keys[1:] + [after])):
+            return keys
+        self._renumber(db, name)
+        return self._gap_keys(db, name, position, count)
+
+    def _apply_insert(self, db, name, position, df):
+        columns = self._columns(db, name)
+        df = df.reindex(columns=columns)
+        if len(df):
+            # أنواع الأعمدة تُحدّث من الصفوف الجديدة فقط (بدون قراءة الشيت)
+            old = db.execute("SELECT dtypes FROM sheets WHERE name = ?", (name,)).fetchone()[0]
+            empty = db.execute("SELECT 1 FROM rows WHERE sheet = ? LIMIT 1", (name,)).fetchone() is None
+            if empty:
+                dtypes = _dtypes(df)
+            else:
+                dtypes = _merge_dtypes(json.loads(old), _dtypes(df)) if old is not None else None
+            db.execute("UPDATE sheets SET dtypes = ? WHERE name = ?",
+                       (None if dtypes is None else json.dumps(dtypes, ensure_ascii=False), name))
+        keys = self._gap_keys(db, name, max(0, int(position)), len(df))
+        self._insert(db, name, df, keys)
+        self._touch(db, name)
+
+    def _apply_delete(self, db, name, positions):
+        ids = [r[0] for r in db.execute("SELECT id FROM rows WHERE sheet = ? ORDER BY pos", (name,))]
+        doomed = [(ids[p],) for p in set(positions) if 0 <= p < len(ids)]
+        db.executemany("DELETE FROM rows WHERE id = ?", doomed)
+        if doomed:
+            # حذف صف قد يغير نوع عمود (مثلاً آخر خلية نصية): يُعاد حسابه عند أول طلب
+            db.execute("UPDATE sheets SET dtypes = NULL WHERE name = ?", (name,))
+        self._touch(db, name)
+
+    def insert_rows(self, name, position, df):
+        """إدراج صفوف df قبل الصف رقم position (أو في النهاية)"""
+        with self._write() as db:
+            self._apply_insert(db, name, position, df)
+
+    def delete_rows(self, name, positions):
+        """حذف الصفوف بأرقامها الحالية (0 = أول صف)"""
+        with self._write() as db:
+            self._apply_delete(db, name, positions)
+
+    def save_sheets(self, sheets, dirty=None):
+        """حفظ الشيتات المعدلة في معاملة واحدة (نفس واجهة workbook_writer.save_sheets)
+
+        الشيت الذي عُدل بإضافة/حذف صفوف فقط (TrackedSheets.row_ops) تُطبق عليه
+        نفس العمليات صفاً بصف بدلاً من إعادة كتابته.
+        """
+        if dirty is None:
+            dirty = getattr(sheets, "dirty", None)
+        if dirty is None:
+            dirty = set(sheets) | set(self.sheet_names())
+        row_ops = getattr(sheets, "row_ops", {})
+        with self._write() as db:
+            for name in dirty:
+                if name not in sheets:
+                    db.execute("DELETE FROM rows WHERE sheet = ?", (name,))
+                    db.execute("DELETE FROM sheets WHERE name = ?", (name,))
+                elif name in row_ops:
+                    for op, *args in row_ops[name]:
+                        if op == "insert":
+                            self._apply_insert(db, name, *args)
+                        else:
+                            self._apply_delete(db, name, *args)
+                else:
+                    self._replace(db, name, sheets[name])
+        if hasattr(sheets, "mark_clean"):
+            sheets.mark_clean()
+
+    # -------------------------------
+    # 🔄 الاستيراد والتصدير (xlsx)
+    # -------------------------------
+    def import_workbook(self, xlsx_path):
+        """استبدال كل المحتوى بشيتات ملف Excel (معاملة واحدة)"""
+        sheets = read_workbook(xlsx_path, dtype=object)
+        with self._write() as db:
+            db.execute("DELETE FROM rows")
+            db.execute("DELETE FROM sheets")
+            for name, df in sheets.items():
+                self._replace(db, name, df)
+
+    def export_workbook(self, xlsx_path):
+        write_workbook(xlsx_path, self.read_sheets())
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def open_store(db_path, xlsx_path):
+    """فتح المخزن، واستيراد ملف Excel إذا كان المخزن فارغاً"""
+    store = RecordStore(db_path)
+    if store.is_empty() and os.path.exists(xlsx_path):
+        store.import_workbook(xlsx_path)
+    return store
@@ -0,0 +1,86 @@
+import datetime
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# ===============================
+# تصدير جداول النتائج (xlsx / csv / parquet)
+# ===============================
+# الصيغة -> (امتداد الملف، نوع MIME)
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
+SPOOL_LIMIT = 8 * 1024 * 1024  # أكبر من ذلك يُكتب الملف المؤقت على القرص
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or PARQUET_AVAILABLE]
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def _cell(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool, datetime.date, datetime.time, datetime.timedelta)):
+        return value
+    return str(value)
+
+
+# -------------------------------
+# 💾 الصيغ
+# -------------------------------
+def to_xlsx(df, sheet_name="Sheet1"):
+    """xlsx عبر openpyxl write_only: الصفوف تُكتب تباعاً دون بناء الشيت في الذاكرة"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name[:31])
+    ws.append([str(c) for c in df.columns])
+    for row in df.itertuples(index=False, name=None):
+        ws.append([_cell(v) for v in row])
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_LIMIT) as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        return tmp.read()
+
+def to_csv(df):
+    # utf-8-sig ليفتح Excel النصوص العربية بشكل صحيح
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+def to_parquet(df):
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("تصدير Parquet يحتاج مكتبة pyarrow.")
+    # أعمدة النصوص المختلطة (أرقام + نصوص) تُحفظ كنص
+    out = df.copy()
+    for col in out.columns:
+        if out[col].dtype == object:
+            out[col] = out[col].map(lambda v: None if _cell(v) is None else str(v))
+    buffer = io.BytesIO()
+    out.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+def export_frame(df, fmt="xlsx", sheet_name="Sheet1"):
+    """محتوى الملف (bytes) بالصيغة المطلوبة"""
+    if fmt == "xlsx":
+        return to_xlsx(df, sheet_name)
+    if fmt == "csv":
+        return to_csv(df)
+    if fmt == "parquet":
+        return to_parquet(df)
+    raise ValueError(f"صيغة تصدير غير معروفة: {fmt}")
@@ -0,0 +1,162 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from sheet_pager import CARD_ALIASES, MIN_ALIASES, MAX_ALIASES, find_column
+
+# ===============================
+# فهرس مرتب لموضع إدراج الصفوف الجديدة
+# ===============================
+# قاعدة الإدراج (نفس تبويب إضافة صف):
+# 1) إذا وُجد صف بنفس (card, Min_Tones, Max_Tones) يُدرج الجديد بعد آخر صف مطابق.
+# 2) وإلا يُدرج بعد عدد الصفوف التي Min_Tones لها أقل من الجديد.
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def to_num_or_none(x):
+    try:
+        value = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+def _cell_text(value):
+    # الخلية الفارغة "" (مثل حقل إدخال فارغ)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+def _text(col):
+    # الخلايا الفارغة None (لا تطابق أي قيمة)
+    text = col.astype(str).str.strip()
+    return [None if pd.isna(v) or v == "" else v for v in text]
+
+
+class _SortedKeys:
+    """مفاتيح مرتبة مع موضع كل صف؛ المفاتيح المتساوية مرتبة حسب الموضع"""
+
+    def __init__(self, keys, positions):
+        order = sorted(range(len(keys)), key=lambda i: (keys[i], positions[i]))
+        self.keys = [keys[i] for i in order]
+        self.positions = np.asarray(positions, dtype=np.int64)[order]
+
+    def last(self, key):
+        """موضع آخر صف بالمفتاح key أو None"""
+        j = bisect.bisect_right(self.keys, key)
+        if j and self.keys[j - 1] == key:
+            return int(self.positions[j - 1])
+        return None
+
+    def shift(self, position, count):
+        self.positions[self.positions >= position] += count
+
+    def add(self, key, position):
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_right(self.keys, key, lo)
+        j = lo + int(np.searchsorted(self.positions[lo:hi], position))
+        self.keys.insert(j, key)
+        self.positions = np.insert(self.positions, j, position)
+
+
+# -------------------------------
+# 📐 الفهرس
+# -------------------------------
+class InsertIndex:
+    """موضع إدراج صف جديد ببحث ثنائي بدلاً من مقارنة كل صفوف الشيت
+
+    يُبنى مرة لكل نسخة من الشيت، ويُحدّث مع كل إدراج (apply) بدلاً من إعادة بنائه.
+    """
+
+    def __init__(self, df):
+        self.card_col = find_column(df, CARD_ALIASES)
+        self.min_col = find_column(df, MIN_ALIASES)
+        self.max_col = find_column(df, MAX_ALIASES)
+        self.size = len(df)
+        if not self.ready:
+            return
+        cards = _text(df[self.card_col]) if self.card_col is not None else [""] * len(df)
+
+        # مطابقة رقمية (قيم الرينج أرقام) ومطابقة نصية (غير ذلك)
+        mins = pd.to_numeric(df[self.min_col], errors="coerce").to_numpy(dtype=float)
+        maxs = pd.to_numeric(df[self.max_col], errors="coerce").to_numpy(dtype=float)
+        keep = [i for i in range(len(df)) if cards[i] is not None and not np.isnan(mins[i]) and not np.isnan(maxs[i])]
+        self._num_keys = _SortedKeys([(cards[i], mins[i], maxs[i]) for i in keep], keep)
+
+        min_text, max_text = _text(df[self.min_col]), _text(df[self.max_col])
+        keep = [i for i in range(len(df)) if None not in (cards[i], min_text[i], max_text[i])]
+        self._text_keys = _SortedKeys([(cards[i], min_text[i], max_text[i]) for i in keep], keep)
+
+        # Min_Tones مرتبة (الفارغ = -1) لقاعدة "عدد الصفوف الأقل"
+        self._mins = np.sort(np.where(np.isnan(mins), -1, mins))
+
+    @property
+    def ready(self):
+        """الشيت فيه أعمدة Min_Tones و Max_Tones"""
+        return self.min_col is not None and self.max_col is not None
+
+    def _keys(self, row):
+        """(مفتاح رقمي، مفتاح نصي) للصف row؛ None إذا كان فيه خلية فارغة"""
+        card = _cell_text(row.get(self.card_col)) if self.card_col is not None else ""
+        min_raw, max_raw = _cell_text(row.get(self.min_col)), _cell_text(row.get(self.max_col))
+        if self.card_col is not None and card == "":
+            return None, None
+        min_num, max_num = to_num_or_none(min_raw), to_num_or_none(max_raw)
+        num_key = (card, min_num, max_num) if min_num is not None and max_num is not None else None
+        text_key = (card, min_raw, max_raw) if min_raw and max_raw else None
+        return num_key, text_key
+
+    def position(self, row):
+        """موضع إدراج الصف row (dict أو Series بأسماء الأعمدة) في الشيت الحالي"""
+        num_key, text_key = self._keys(row)
+        # المطابقة رقمية إذا كان الرينج أرقاماً، وإلا نصية
+        last = None
+        if num_key is not None:
+            last = self._num_keys.last(num_key)
+        elif text_key is not None:
+            last = self._text_keys.last(text_key)
+        if last is not None:
+            return last + 1
+        new_min = to_num_or_none(_cell_text(row.get(self.min_col)))
+        if new_min is None:
+            return self.size
+        return int(np.searchsorted(self._mins, new_min, side="left"))
+
+    def plan(self, rows):
+        """مواضع إدراج دفعة صفوف (DataFrame) محسوبة على الشيت قبل الإدراج
+
+        يرجع [(الموضع، الصفوف)] مرتبة تصاعدياً؛ الصفوف التي تقع في نفس الموضع
+        تبقى بترتيبها في rows.
+        """
+        rows = rows.reset_index(drop=True)
+        positions = [self.position(row) for row in rows.to_dict("records")]
+        order = sorted(range(len(rows)), key=lambda i: (positions[i], i))
+        blocks = []
+        for i in order:
+            if blocks and blocks[-1][0] == positions[i]:
+                blocks[-1][1].append(i)
+            else:
+                blocks.append((positions[i], [i]))
+        return [(pos, rows.iloc[idx]) for pos, idx in blocks]
+
+    def apply(self, plan):
+        """تحديث الفهرس بعد إدراج plan (نفس ناتج plan) في الشيت"""
+        # من الأعلى للأدنى: إدراج كتلة لا يغير مواضع الكتل التي قبلها
+        for position, block in sorted(plan, key=lambda item: item[0], reverse=True):
+            records = block.to_dict("records")
+            self._num_keys.shift(position, len(records))
+            self._text_keys.shift(position, len(records))
+            new_mins = []
+            for offset, row in enumerate(records):
+                num_key, text_key = self._keys(row)
+                if num_key is not None:
+                    self._num_keys.add(num_key, position + offset)
+                if text_key is not None:
+                    self._text_keys.add(text_key, position + offset)
+                min_num = to_num_or_none(_cell_text(row.get(self.min_col)))
+                new_mins.append(-1 if min_num is None else min_num)
+            new_mins = np.array(new_mins, dtype=float)
+            self._mins = np.insert(self._mins, np.searchsorted(self._mins, new_mins), new_mins)
+            self.size += len(records)
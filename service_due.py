@@ -0,0 +1,190 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from machine_status import EventIndex, normalize_name
+
+# ===============================
+# جدول "الخدمة المستحقة التالية" لكل الماكينات (يُحدّث تدريجياً)
+# ===============================
+DUE_COLUMNS = [
+    "Card Number", "Reached Tons", "Last Done Slice", "Outstanding Slices",
+    "Outstanding Services", "Next Due Tons", "Next Due Services",
+]
+# شريحة مطلوبها no_service لا تحتاج خدمة
+NO_SERVICE = normalize_name("no_service")
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def _mask_bits(masks, width):
+    """أقنعة البت -> مصفوفة bool (صف لكل قناع، عمود لكل خدمة)"""
+    masks = np.asarray(masks)
+    if width == 0:
+        return np.zeros((len(masks), 0), dtype=bool)
+    if masks.dtype != object:
+        return ((masks[:, None] >> np.arange(width)) & 1).astype(bool)
+    return np.array([[(int(m) >> i) & 1 for i in range(width)] for m in masks], dtype=bool).reshape(len(masks), width)
+
+def _filled(text):
+    """نص عرض لخلية لها قيمة (الفارغة أو المسافات فقط = بدون قيمة، كما بعد الحفظ وإعادة القراءة)"""
+    return (text != "-") & (text != "")
+
+def _slice_label(lo, hi):
+    return f"{lo:g}-{hi:g}"
+
+
+# -------------------------------
+# 🔧 حالة ماكينة واحدة
+# -------------------------------
+class CardDue:
+    """عدّادات (شريحة × خدمة) من أحداث شيت Card{n}
+
+    counts[s, k] = عدد الأحداث المتقاطعة مع الشريحة s التي نفذت الخدمة k،
+    فإضافة صف أو حذفه يغير العدّادات فقط (بدون إعادة حساب من الأحداث كلها).
+    """
+
+    def __init__(self, slice_index, card_df=None):
+        self.slices = slice_index
+        width = len(slice_index.vocab.names)
+        self.events = np.zeros(len(slice_index.df), dtype=np.int64)
+        self.counts = np.zeros((len(slice_index.df), width), dtype=np.int64)
+        self._reached = {}  # Max_Tones -> عدد الأحداث (لأقصى طن وصلته الماكينة)
+        if card_df is not None:
+            self.add_rows(card_df)
+
+    def _apply(self, rows, sign):
+        if rows is None or len(rows) == 0:
+            return
+        index = EventIndex(rows)
+        slices = self.slices
+        done = _mask_bits(index.done_masks(slices.vocab), self.counts.shape[1])
+        # صفوف الرينج الفارغة (قالب بدون خدمات ولا أطنان ولا تاريخ) ليست أحداثاً
+        recorded = done.any(axis=1) | _filled(index.text["Tones"]) | _filled(index.text["Date"])
+        join_slice, join_event = index.join(slices.mins, slices.maxs)
+        keep = recorded[join_event]
+        join_slice, join_event = join_slice[keep], join_event[keep]
+        np.add.at(self.events, join_slice, sign)
+        np.add.at(self.counts, join_slice, sign * done[join_event].astype(np.int64))
+        for value in index.maxs[recorded]:
+            count = self._reached.get(value, 0) + sign
+            if count > 0:
+                self._reached[value] = count
+            else:
+                self._reached.pop(value, None)
+
+    def add_rows(self, rows):
+        self._apply(rows, 1)
+
+    def remove_rows(self, rows):
+        self._apply(rows, -1)
+
+    def summary(self, card_num):
+        """صف الماكينة في جدول الاستحقاق"""
+        slices = self.slices
+        width = self.counts.shape[1]
+        needed = _mask_bits(slices.needed_masks, width)
+        if NO_SERVICE in slices.vocab.bits:
+            needed[:, slices.vocab.bits[NO_SERVICE]] = False
+        missing = needed & (self.counts <= 0)
+        valid = ~(np.isnan(slices.mins) | np.isnan(slices.maxs))
+        complete = valid & (self.events > 0) & ~missing.any(axis=1)
+        reached = max(self._reached) if self._reached else 0.0
+
+        last_done = "-"
+        if complete.any():
+            s = np.flatnonzero(complete)[np.argmax(slices.maxs[complete])]
+            last_done = _slice_label(slices.mins[s], slices.maxs[s])
+
+        # شرائح بدأت (Min <= أقصى طن) وفيها خدمات لم تُنفذ
+        open_slices = valid & (slices.mins <= reached) & missing.any(axis=1)
+        outstanding = [
+            orig for s in np.flatnonzero(open_slices)
+            for orig, bit in zip(slices.needed[s], slices.needed_bits[s])
+            if bit and missing[s, bit.bit_length() - 1]
+        ]
+
+        upcoming = np.flatnonzero(valid & (slices.mins > reached) & needed.any(axis=1))
+        next_due, next_services = np.nan, "-"
+        if len(upcoming):
+            s = upcoming[np.argmin(slices.mins[upcoming])]
+            next_due, next_services = float(slices.mins[s]), slices.needed_text[s]
+
+        return {
+            "Card Number": card_num,
+            "Reached Tons": reached,
+            "Last Done Slice": last_done,
+            "Outstanding Slices": int(open_slices.sum()),
+            "Outstanding Services": ", ".join(dict.fromkeys(outstanding)) or "-",
+            "Next Due Tons": next_due,
+            "Next Due Services": next_services,
+        }
+
+
+# -------------------------------
+# 📋 كل الماكينات
+# -------------------------------
+class FleetDue:
+    """جدول الاستحقاق لكل الماكينات مع نسخة كل شيت
+
+    sync() يعيد بناء الماكينات التي تغيرت نسختها فقط، و update() يطبق
+    الصفوف المضافة/المحذوفة على ماكينة واحدة.
+    """
+
+    def __init__(self, slice_index):
+        self.slices = slice_index
+        self.cards = {}     # رقم الماكينة -> CardDue
+        self.versions = {}  # رقم الماكينة -> نسخة الشيت المحسوبة
+        self._rows = {}     # رقم الماكينة -> صف الجدول (كاش حتى التعديل التالي)
+        self._lock = threading.Lock()
+
+    def sync(self, card_versions, loader):
+        """card_versions: {رقم الماكينة: نسخة الشيت}؛ loader(رقم) يرجع شيت الماكينة"""
+        with self._lock:
+            for card_num in set(self.cards) - set(card_versions):
+                self._drop(card_num)
+            for card_num, version in card_versions.items():
+                if self.versions.get(card_num) != version:
+                    self.cards[card_num] = CardDue(self.slices, loader(card_num))
+                    self.versions[card_num] = version
+                    self._rows.pop(card_num, None)
+
+    def update(self, card_num, old_version, new_version, added=None, removed=None):
+        """تطبيق صفوف مضافة/محذوفة (True) أو ترك الماكينة لإعادة البناء في sync التالي (False)"""
+        with self._lock:
+            card = self.cards.get(card_num)
+            if card is None or self.versions.get(card_num) != old_version:
+                return False
+            card.remove_rows(removed)
+            card.add_rows(added)
+            self.versions[card_num] = new_version
+            self._rows.pop(card_num, None)
+            return True
+
+    def _drop(self, card_num):
+        self.cards.pop(card_num, None)
+        self.versions.pop(card_num, None)
+        self._rows.pop(card_num, None)
+
+    def table(self):
+        """الجدول كاملاً مرتباً حسب رقم الماكينة"""
+        with self._lock:
+            for card_num, card in self.cards.items():
+                if card_num not in self._rows:
+                    self._rows[card_num] = card.summary(card_num)
+            rows = [self._rows[n] for n in sorted(self.cards)]
+        return pd.DataFrame(rows, columns=DUE_COLUMNS)
+
+    def due_soon(self, tonnages, window):
+        """الماكينات المتأخرة أو التي يفصلها عن الخدمة التالية window طن أو أقل
+
+        tonnages: {رقم الماكينة: الأطنان الحالية}؛ الماكينات بدون أطنان تُتجاهل.
+        """
+        table = self.table()
+        table.insert(1, "Current Tons", table["Card Number"].map(tonnages))
+        table = table[table["Current Tons"].notna()]
+        table.insert(2, "Tons To Next Due", table["Next Due Tons"] - table["Current Tons"])
+        soon = (table["Tons To Next Due"] <= window) | (table["Outstanding Slices"] > 0)
+        return table[soon].sort_values(["Tons To Next Due", "Card Number"]).reset_index(drop=True)
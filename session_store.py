@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+# ===============================
+# جلسات المستخدمين في SQLite (WAL)
+# ===============================
+LOGIN_OK = "ok"
+LOGIN_ALREADY_ACTIVE = "already_active"  # المستخدم مسجل دخول بالفعل
+LOGIN_FULL = "full"                      # وصل عدد المستخدمين النشطين للحد الأقصى
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    username   TEXT PRIMARY KEY,
+    login_time REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
+"""
+
+
+class SessionStore:
+    """جلسات نشطة مشتركة بين كل المستخدمين والعمليات
+
+    كل عملية (تسجيل دخول/خروج/انتهاء) معاملة واحدة؛ تسجيل الدخول يأخذ
+    قفل الكتابة (BEGIN IMMEDIATE) قبل عدّ النشطين، فلا يتجاوز دخولان متزامنان الحد.
+    remaining() تُخدم من كاش في الذاكرة لمدة ttl ثانية.
+    """
+
+    def __init__(self, path, duration, ttl=5.0):
+        self.path = path
+        self.duration = duration.total_seconds() if isinstance(duration, timedelta) else float(duration)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._expiry_cache = {}  # username -> (وقت القراءة، expires_at أو None)
+        self._cache_lock = threading.Lock()
+        self._connection().executescript(_SCHEMA)
+
+    # -------------------------------
+    # 🧰 الاتصال والمعاملات
+    # -------------------------------
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self, immediate=False):
+        return _Transaction(self._connection(), immediate)
+
+    def _forget(self, username=None):
+        with self._cache_lock:
+            if username is None:
+                self._expiry_cache.clear()
+            else:
+                self._expiry_cache.pop(username, None)
+
+    # -------------------------------
+    # 🔐 العمليات
+    # -------------------------------
+    def expire(self, now=None):
+        """حذف الجلسات المنتهية؛ يرجع عدد المحذوف"""
+        now = time.time() if now is None else now
+        with self._transaction() as db:
+            removed = db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        if removed:
+            self._forget()
+        return removed
+
+    def login(self, username, max_active=None, force=False):
+        """تسجيل دخول ذري: LOGIN_OK أو LOGIN_ALREADY_ACTIVE أو LOGIN_FULL
+
+        force=True (المسؤول) يتخطى فحص الحد ويجدد الجلسة.
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as db:
+            db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            if not force:
+                if db.execute("SELECT 1 FROM sessions WHERE username = ?", (username,)).fetchone():
+                    return LOGIN_ALREADY_ACTIVE
+                active = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                if max_active is not None and active >= max_active:
+                    return LOGIN_FULL
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (username, login_time, expires_at) VALUES (?, ?, ?)",
+                (username, now, now + self.duration),
+            )
+        self._forget(username)
+        return LOGIN_OK
+
+    def logout(self, username):
+        with self._transaction() as db:
+            db.execute("DELETE FROM sessions WHERE username = ?", (username,))
+        self._forget(username)
+
+    def active_users(self, now=None):
+        now = time.time() if now is None else now
+        rows = self._connection().execute(
+            "SELECT username FROM sessions WHERE expires_at > ? ORDER BY login_time", (now,)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def remaining(self, username):
+        """الوقت المتبقي في جلسة المستخدم (timedelta) أو None إذا لم تكن نشطة"""
+        if not username:
+            return None
+        now = time.time()
+        with self._cache_lock:
+            cached = self._expiry_cache.get(username)
+        if cached is None or now - cached[0] > self.ttl:
+            row = self._connection().execute(
+                "SELECT expires_at FROM sessions WHERE username = ?", (username,)
+            ).fetchone()
+            cached = (now, row[0] if row else None)
+            with self._cache_lock:
+                self._expiry_cache[username] = cached
+        expires_at = cached[1]
+        if expires_at is None or expires_at <= now:
+            return None
+        return timedelta(seconds=expires_at - now)
+
+
+class _Transaction:
+    def __init__(self, db, immediate):
+        self.db = db
+        self.immediate = immediate
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE" if self.immediate else "BEGIN")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,371 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import span
+
+# ===============================
+# إعدادات كاش الشيتات على القرص
+# ===============================
+CACHE_DIR_NAME = ".sheet_cache"
+MANIFEST_NAME = "manifest.json"
+CACHE_FORMAT = "1"  # غيّره عند تغيير طريقة قراءة/تنظيف الشيتات لإبطال الكاش القديم
+OPEN_WORKBOOKS = 2  # عدد نسخ الملف المفتوحة للقراءة عند الطلب (الأقدم استخداماً يُغلق)
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_SHARED_REF_RE = re.compile(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>')
+
+
+# -------------------------------
+# 🔑 بصمات الملف والشيتات
+# -------------------------------
+def file_sha256(path, chunk_size=1 << 20):
+    """حساب SHA-256 لمحتوى الملف"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_shared_strings(zf):
+    try:
+        data = zf.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    root = ET.fromstring(data)
+    return ["".join(t.text or "" for t in si.iter(f"{_NS_MAIN}t")) for si in root.iter(f"{_NS_MAIN}si")]
+
+
+def sheet_parts(zf):
+    """أسماء الشيتات بترتيب المصنف مع مسار ملف XML لكل شيت"""
+    rels_root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels_root.iter(f"{_NS_PKG_REL}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = target
+
+    wb_root = ET.fromstring(zf.read("xl/workbook.xml"))
+    parts = []
+    for sheet in wb_root.iter(f"{_NS_MAIN}sheet"):
+        parts.append((sheet.get("name"), targets.get(sheet.get(f"{_NS_REL}id"))))
+    return parts
+
+
+def sheet_fingerprints(path, variant=""):
+    """بصمة لكل شيت لا تتغير إلا إذا تغير محتوى الشيت نفسه
+
+    تُحل مراجع sharedStrings داخل البصمة، فإضافة نص جديد في شيت
+    لا تغيّر بصمات باقي الشيتات رغم إعادة ترقيم الجدول المشترك.
+    """
+    with zipfile.ZipFile(path) as zf:
+        shared = _read_shared_strings(zf)
+        try:
+            styles = zf.read("xl/styles.xml")
+        except KeyError:
+            styles = b""
+        base = hashlib.sha256()
+        base.update(CACHE_FORMAT.encode())
+        base.update(variant.encode("utf-8"))
+        base.update(styles)
+
+        fingerprints = []
+        for name, part in sheet_parts(zf):
+            xml = zf.read(part)
+            h = base.copy()
+            h.update(xml)
+            for idx in _SHARED_REF_RE.findall(xml):
+                i = int(idx)
+                h.update(b"\0")
+                h.update(shared[i].encode("utf-8") if i < len(shared) else b"")
+            fingerprints.append((name, h.hexdigest()))
+        return fingerprints
+
+
+# -------------------------------
+# 📦 قراءة/كتابة الكاش
+# -------------------------------
+def clean_columns(df):
+    """تنظيف أسماء الأعمدة (نصوص بدون مسافات زائدة)"""
+    df.columns = df.columns.astype(str).str.strip()
+    return df
+
+
+def _cache_dir_for(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+
+
+def _read_manifest(cache_dir, variant):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest.get(variant) or {}
+    except Exception:
+        return {}
+
+
+def _write_manifest(cache_dir, variant, entry):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception:
+        manifest = {}
+    manifest[variant] = entry
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+def _write_pickle(df, file_path):
+    tmp = file_path + ".tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, file_path)
+
+
+def _prune(cache_dir, manifest):
+    keep = {MANIFEST_NAME}
+    for entry in manifest.values():
+        keep.update(f"{fp}.pkl" for _, fp in entry.get("sheets", []))
+    for fname in os.listdir(cache_dir):
+        if fname not in keep and (fname.endswith(".pkl") or fname.endswith(".tmp")):
+            try:
+                os.remove(os.path.join(cache_dir, fname))
+            except OSError:
+                pass
+
+
+def _variant(read_kwargs):
+    return json.dumps(read_kwargs, sort_keys=True, default=str)
+
+
+def _pickle_path(cache_dir, fp):
+    return os.path.join(cache_dir, f"{fp}.pkl")
+
+
+def _sync_cache(path, cache_dir, variant, read_kwargs, workbook_hash=None, parse=True):
+    """تجهيز pickle لكل شيت في النسخة الحالية من الملف
+
+    تُحلل فقط الشيتات التي لا يوجد pickle لبصمتها (parse=False: البصمات فقط،
+    وكل شيت يُحلل عند أول طلب في load_sheet).
+    يرجع (البصمات، {الشيتات التي حُللت الآن}).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    workbook_hash = workbook_hash or file_sha256(path)
+    cached = _read_manifest(cache_dir, variant)
+    up_to_date = cached.get("workbook_sha256") == workbook_hash
+    if up_to_date:
+        fingerprints = [tuple(entry) for entry in cached["sheets"]]
+    else:
+        fingerprints = sheet_fingerprints(path, variant)
+
+    parsed = {}
+    missing = [name for name, fp in fingerprints if not os.path.exists(_pickle_path(cache_dir, fp))]
+    if missing and parse:
+        with span("read_excel", sheets=len(missing), bytes=os.path.getsize(path)) as info:
+            parsed = pd.read_excel(path, sheet_name=missing, **read_kwargs)
+            info["rows"] = sum(len(df) for df in parsed.values())
+        for name, fp in fingerprints:
+            if name in parsed:
+                _write_pickle(clean_columns(parsed[name]), _pickle_path(cache_dir, fp))
+
+    if not up_to_date:
+        manifest = _write_manifest(cache_dir, variant, {
+            "workbook_sha256": workbook_hash,
+            "sheets": fingerprints,
+        })
+        _prune(cache_dir, manifest)
+    return fingerprints, parsed
+
+
+# -------------------------------
+# 📖 قراءة شيت واحد عند الطلب (openpyxl read-only)
+# -------------------------------
+_open_workbooks = OrderedDict()  # (مسار، توقيع stat) -> pd.ExcelFile
+_workbooks_lock = threading.RLock()
+
+
+def _excel_file(path):
+    """ExcelFile مفتوح لنسخة الملف الحالية؛ أسماء الشيتات والنصوص المشتركة تُقرأ مرة واحدة"""
+    key = (os.path.abspath(path), _stat_signature(path))
+    book = _open_workbooks.get(key)
+    if book is not None:
+        _open_workbooks.move_to_end(key)
+        return book
+    # محرك openpyxl في pandas يفتح الملف read_only: كل شيت يُقرأ كتدفق XML عند تحليله فقط
+    book = pd.ExcelFile(path, engine="openpyxl")
+    _open_workbooks[key] = book
+    while len(_open_workbooks) > OPEN_WORKBOOKS:
+        _, old = _open_workbooks.popitem(last=False)
+        old.close()
+    return book
+
+
+def read_sheet(path, sheet_name, **read_kwargs):
+    """تحليل شيت واحد فقط من الملف (باقي الشيتات لا تُحلل)"""
+    with _workbooks_lock:
+        with span("read_excel", sheets=1) as info:
+            df = _excel_file(path).parse(sheet_name, **read_kwargs)
+            info["rows"] = len(df)
+    return clean_columns(df)
+
+
+def close_workbooks(path=None):
+    """إغلاق المصنفات المفتوحة: كلها، أو نسخ path القديمة فقط (بعد حفظه أو استبداله)"""
+    with _workbooks_lock:
+        if path is None:
+            stale = list(_open_workbooks)
+        else:
+            current = os.path.abspath(path)
+            try:
+                keep = (current, _stat_signature(path))
+            except OSError:
+                keep = None
+            stale = [key for key in _open_workbooks if key[0] == current and key != keep]
+        for key in stale:
+            _open_workbooks.pop(key).close()
+
+
+def load_sheet(path, sheet_name, fingerprint, cache_dir=None, **read_kwargs):
+    """تحميل شيت واحد من كاش القرص ببصمته (وتحليله وحده من الملف إن لم يوجد)"""
+    cache_dir = cache_dir or _cache_dir_for(path)
+    pkl = _pickle_path(cache_dir, fingerprint)
+    try:
+        return pd.read_pickle(pkl)
+    except Exception:
+        pass
+    sig = _stat_signature(path)
+    df = read_sheet(path, sheet_name, **read_kwargs)
+    # يُكتب الناتج تحت البصمة فقط إذا حُسبت البصمة لنفس نسخة الملف التي قُرئت
+    memo = _sheet_versions.get((os.path.abspath(path), cache_dir, _variant(read_kwargs)))
+    try:
+        if memo and memo[0] == sig == _stat_signature(path) and (sheet_name, fingerprint) in memo[1]:
+            os.makedirs(cache_dir, exist_ok=True)
+            _write_pickle(df, pkl)
+        elif os.path.exists(pkl):
+            os.remove(pkl)  # pickle تالف
+    except OSError:
+        pass
+    return df
+
+
+def load_cached_sheets(path, cache_dir=None, **read_kwargs):
+    """تحميل جميع الشيتات مع كاش على القرص مفتاحه SHA-256 للملف
+
+    - الملف لم يتغير: تُقرأ جميع الشيتات من الكاش مباشرة.
+    - الملف تغير: يُعاد تحليل الشيتات التي تغيرت بصمتها فقط.
+    """
+    cache_dir = cache_dir or _cache_dir_for(path)
+    fingerprints, sheets = _sync_cache(path, cache_dir, _variant(read_kwargs), read_kwargs)
+    for name, fp in fingerprints:
+        if name not in sheets:
+            sheets[name] = load_sheet(path, name, fp, cache_dir, **read_kwargs)
+    return {name: sheets[name] for name, _ in fingerprints}
+
+
+# -------------------------------
+# 🏷 نسخة الملف وبصمات الشيتات (مفاتيح الكاش في الذاكرة)
+# -------------------------------
+_workbook_versions = {}  # مسار -> (توقيع stat، نسخة الملف)
+_sheet_versions = {}     # (مسار، مجلد الكاش، variant) -> (توقيع stat، البصمات)
+
+
+def _stat_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def workbook_version(path):
+    """نسخة الملف (mtime_ns, sha256)؛ لا يُعاد حساب الـ hash إلا إذا تغير stat"""
+    key = os.path.abspath(path)
+    sig = _stat_signature(path)
+    memo = _workbook_versions.get(key)
+    if memo and memo[0] == sig:
+        return memo[1]
+    version = (sig[0], file_sha256(path))
+    _workbook_versions[key] = (sig, version)
+    return version
+
+
+def sheet_versions(path, cache_dir=None, **read_kwargs):
+    """[(اسم الشيت، بصمة)] للنسخة الحالية (بدون تحليل أي شيت)
+
+    تعديل شيت واحد يغير بصمته فقط، فيصلح (اسم الشيت، البصمة) مفتاحاً
+    لأي كاش مبني على الشيت. لا يُقرأ الملف ما دامت نسخته لم تتغير،
+    وكل شيت يُحلل ويُحفظ في كاش القرص عند أول load_sheet له.
+    """
+    cache_dir = cache_dir or _cache_dir_for(path)
+    variant = _variant(read_kwargs)
+    key = (os.path.abspath(path), cache_dir, variant)
+    sig = _stat_signature(path)
+    memo = _sheet_versions.get(key)
+    if memo and memo[0] == sig:
+        return memo[1]
+    fingerprints, _ = _sync_cache(path, cache_dir, variant, read_kwargs, workbook_version(path)[1], parse=False)
+    _sheet_versions[key] = (sig, fingerprints)
+    return fingerprints
+
+
+# -------------------------------
+# 📂 قراءة المصنف (خارج Streamlit أيضاً)
+# -------------------------------
+def read_workbook(path, **read_kwargs):
+    """قراءة الشيتات عبر كاش القرص، والرجوع للقراءة المباشرة إذا تعذر الكاش"""
+    try:
+        return load_cached_sheets(path, **read_kwargs)
+    except Exception:
+        sheets = pd.read_excel(path, sheet_name=None, **read_kwargs)
+        for name, df in sheets.items():
+            clean_columns(df)
+        return sheets
+
+
+def _typed_column(col):
+    typed = col.infer_objects()
+    if pd.api.types.is_numeric_dtype(typed) or pd.api.types.is_datetime64_any_dtype(typed):
+        return typed
+    # مثل pd.read_excel: عمود كل قيمه أرقام (حتى لو مكتوبة كنص) يصبح رقمياً
+    try:
+        return pd.to_numeric(col)
+    except (ValueError, TypeError):
+        return typed
+
+
+def typed_frame(df, dtypes=None):
+    """نفس أنواع pd.read_excel الافتراضية لشيت خام (dtype=object)
+
+    dtypes: أنواع أعمدة الشيت كاملاً، لجزء من صفوفه (مثلاً عمود فيه خلايا
+    فارغة خارج الجزء يبقى float كما في الشيت كاملاً).
+    """
+    if df.shape[1] == 0:
+        return df.copy()
+    typed = pd.DataFrame({i: _typed_column(df.iloc[:, i]) for i in range(df.shape[1])})
+    typed = typed.set_axis(df.columns, axis=1)
+    for col, dtype in (dtypes or {}).items():
+        if col in typed.columns and typed[col].dtype != dtype:
+            try:
+                typed[col] = typed[col].astype(dtype)
+            except (ValueError, TypeError):
+                pass
+    return typed
+
+
+def typed_view(raw_sheets):
+    """نفس أنواع pd.read_excel الافتراضية من النسخة الخام (dtype=object) بدون إعادة تحليل الملف"""
+    return {name: typed_frame(df) for name, df in raw_sheets.items()}
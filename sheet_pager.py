@@ -0,0 +1,134 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# ===============================
+# عرض الشيتات الكبيرة على صفحات (الفلترة والتقسيم على السيرفر)
+# ===============================
+CARD_ALIASES = ("card", "machine", "machine_no", "machine id")
+MIN_ALIASES = ("min_tones", "min_tone", "min tones", "min")
+MAX_ALIASES = ("max_tones", "max_tone", "max tones", "max")
+DATE_ALIASES = ("date",)
+
+
+# -------------------------------
+# 🧰 دوال مساعدة
+# -------------------------------
+def find_column(df, aliases):
+    """أول عمود يطابق اسمه أحد الأسماء البديلة (بدون حساسية لحالة الأحرف)"""
+    for col in df.columns:
+        if str(col).strip().lower() in aliases:
+            return col
+    return None
+
+def parse_dates(col):
+    """تواريخ العمود (خلايا تاريخ أو نصوص يوم\\شهر\\سنة)؛ غير المفهوم NaT"""
+    is_date = col.map(lambda v: isinstance(v, (datetime.date, pd.Timestamp)))
+    dates = pd.to_datetime(col.where(is_date), errors="coerce")
+    text = col.where(~is_date).astype(str).str.strip().str.replace(r"[\\/.-]", "/", regex=True)
+    parsed = pd.to_datetime(text, format="%d/%m/%Y", errors="coerce")
+    return dates.fillna(parsed)
+
+
+# -------------------------------
+# 🔎 الفلترة والصفحات
+# -------------------------------
+def filter_positions(df, card=None, min_tons=None, max_tons=None, date_from=None, date_to=None):
+    """أرقام الصفوف (مواضعها في الشيت) المطابقة للفلاتر؛ الفلتر None يُتجاهل"""
+    keep = np.ones(len(df), dtype=bool)
+
+    card_col = find_column(df, CARD_ALIASES)
+    if card not in (None, "") and card_col is not None:
+        values = df[card_col]
+        as_number = pd.to_numeric(values, errors="coerce")
+        try:
+            keep &= (as_number == float(card)).to_numpy()
+        except ValueError:
+            keep &= (values.astype(str).str.strip() == str(card).strip()).to_numpy()
+
+    min_col, max_col = find_column(df, MIN_ALIASES), find_column(df, MAX_ALIASES)
+    if min_col is not None and max_col is not None:
+        # الصف يظهر إذا تقاطعت فترته [Min, Max] مع النطاق المطلوب
+        if max_tons is not None:
+            keep &= (pd.to_numeric(df[min_col], errors="coerce") <= max_tons).to_numpy()
+        if min_tons is not None:
+            keep &= (pd.to_numeric(df[max_col], errors="coerce") >= min_tons).to_numpy()
+
+    date_col = find_column(df, DATE_ALIASES)
+    if date_col is not None and (date_from is not None or date_to is not None):
+        dates = parse_dates(df[date_col])
+        if date_from is not None:
+            keep &= (dates >= pd.Timestamp(date_from)).to_numpy()
+        if date_to is not None:
+            keep &= (dates <= pd.Timestamp(date_to)).to_numpy()
+
+    return np.flatnonzero(keep)
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+def page_positions(positions, page, page_size):
+    """مواضع صفوف الصفحة رقم page (تبدأ من 1)"""
+    page = min(max(1, page), page_count(len(positions), page_size))
+    start = (page - 1) * page_size
+    return positions[start:start + page_size]
+
+def page_view(df, positions):
+    """الصفحة فقط كنصوص للعرض؛ الـ index هو رقم الصف في الشيت (معرف ثابت)"""
+    view = df.iloc[positions].astype(str)
+    view.index = pd.Index(positions, name="row")
+    return view
+
+
+def preview_view(df, center, radius=5):
+    """صفوف قليلة حول الصف center (لعرض نتيجة تعديل بدون إرسال الشيت كله)"""
+    start = max(0, min(int(center), len(df)) - radius)
+    return page_view(df, np.arange(start, min(len(df), start + 2 * radius + 1)))
+
+
+# -------------------------------
+# ✏ إرجاع تعديلات الصفحة للشيت كاملاً
+# -------------------------------
+def _as_text(frame):
+    # الخلايا الفارغة (NaN أو None من المحرر) تُقارن كنص فارغ
+    return frame.astype(str).fillna("")
+
+def merge_page_edits(df, view, edited):
+    """تطبيق تعديلات محرر الصفحة على الشيت كاملاً حسب رقم الصف
+
+    - الخلايا التي تغير نصها فقط تُستبدل (باقي الخلايا تحتفظ بنوعها).
+    - صفوف الصفحة غير الموجودة في edited تُحذف.
+    - الصفوف الجديدة تُدرج بعد آخر صف في الصفحة.
+    يرجع DataFrame جديداً أو None إذا لم يتغير شيء.
+    """
+    df = df.reset_index(drop=True)
+    ids = view.index
+    edited_ids = pd.Index([i for i in edited.index if i in ids])
+    added = edited.loc[[i not in ids for i in edited.index]]
+    deleted = ids.difference(edited_ids)
+
+    out = df.copy()
+    changed = False
+    if len(edited_ids):
+        after = edited.loc[edited_ids, view.columns]
+        diff = _as_text(after).ne(_as_text(view.loc[edited_ids]))
+        for col in view.columns[diff.any(axis=0).to_numpy()]:
+            rows = diff.index[diff[col].to_numpy()]
+            out[col] = out[col].astype(object)
+            out.loc[rows, col] = after.loc[rows, col].astype(object)
+            changed = True
+
+    if len(deleted):
+        out = out.drop(index=deleted)
+        changed = True
+
+    if len(added):
+        added = added.reindex(columns=df.columns).astype(object)
+        after_id = ids.max() if len(ids) else len(df) - 1
+        top = out.loc[out.index <= after_id]
+        bottom = out.loc[out.index > after_id]
+        out = pd.concat([top, added, bottom])
+        changed = True
+
+    return out.reset_index(drop=True).astype(object) if changed else None
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from fleet_report import CARD_SHEET_RE
+from machine_status import IGNORE_COLS, service_performed
+
+# ===============================
+# مخطط أنواع مضغوط لشيتات Card{n} (نسخة التحليل فقط)
+# ===============================
+# نسخة التحرير تبقى dtype=object (تُحفظ الخلايا كما كُتبت)، وهنا يتغير نوع العمود
+# فقط إذا بقي ما يقرؤه التحليل منه كما هو: القيمة الرقمية، نص العرض، والخدمة منفذة أم لا.
+TONNAGE_COLS = ("card", "Min_Tones", "Max_Tones", "Tones")
+# باقي الأعمدة غير الخدمات (Date, Event, Servised by, Correction, Other) -> category
+# (Date يبقى بقيمه الأصلية: نصه المعروض str() للقيمة كما قُرئت، بالوقت إن وُجد)
+# أعمدة الخدمات (كل ما ليس في IGNORE_COLS) -> bool sparse (تُخزن مواضع True فقط)
+
+_INT32 = np.iinfo(np.int32)
+
+
+# -------------------------------
+# 🧰 الأعمدة
+# -------------------------------
+def _tonnage_column(col):
+    """int32 للأعمدة الصحيحة، float32 إذا مثّل كل القيم بدقة، وإلا كما هو"""
+    if not pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+        return col
+    if pd.api.types.is_integer_dtype(col):
+        if len(col) == 0 or (col.min() >= _INT32.min and col.max() <= _INT32.max):
+            return col.astype(np.int32)
+        return col
+    values = col.to_numpy(dtype=float)
+    if np.array_equal(values.astype(np.float32).astype(float), values, equal_nan=True):
+        return col.astype(np.float32)
+    return col
+
+def _category_column(col):
+    if isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_numeric_dtype(col):
+        return col
+    return col.astype("category")
+
+def _service_column(col):
+    done = service_performed(col)
+    return pd.Series(pd.arrays.SparseArray(done, fill_value=False), index=col.index, name=col.name)
+
+
+# -------------------------------
+# 📦 الشيت
+# -------------------------------
+def compact_frame(df):
+    """شيت Card{n} بأنواع typed_frame -> نفس الشيت بالمخطط المضغوط"""
+    columns = {}
+    for i, name in enumerate(df.columns):
+        col = df.iloc[:, i]
+        if name in TONNAGE_COLS:
+            col = _tonnage_column(col)
+        elif name in IGNORE_COLS:
+            col = _category_column(col)
+        else:
+            col = _service_column(col)
+        columns[i] = col.reset_index(drop=True)
+    compact = pd.DataFrame(columns, index=range(len(df))).set_axis(df.columns, axis=1)
+    compact.index = df.index
+    return compact
+
+def compact_sheets(sheets):
+    """المخطط المضغوط لشيتات Card{n} فقط (ServicePlan و Machine كما هي)"""
+    return {
+        name: compact_frame(df) if CARD_SHEET_RE.match(str(name).strip()) else df
+        for name, df in sheets.items()
+    }
@@ -0,0 +1,169 @@
+"""حلقة check_machine_status الأصلية (قبل الفهارس) كمرجع للاختبارات"""
+import re
+
+import pandas as pd
+
+IGNORE_COLS = {"card", "Tones", "Min_Tones", "Max_Tones", "Date", "Other", "Servised by", "Event", "Correction"}
+
+
+def read_sheets(path):
+    """نفس load_all_sheets الأصلية: pd.read_excel بالأنواع الافتراضية"""
+    sheets = pd.read_excel(path, sheet_name=None)
+    for df in sheets.values():
+        df.columns = df.columns.astype(str).str.strip()
+    return sheets
+
+
+def normalize_name(s):
+    if s is None: return ""
+    s = str(s).replace("\n", "+")
+    s = re.sub(r"[^0-9a-zA-Z؀-ۿ\+\s_/.-]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+
+def split_needed_services(needed_service_str):
+    if not isinstance(needed_service_str, str) or needed_service_str.strip() == "":
+        return []
+    parts = re.split(r"\+|,|\n|;", needed_service_str)
+    return [p.strip() for p in parts if p.strip() != ""]
+
+
+def baseline_status(card_num, service_plan_df, card_df, view_option, current_tons, min_range, max_range):
+    if view_option == "الشريحة الحالية فقط":
+        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] <= current_tons) & (service_plan_df["Max_Tones"] >= current_tons)]
+    elif view_option == "كل الشرائح الأقل":
+        selected_slices = service_plan_df[service_plan_df["Max_Tones"] <= current_tons]
+    elif view_option == "كل الشرائح الأعلى":
+        selected_slices = service_plan_df[service_plan_df["Min_Tones"] >= current_tons]
+    elif view_option == "نطاق مخصص":
+        selected_slices = service_plan_df[(service_plan_df["Min_Tones"] >= min_range) & (service_plan_df["Max_Tones"] <= max_range)]
+    else:
+        selected_slices = service_plan_df.copy()
+
+    if selected_slices.empty:
+        return None
+
+    all_results = []
+    for _, current_slice in selected_slices.iterrows():
+        slice_min = current_slice["Min_Tones"]
+        slice_max = current_slice["Max_Tones"]
+        needed_parts = split_needed_services(current_slice.get("Service", ""))
+        needed_norm = [normalize_name(p) for p in needed_parts]
+
+        mask = (card_df.get("Min_Tones", 0).fillna(0) <= slice_max) & (card_df.get("Max_Tones", 0).fillna(0) >= slice_min)
+        matching_rows = card_df[mask]
+
+        if not matching_rows.empty:
+            for _, row in matching_rows.iterrows():
+                done_services_set = set()
+                for col in matching_rows.columns:
+                    if col not in IGNORE_COLS:
+                        val = str(row.get(col, "")).strip()
+                        if val and val.lower() not in ["nan", "none", ""]:
+                            done_services_set.add(col)
+
+                def text(col):
+                    return str(row.get(col, "")).strip() if pd.notna(row.get(col)) else "-"
+
+                done_services = sorted(list(done_services_set))
+                done_norm = [normalize_name(c) for c in done_services]
+                not_done = [orig for orig, n in zip(needed_parts, needed_norm) if n not in done_norm]
+                all_results.append({
+                    "Card Number": card_num,
+                    "Min_Tons": slice_min,
+                    "Max_Tons": slice_max,
+                    "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
+                    "Service Done": ", ".join(done_services) if done_services else "-",
+                    "Service Didn't Done": ", ".join(not_done) if not_done else "-",
+                    "Tones": text("Tones"),
+                    "Event": text("Event"),
+                    "Correction": text("Correction"),
+                    "Servised by": text("Servised by"),
+                    "Date": text("Date"),
+                })
+        else:
+            all_results.append({
+                "Card Number": card_num,
+                "Min_Tons": slice_min,
+                "Max_Tons": slice_max,
+                "Service Needed": " + ".join(needed_parts) if needed_parts else "-",
+                "Service Done": "-",
+                "Service Didn't Done": ", ".join(needed_parts) if needed_parts else "-",
+                "Tones": "-",
+                "Event": "-",
+                "Correction": "-",
+                "Servised by": "-",
+                "Date": "-",
+            })
+
+    return pd.DataFrame(all_results).dropna(how="all").reset_index(drop=True)
+
+
+def assert_same_status(expected, actual):
+    """نفس الجدول كما يُعرض (مقارنة نصية: أنواع الأعمدة الرقمية قد تختلف)"""
+    if expected is None or actual is None:
+        assert expected is None and actual is None
+        return
+    pd.testing.assert_frame_equal(actual.astype(str), expected.astype(str), check_dtype=False)
+
+
+def baseline_insert_position(df_add, new_data):
+    """قاعدة موضع الإدراج الأصلية في تبويب إضافة صف (مسح خطي لكل صفوف الشيت)"""
+    min_col, max_col, card_col = None, None, None
+    for c in df_add.columns:
+        c_low = c.strip().lower()
+        if c_low in ("min_tones", "min_tone", "min tones", "min"):
+            min_col = c
+        if c_low in ("max_tones", "max_tone", "max tones", "max"):
+            max_col = c
+        if c_low in ("card", "machine", "machine_no", "machine id"):
+            card_col = c
+
+    def to_num_or_none(x):
+        try:
+            return float(x)
+        except:
+            return None
+
+    new_min_raw = str(new_data.get(min_col, "")).strip()
+    new_max_raw = str(new_data.get(max_col, "")).strip()
+    new_min_num = to_num_or_none(new_min_raw)
+    new_max_num = to_num_or_none(new_max_raw)
+
+    insert_pos = len(df_add)
+    mask = pd.Series([False] * len(df_add))
+    if card_col:
+        new_card = str(new_data.get(card_col, "")).strip()
+        if new_card != "":
+            if new_min_num is not None and new_max_num is not None:
+                mask = (
+                    (df_add[card_col].astype(str).str.strip() == new_card) &
+                    (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
+                    (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
+                )
+            else:
+                mask = (
+                    (df_add[card_col].astype(str).str.strip() == new_card) &
+                    (df_add[min_col].astype(str).str.strip() == new_min_raw) &
+                    (df_add[max_col].astype(str).str.strip() == new_max_raw)
+                )
+    else:
+        if new_min_num is not None and new_max_num is not None:
+            mask = (
+                (pd.to_numeric(df_add[min_col], errors='coerce') == new_min_num) &
+                (pd.to_numeric(df_add[max_col], errors='coerce') == new_max_num)
+            )
+        else:
+            mask = (
+                (df_add[min_col].astype(str).str.strip() == new_min_raw) &
+                (df_add[max_col].astype(str).str.strip() == new_max_raw)
+            )
+
+    if mask.any():
+        insert_pos = mask[mask].index[-1] + 1
+    else:
+        min_num = pd.to_numeric(df_add[min_col], errors='coerce').fillna(-1)
+        if new_min_num is not None:
+            insert_pos = int((min_num < new_min_num).sum())
+    return insert_pos
@@ -0,0 +1,20 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# ملف العمل المرفق مع الريبو (لا يُعدّل؛ الاختبارات تعمل على نسخة منه)
+WORKBOOK = os.path.join(ROOT, "Machine_Service_Lookup.xlsx")
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """نسخة من ملف العمل في مجلد مؤقت"""
+    path = tmp_path / "Machine_Service_Lookup.xlsx"
+    shutil.copy(WORKBOOK, path)
+    return str(path)
@@ -0,0 +1,90 @@
+import csv
+import json
+
+import pytest
+
+from cmms_cli import QUERY_COLUMNS, VIEW_ALIASES, main
+from machine_status import RESULT_COLUMNS, VIEW_OPTIONS, EventIndex, SliceIndex, compute_status
+from sheet_cache import read_workbook, typed_view
+from sheet_schema import compact_sheets
+
+QUERIES = [
+    {"card": "3", "tons": "600"},                                           # نطاق العرض الافتراضي
+    {"card": "3", "tons": "600", "view_option": "all"},
+    {"card": "5", "tons": "1000", "view_option": "LOWER"},
+    {"card": "7", "tons": "300", "view_option": "higher"},
+    {"card": "12", "tons": "700", "view_option": "custom", "min_range": "150", "max_range": "900"},
+    {"card": "1", "tons": "450", "view_option": VIEW_OPTIONS[0]},           # الاسم العربي كما هو
+    {"card": "2", "tons": "900", "view_option": "custom", "min_range": "5000", "max_range": "6000"},
+    {"card": "99", "tons": "600"},
+    {"card": "x", "tons": "600"},
+    {"card": "4", "tons": "600", "view_option": "sideways"},
+]
+
+
+@pytest.fixture
+def queries_file(tmp_path):
+    path = tmp_path / "queries.csv"
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["card", "tons", "view_option", "min_range", "max_range"])
+        writer.writeheader()
+        writer.writerows(QUERIES)
+    return str(path)
+
+
+def expected_records(workbook):
+    """نفس الاستعلامات مباشرة عبر compute_status: {رقم الاستعلام: صفوف النتيجة}"""
+    sheets = compact_sheets(typed_view(read_workbook(workbook, dtype=object)))
+    slice_index = SliceIndex(sheets["ServicePlan"])
+    expected = {}
+    for i, q in enumerate(QUERIES):
+        view = q.get("view_option", "")
+        view = VIEW_ALIASES.get(view.lower(), view) if view else VIEW_OPTIONS[0]
+        if view not in VIEW_OPTIONS or f"Card{q['card']}" not in sheets:
+            continue
+        tons = float(q["tons"])
+        min_range = float(q.get("min_range", max(0, tons - 500)))
+        max_range = float(q.get("max_range", tons + 500))
+        result = compute_status(int(q["card"]), slice_index, EventIndex(sheets[f"Card{q['card']}"]), view, tons, min_range, max_range)
+        expected[i] = (view, [] if result is None else result.astype(object).values.tolist())
+    return expected
+
+
+def run(workbook, queries_file, tmp_path, fmt):
+    out = tmp_path / f"results.{fmt}"
+    assert main([queries_file, "--workbook", workbook, "--format", fmt, "--output", str(out)]) == 0
+    with open(out, encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            return [json.loads(line) for line in f]
+        return list(csv.DictReader(f))
+
+
+def test_view_aliases_cover_every_view():
+    assert sorted(VIEW_ALIASES.values()) == sorted(VIEW_OPTIONS)
+
+
+def test_jsonl_matches_compute_status(workbook, queries_file, tmp_path):
+    records = run(workbook, queries_file, tmp_path, "jsonl")
+    expected = expected_records(workbook)
+    for i, (view, rows) in expected.items():
+        found = [r for r in records if r["query"] == i]
+        assert {r["view_option"] for r in found} == {view}
+        if not rows:
+            assert [r["error"] for r in found] == ["لا توجد شرائح مطابقة حسب النطاق المحدد."]
+            continue
+        assert [[r[c] for c in RESULT_COLUMNS] for r in found] == json.loads(json.dumps(rows, default=str))
+        assert all(r["card"] == int(QUERIES[i]["card"]) and r["tons"] == float(QUERIES[i]["tons"]) for r in found)
+
+    errors = {r["query"]: r["error"] for r in records if r["query"] not in expected}
+    assert sorted(errors) == [7, 8, 9]
+    assert errors[7] == "لا يوجد شيت باسم Card99"
+    assert "sideways" in errors[9]
+
+
+def test_csv_has_the_same_records_as_jsonl(workbook, queries_file, tmp_path):
+    rows = run(workbook, queries_file, tmp_path, "csv")
+    records = run(workbook, queries_file, tmp_path, "jsonl")
+    assert list(rows[0]) == QUERY_COLUMNS + RESULT_COLUMNS
+    assert len(rows) == len(records)
+    for row, rec in zip(rows, records):
+        assert row == {c: "" if rec.get(c) is None else str(rec[c]) for c in QUERY_COLUMNS + RESULT_COLUMNS}
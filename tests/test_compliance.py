@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+from compliance import ComplianceStore
+
+
+def table(value):
+    return pd.DataFrame({"value": [value]})
+
+
+def test_get_builds_once_and_keeps_one_version_per_card(tmp_path):
+    store = ComplianceStore(str(tmp_path))
+    calls = []
+
+    def build(value):
+        calls.append(value)
+        return table(value)
+
+    old, other = ComplianceStore.key(1, "v1", "p"), ComplianceStore.key(2, "v1", "p")
+    store.get(old, lambda: build("old"))
+    store.get(other, lambda: build("other"))
+    assert store.get(old, lambda: build("again"))["value"][0] == "old"
+
+    new = ComplianceStore.key(1, "v2", "p")
+    store.get(new, lambda: build("new"))
+    assert calls == ["old", "other", "new"]
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{new}.pkl", f"{other}.pkl"])
+    # ملف محذوف من الذاكرة يُقرأ من القرص بدون بناء
+    assert ComplianceStore(str(tmp_path)).get(other, lambda: build("rebuilt"))["value"][0] == "other"
+
+
+def test_warm_builds_only_requested_cards(tmp_path):
+    store = ComplianceStore(str(tmp_path))
+    saved = ComplianceStore.key(3, "v", "p")
+    store.warm({saved: lambda: table("saved")})
+    store.wait(10)
+    assert os.listdir(tmp_path) == [f"{saved}.pkl"]
+    # الموجود على القرص لا يُعاد بناؤه، وفشل البناء لا يوقف الخيط
+    store.warm({saved: lambda: table("again"), ComplianceStore.key(4, "v", "p"): lambda: 1 / 0})
+    store.wait(10)
+    assert store.get(saved, lambda: table("again"))["value"][0] == "saved"
+    assert os.listdir(tmp_path) == [f"{saved}.pkl"]
+
+
+def test_warm_skips_ready_tables_and_keeps_memory_free(tmp_path):
+    store = ComplianceStore(str(tmp_path))
+    calls = []
+
+    def build(value):
+        def run():
+            calls.append(value)
+            return table(value)
+        return run
+
+    keys = {ComplianceStore.key(card, "v1", "p"): build(card) for card in (1, 2, 3)}
+    store.warm(keys)
+    store.wait(10)
+    # كل تشغيل للصفحة يطلب نفس الجداول: الجاهز لا يُفحص ولا يُبنى من جديد
+    store.warm(keys)
+    store.wait(10)
+    assert sorted(calls) == [1, 2, 3]
+    assert not store._memory
+    assert store.peek(ComplianceStore.key(2, "v1", "p"))["value"][0] == 2
+    assert store.peek(ComplianceStore.key(2, "v2", "p")) is None
+
+    # نسخة جديدة للماكينة 1 تحذف ملف القديمة؛ الرجوع لها (نفس البصمة) يبنيها من جديد
+    store.warm({ComplianceStore.key(1, "v2", "p"): build("1b")})
+    store.wait(10)
+    store.warm(keys)
+    store.wait(10)
+    assert sorted(map(str, calls)) == ["1", "1", "1b", "2", "3"]
@@ -0,0 +1,117 @@
+import datetime
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import WORKBOOK
+from event_import import ERROR_COLUMNS, read_events_file, validate_events
+from sheet_cache import read_workbook
+
+
+@pytest.fixture(scope="module")
+def sheets():
+    return read_workbook(WORKBOOK, dtype=object)
+
+
+def csv_bytes(text):
+    return text.encode("utf-8-sig")
+
+
+def errors_by_row(report):
+    return dict(zip(report[ERROR_COLUMNS[0]], report[ERROR_COLUMNS[2]]))
+
+
+# -------------------------------
+# 📄 قراءة الملف
+# -------------------------------
+def test_csv_is_read_as_text():
+    df = read_events_file(csv_bytes(" card ,Min_Tones,Max_Tones,Date\n1,451,550,19\\1\\2025\n2,,,\n"), "events.CSV")
+    assert list(df.columns) == ["card", "Min_Tones", "Max_Tones", "Date"]
+    assert df.iloc[0].tolist() == ["1", "451", "550", "19\\1\\2025"]
+    assert df.iloc[1].tolist() == ["2", "", "", ""]
+
+
+def test_xlsx_cells_become_input_text():
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "card": [1.0, 2],
+        "Min_Tones": [451.0, 600.5],
+        "Max_Tones": [550, None],
+        "Date": [datetime.datetime(2025, 1, 19), None],
+    }).to_excel(buffer, index=False)
+    df = read_events_file(buffer.getvalue(), "events.xlsx")
+    assert df.iloc[0].tolist() == ["1", "451", "550", "19\\1\\2025"]
+    assert df.iloc[1].tolist() == ["2", "600.5", "", ""]
+
+
+def test_unsupported_extension():
+    with pytest.raises(ValueError):
+        read_events_file(b"card\n1\n", "events.txt")
+
+
+# -------------------------------
+# ✅ التحقق
+# -------------------------------
+@pytest.mark.parametrize("columns", [
+    "Min_Tones,Max_Tones",
+    "card,Max_Tones",
+    "card,Min_Tones",
+], ids=["no-card", "no-min", "no-max"])
+def test_missing_columns_reject_the_file(sheets, columns):
+    df = read_events_file(csv_bytes(columns + "\n" + ",".join(["1"] * 2) + "\n"), "events.csv")
+    with pytest.raises(ValueError):
+        validate_events(df, sheets)
+
+
+def test_row_errors_are_reported_with_file_row_numbers(sheets):
+    df = read_events_file(csv_bytes(
+        "card,Min_Tones,Max_Tones,Date,Tones\n"
+        "1,451,550,19\\1\\2025,500\n"   # 2: صالح
+        "1,700,600,,\n"                 # 3: Min > Max
+        "1,451,550,31\\2\\2025,\n"      # 4: تاريخ غير موجود
+        "1,451,550,yesterday,\n"        # 5: تاريخ غير مفهوم
+        "x,451,550,,\n"                 # 6: كارت غير رقمي
+        "1.5,451,550,,\n"               # 7: كارت كسري
+        "999,451,550,,\n"               # 8: لا يوجد شيت
+        "2,abc,550,,\n"                 # 9: Min ليس رقماً
+        "2,451,,,\n"                    # 10: Max فارغ
+        "2,451,550,5/3/2025,\n"         # 11: صالح (فاصل مختلف)
+    ), "events.csv")
+    batches, report = validate_events(df, sheets)
+
+    errors = errors_by_row(report)
+    assert sorted(errors) == [3, 4, 5, 6, 7, 8, 9, 10]
+    assert errors[3] == "Min_Tones أكبر من Max_Tones"
+    assert errors[4] == errors[5] == "تاريخ غير مفهوم"
+    assert errors[6] == errors[7] == "رقم الكارت غير صحيح"
+    assert errors[8] == "لا يوجد شيت لهذا الكارت"
+    assert errors[9] == "Min_Tones ليس رقماً"
+    assert errors[10] == "Max_Tones ليس رقماً"
+    assert report[ERROR_COLUMNS[1]].tolist() == ["1", "1", "1", "x", "1.5", "999", "2", "2"]
+
+    assert sorted(batches) == ["Card1", "Card2"]
+    for name, rows in batches.items():
+        assert list(rows.columns) == list(sheets[name].columns)
+    assert batches["Card1"][["Min_Tones", "Max_Tones", "Tones", "Date"]].iloc[0].tolist() == ["451", "550", "500", "19\\1\\2025"]
+    assert batches["Card2"]["Date"].tolist() == ["5/3/2025"]
+
+
+def test_unknown_columns_and_case_insensitive_names(sheets):
+    df = read_events_file(csv_bytes(
+        "CARD,min_tones,MAX_TONES,date,Colour\n"
+        "1,451,550,1\\2\\2025,\n"  # عمود غير موجود لكنه فارغ: صالح
+        "1,451,550,,red\n"         # قيمة في عمود غير موجود
+    ), "events.csv")
+    batches, report = validate_events(df, sheets)
+    assert errors_by_row(report) == {3: "العمود Colour غير موجود في الشيت"}
+    assert batches["Card1"][["Min_Tones", "Max_Tones", "Date"]].values.tolist() == [["451", "550", "1\\2\\2025"]]
+
+
+def test_several_errors_on_one_row(sheets):
+    df = read_events_file(csv_bytes("card,Min_Tones,Max_Tones,Date\n999,abc,,bad\n"), "events.csv")
+    batches, report = validate_events(df, sheets)
+    assert batches == {}
+    assert errors_by_row(report)[2].split("؛ ") == [
+        "لا يوجد شيت لهذا الكارت", "Min_Tones ليس رقماً", "Max_Tones ليس رقماً", "تاريخ غير مفهوم",
+    ]
@@ -0,0 +1,186 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from github_sync import FETCH_UNCHANGED, FETCH_UPDATED, _swap_in, fetch_url, fetch_via_api, git_blob_sha
+
+OLD = b"old workbook bytes"
+NEW = b"new workbook bytes " * 5000
+
+
+# -------------------------------
+# 🌐 سيرفر محلي (http.server)
+# -------------------------------
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.seen.append(dict(self.headers))
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(server.status)
+        self.send_header("Content-Length", str(len(server.body)))
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        self.end_headers()
+        # truncate: قطع الاتصال بعد جزء من المحتوى (تنزيل منقطع)
+        self.wfile.write(server.body[:server.truncate] if server.truncate else server.body)
+        self.wfile.flush()
+        if server.truncate:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.body, httpd.etag, httpd.status, httpd.truncate, httpd.seen = NEW, '"v1"', 200, None, []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/Machine_Service_Lookup.xlsx"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def local(tmp_path):
+    path = tmp_path / "Machine_Service_Lookup.xlsx"
+    path.write_bytes(OLD)
+    return str(path)
+
+
+def meta(path):
+    with open(path + ".fetch.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def leftovers(path):
+    return [n for n in os.listdir(os.path.dirname(path)) if n.startswith(".~fetch")]
+
+
+# -------------------------------
+# 🔄 fetch_url
+# -------------------------------
+def test_download_replaces_file_and_records_etag(server, local):
+    assert fetch_url(server.url, local) == FETCH_UPDATED
+    with open(local, "rb") as f:
+        assert f.read() == NEW
+    assert meta(local) == {"etag": '"v1"', "sha256": hashlib.sha256(NEW).hexdigest(), "url": server.url}
+    assert "If-None-Match" not in server.seen[0]
+    assert leftovers(local) == []
+
+
+def test_not_modified_sends_etag_and_keeps_file(server, local):
+    fetch_url(server.url, local)
+    mtime = os.stat(local).st_mtime_ns
+    assert fetch_url(server.url, local) == FETCH_UNCHANGED
+    assert server.seen[-1]["If-None-Match"] == '"v1"'
+    assert os.stat(local).st_mtime_ns == mtime
+
+
+def test_local_edits_skip_etag_and_restore_remote_copy(server, local):
+    fetch_url(server.url, local)
+    with open(local, "ab") as f:
+        f.write(b"local edit")
+    assert fetch_url(server.url, local) == FETCH_UPDATED
+    assert "If-None-Match" not in server.seen[-1]
+    with open(local, "rb") as f:
+        assert f.read() == NEW
+
+
+def test_same_content_without_etag_is_unchanged(server, local):
+    server.body, server.etag = OLD, None
+    mtime = os.stat(local).st_mtime_ns
+    assert fetch_url(server.url, local) == FETCH_UNCHANGED
+    assert os.stat(local).st_mtime_ns == mtime
+    assert meta(local)["sha256"] == hashlib.sha256(OLD).hexdigest()
+
+
+def test_interrupted_download_keeps_old_file(server, local):
+    server.truncate = len(NEW) // 3
+    with pytest.raises(requests.RequestException):
+        fetch_url(server.url, local)
+    with open(local, "rb") as f:
+        assert f.read() == OLD
+    assert not os.path.exists(local + ".fetch.json")
+    assert leftovers(local) == []
+
+
+def test_http_error_keeps_old_file(server, local):
+    server.status = 404
+    with pytest.raises(requests.HTTPError):
+        fetch_url(server.url, local)
+    with open(local, "rb") as f:
+        assert f.read() == OLD
+
+
+@pytest.mark.parametrize("content", ["{not json", "", "[1, 2]", '{"etag": "\\"v1\\"", "sha256": "x"}'])
+def test_corrupt_meta_falls_back_to_full_download(server, local, content):
+    fetch_url(server.url, local)
+    with open(local + ".fetch.json", "w", encoding="utf-8") as f:
+        f.write(content)
+    assert fetch_url(server.url, local) == FETCH_UNCHANGED  # نفس المحتوى بعد تنزيله كاملاً
+    assert "If-None-Match" not in server.seen[-1]
+    assert meta(local)["sha256"] == hashlib.sha256(NEW).hexdigest()
+
+
+# -------------------------------
+# 🧰 _swap_in
+# -------------------------------
+def test_swap_in_failure_keeps_old_file(local):
+    def chunks():
+        yield b"partial"
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        _swap_in(chunks(), local)
+    with open(local, "rb") as f:
+        assert f.read() == OLD
+    assert leftovers(local) == []
+
+
+# -------------------------------
+# 🐙 fetch_via_api
+# -------------------------------
+class FakeContent:
+    def __init__(self, data, inline=True):
+        self.sha = hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+        self.content = base64.b64encode(data).decode() if inline else ""
+
+
+class FakeRepo:
+    """بديل PyGithub repo: get_contents بدون محتوى للملفات الكبيرة (يلزم get_git_blob)"""
+
+    def __init__(self, data, inline=True):
+        self.data, self.inline, self.blob_reads = data, inline, 0
+
+    def get_contents(self, file_path, ref):
+        return FakeContent(self.data, self.inline)
+
+    def get_git_blob(self, sha):
+        self.blob_reads += 1
+        return FakeContent(self.data)
+
+
+@pytest.mark.parametrize("inline", [True, False], ids=["inline", "blob"])
+def test_fetch_via_api(local, inline):
+    repo = FakeRepo(NEW, inline)
+    assert fetch_via_api(repo, "Machine_Service_Lookup.xlsx", "main", local) == FETCH_UPDATED
+    with open(local, "rb") as f:
+        assert f.read() == NEW
+    assert meta(local)["blob_sha"] == git_blob_sha(local)
+    assert repo.blob_reads == (0 if inline else 1)
+
+    # نفس blob SHA: لا تنزيل
+    assert fetch_via_api(repo, "Machine_Service_Lookup.xlsx", "main", local) == FETCH_UNCHANGED
+    assert repo.blob_reads == (0 if inline else 1)
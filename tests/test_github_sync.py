@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from github_sync import (
+    PUSH_DONE, PUSH_FAILED, PUSH_IDLE, PUSH_PENDING, PUSH_RETRYING, WAIT_STEP, PushQueue,
+)
+
+
+# -------------------------------
+# 🧰 ساعة وهمية ورافع وهمي
+# -------------------------------
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubPusher:
+    """يسجل رسائل الرفع؛ أول fail_first محاولة ترفع خطأ"""
+
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def __call__(self, message):
+        with self._lock:
+            self.messages.append(message)
+            if len(self.messages) <= self.fail_first:
+                raise RuntimeError(f"boom {len(self.messages)}")
+
+    @property
+    def calls(self):
+        with self._lock:
+            return len(self.messages)
+
+
+def until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def settle():
+    """وقت فعلي يكفي ليعيد العامل قراءة الساعة الوهمية"""
+    time.sleep(WAIT_STEP * 3)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+# -------------------------------
+# ⬆ PushQueue
+# -------------------------------
+def test_debounce_coalesces_saves_into_one_push(clock):
+    pusher = StubPusher()
+    q = PushQueue(pusher, debounce=3.0, clock=clock)
+    assert q.status()["state"] == PUSH_IDLE
+
+    q.submit("add row")
+    assert q.status()["state"] == PUSH_PENDING
+    clock.advance(2)
+    q.submit("delete row")
+    q.submit("add row")
+    until(lambda: q.status()["pending"] == 3)
+    # 3 ثوان من أول حفظ لا تكفي: المهلة تبدأ من آخر حفظ
+    clock.advance(2.9)
+    settle()
+    assert pusher.calls == 0
+
+    clock.advance(0.1)
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    # الرسائل المكررة تظهر مرة واحدة
+    assert pusher.messages == ["delete row (+1 more)\n\n- add row\n- delete row"]
+    status = q.status()
+    assert status["last_push"] == clock.now
+    assert (status["pending"], status["attempts"], status["last_error"]) == (0, 0, None)
+
+
+def test_single_message_is_used_as_is(clock):
+    pusher = StubPusher()
+    q = PushQueue(pusher, debounce=1.0, clock=clock)
+    q.submit("same")
+    q.submit("same")
+    clock.advance(1)
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    assert pusher.messages == ["same"]
+
+
+def test_failed_push_retries_with_backoff(clock):
+    pusher = StubPusher(fail_first=2)
+    q = PushQueue(pusher, debounce=1.0, retries=5, backoff=2.0, max_backoff=60.0, clock=clock)
+    q.submit("edit")
+    clock.advance(1)
+    until(lambda: q.status()["state"] == PUSH_RETRYING)
+    status = q.status()
+    assert (status["attempts"], status["last_error"], status["next_retry"]) == (1, "boom 1", clock.now + 2)
+
+    clock.advance(1.9)
+    settle()
+    assert pusher.calls == 1
+    clock.advance(0.1)
+    until(lambda: q.status()["attempts"] == 2)
+    # الانتظار يتضاعف بعد كل فشل
+    assert q.status()["next_retry"] == clock.now + 4
+
+    clock.advance(4)
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    assert pusher.messages == ["edit"] * 3
+    assert q.status()["last_error"] is None
+
+
+def test_saves_during_retry_join_the_next_push(clock):
+    pusher = StubPusher(fail_first=1)
+    q = PushQueue(pusher, debounce=1.0, backoff=2.0, clock=clock)
+    q.submit("first")
+    clock.advance(1)
+    until(lambda: q.status()["state"] == PUSH_RETRYING)
+    q.submit("second")
+    until(lambda: q.status()["pending"] == 2)
+
+    clock.advance(2)
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    assert pusher.messages == ["first", "second (+1 more)\n\n- first\n- second"]
+
+
+def test_backoff_is_capped(clock):
+    pusher = StubPusher(fail_first=3)
+    q = PushQueue(pusher, debounce=0.0, retries=5, backoff=2.0, max_backoff=3.0, clock=clock)
+    q.submit("edit")
+    for attempts, delay in [(1, 2.0), (2, 3.0), (3, 3.0)]:
+        until(lambda: q.status()["attempts"] == attempts)
+        assert q.status()["next_retry"] == clock.now + delay
+        clock.advance(delay)
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    assert pusher.calls == 4
+
+
+def test_exhausted_retries_wait_for_the_next_save(clock):
+    pusher = StubPusher(fail_first=2)
+    q = PushQueue(pusher, debounce=0.0, retries=1, backoff=1.0, clock=clock)
+    q.submit("lost")
+    until(lambda: q.status()["state"] == PUSH_RETRYING)
+    clock.advance(1)
+    until(lambda: q.status()["state"] == PUSH_FAILED)
+    status = q.status()
+    assert (status["attempts"], status["last_error"], status["next_retry"]) == (2, "boom 2", None)
+
+    clock.advance(600)
+    settle()
+    assert pusher.calls == 2
+    # الحفظ التالي يرفع الرسائل التي فشلت معه
+    q.submit("next")
+    until(lambda: q.status()["state"] == PUSH_DONE)
+    assert pusher.messages[-1] == "next (+1 more)\n\n- lost\n- next"
@@ -0,0 +1,81 @@
+import datetime
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from baseline import assert_same_status, baseline_status, read_sheets
+from conftest import WORKBOOK
+from machine_status import VIEW_OPTIONS, EventIndex, SliceIndex, compliance_table, compute_status, filter_compliance
+from sheet_cache import read_workbook, typed_view
+from sheet_schema import compact_frame
+
+TONS = range(0, 1650, 150)
+MIN_RANGE, MAX_RANGE = 150, 900
+
+
+@pytest.fixture(scope="module")
+def baseline_sheets():
+    return read_sheets(WORKBOOK)
+
+
+@pytest.fixture(scope="module")
+def typed_sheets(tmp_path_factory):
+    path = tmp_path_factory.mktemp("typed") / "workbook.xlsx"
+    shutil.copy(WORKBOOK, path)
+    return typed_view(read_workbook(str(path), dtype=object))
+
+
+def with_mixed_dates(df):
+    """نفس الشيت بعمود Date مختلط: تواريخ Excel بوقت وبدونه، ونصوص، وخلايا فارغة"""
+    dates = [datetime.datetime(2024, 1, 2, 10, 30), "15\\7\\2024", datetime.datetime(2025, 4, 5), np.nan]
+    df = df.copy()
+    df["Date"] = pd.Series([dates[i % len(dates)] for i in range(len(df))], index=df.index, dtype=object)
+    return df
+
+
+def card_names(sheets):
+    return sorted((n for n in sheets if n.startswith("Card")), key=lambda n: int(n[4:]))
+
+
+def test_typed_view_matches_read_excel(baseline_sheets, typed_sheets):
+    assert list(typed_sheets) == list(baseline_sheets)
+    for name, df in baseline_sheets.items():
+        pd.testing.assert_frame_equal(typed_sheets[name], df, check_dtype=False, obj=name)
+
+
+def test_compute_status_matches_baseline(baseline_sheets, typed_sheets):
+    """كل الماكينات × كل نطاقات العرض × أطنان مختلفة = نفس نتيجة الحلقة الأصلية"""
+    slice_index = SliceIndex(typed_sheets["ServicePlan"])
+    queries = 0
+    for name in card_names(baseline_sheets):
+        card_num = int(name[4:])
+        event_index = EventIndex(typed_sheets[name])
+        table = compliance_table(card_num, slice_index, event_index)
+        for view in VIEW_OPTIONS:
+            for tons in TONS:
+                expected = baseline_status(card_num, baseline_sheets["ServicePlan"], baseline_sheets[name],
+                                           view, tons, MIN_RANGE, MAX_RANGE)
+                assert_same_status(expected, compute_status(card_num, slice_index, event_index, view, tons, MIN_RANGE, MAX_RANGE))
+                assert_same_status(expected, filter_compliance(table, slice_index, view, tons, MIN_RANGE, MAX_RANGE))
+                queries += 1
+    assert queries == len(card_names(baseline_sheets)) * len(VIEW_OPTIONS) * len(TONS)
+
+
+@pytest.mark.parametrize("dates", [None, with_mixed_dates], ids=["workbook", "mixed_dates"])
+def test_compact_schema_keeps_status(baseline_sheets, typed_sheets, dates):
+    """المخطط المضغوط لا يغير نتيجة الفحص ولا نص العرض (التاريخ بوقته كما في الحلقة الأصلية)"""
+    change = dates or (lambda df: df)
+    slice_index = SliceIndex(typed_sheets["ServicePlan"])
+    for name in card_names(baseline_sheets):
+        card_num = int(name[4:])
+        typed = change(typed_sheets[name])
+        full, compact = EventIndex(typed), EventIndex(compact_frame(typed))
+        for view in VIEW_OPTIONS:
+            for tons in TONS[::2]:
+                expected = baseline_status(card_num, baseline_sheets["ServicePlan"], change(baseline_sheets[name]),
+                                           view, tons, MIN_RANGE, MAX_RANGE)
+                actual = compute_status(card_num, slice_index, compact, view, tons, MIN_RANGE, MAX_RANGE)
+                assert_same_status(expected, actual)
+                assert_same_status(compute_status(card_num, slice_index, full, view, tons, MIN_RANGE, MAX_RANGE), actual)
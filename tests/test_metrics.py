@@ -0,0 +1,108 @@
+import json
+import os
+import re
+
+import pytest
+
+import metrics
+from metrics import PROM_FILE, SPANS_FILE, SUMMARY_COLUMNS, Timings
+
+# سطر عينة في صيغة Prometheus: الاسم{label="قيمة",...} الرقم
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)\{((?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*)\} (\S+)$')
+
+
+def parse_prometheus(text):
+    """{(الاسم، labels): القيمة} مع التحقق من HELP/TYPE قبل عينات كل مقياس"""
+    assert text.endswith("\n")
+    typed, samples = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            typed[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        base = re.sub(r"_(sum|count)$", "", name)
+        assert name in typed or (base in typed and typed[base] == "summary"), line
+        labels = tuple(re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"', labels))
+        samples[(name, labels)] = float(value)
+    return typed, samples
+
+
+@pytest.fixture
+def timings(tmp_path):
+    return Timings(str(tmp_path), prom_interval=3600)
+
+
+def test_prometheus_exposition_format(timings, tmp_path):
+    for ms in (10, 20, 30, 40):
+        timings.record("read_excel", ms / 1000, rows=100, bytes=2048)
+    with pytest.raises(KeyError):
+        with timings.span('odd "stage"\\x', rows=5):
+            raise KeyError("x")
+    timings.flush()
+
+    with open(tmp_path / PROM_FILE, encoding="utf-8") as f:
+        typed, samples = parse_prometheus(f.read())
+    assert typed == {
+        "cmms_stage_seconds": "summary",
+        "cmms_stage_rows_total": "counter",
+        "cmms_stage_bytes_total": "counter",
+        "cmms_stage_errors_total": "counter",
+    }
+    stage = (("stage", "read_excel"),)
+    assert samples[("cmms_stage_seconds", stage + (("quantile", "0.5"),))] == pytest.approx(0.025)
+    assert samples[("cmms_stage_seconds", stage + (("quantile", "0.95"),))] == pytest.approx(0.0385)
+    assert samples[("cmms_stage_seconds_sum", stage)] == pytest.approx(0.1)
+    assert samples[("cmms_stage_seconds_count", stage)] == 4
+    assert samples[("cmms_stage_rows_total", stage)] == 400
+    assert samples[("cmms_stage_bytes_total", stage)] == 4 * 2048
+    assert samples[("cmms_stage_errors_total", stage)] == 0
+
+    # علامات التنصيص والشرطة المائلة في اسم المرحلة تُهرّب
+    odd = (("stage", 'odd \\"stage\\"\\\\x'),)
+    assert samples[("cmms_stage_errors_total", odd)] == 1
+    assert samples[("cmms_stage_rows_total", odd)] == 5
+
+
+def test_spans_are_appended_as_jsonl(timings, tmp_path):
+    with timings.span("save", rows=3) as info:
+        info["bytes"] = 10
+    timings.record("save", 0.5, error="OSError")
+    with open(tmp_path / SPANS_FILE, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["stage"] for e in entries] == ["save", "save"]
+    assert entries[0]["rows"] == 3 and entries[0]["bytes"] == 10 and "error" not in entries[0]
+    assert entries[1]["ms"] == 500 and entries[1]["error"] == "OSError"
+
+    summary = timings.summary()
+    assert list(summary.columns) == SUMMARY_COLUMNS
+    assert summary.iloc[0].tolist()[:2] == ["save", 2] and summary.iloc[0, -1] == 1
+
+
+def test_log_rotates_to_dot_one(timings, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_LOG_BYTES", 300)
+    path = tmp_path / SPANS_FILE
+    for i in range(10):
+        timings.record("step", 0.001, rows=i)
+
+    rotated = tmp_path / (SPANS_FILE + ".1")
+    assert rotated.exists()
+    # الملف الحالي لا يتجاوز الحد إلا بسطر واحد؛ النسخة القديمة تُستبدل عند كل نقل
+    line = os.path.getsize(path) / len(path.read_text(encoding="utf-8").splitlines())
+    assert os.path.getsize(path) <= 300 + line
+    rows = [json.loads(l)["rows"] for f in (rotated, path) for l in f.read_text(encoding="utf-8").splitlines()]
+    assert rows == sorted(rows) and rows[-1] == 9
+    assert sorted(p for p in os.listdir(tmp_path) if p.startswith(SPANS_FILE)) == [SPANS_FILE, SPANS_FILE + ".1"]
+
+
+def test_without_directory_nothing_is_written(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    timings = Timings()
+    timings.record("step", 0.01)
+    timings.flush()
+    assert os.listdir(tmp_path) == []
+    assert timings.summary()["العدد"].tolist() == [1]
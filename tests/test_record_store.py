@@ -0,0 +1,174 @@
+import datetime
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import WORKBOOK
+from machine_status import VIEW_OPTIONS, EventIndex, SliceIndex, compute_status
+from record_store import POS_GAP, RecordStore
+from sheet_cache import typed_frame
+from sheet_schema import compact_frame
+from workbook_writer import TrackedSheets
+
+
+def frame(values):
+    return pd.DataFrame({"card": [1] * len(values), "Tones": values}, dtype=object)
+
+
+def positions(store, name):
+    """{قيمة Tones: مفتاح pos} مباشرة من جدول rows"""
+    db = sqlite3.connect(store.path)
+    rows = db.execute("SELECT pos, data FROM rows WHERE sheet = ? ORDER BY pos", (name,)).fetchall()
+    db.close()
+    return {data: pos for pos, data in rows}
+
+
+def test_row_ops_match_in_memory_sheet(tmp_path):
+    store = RecordStore(str(tmp_path / "store.db"))
+    store.replace_sheet("Card1", frame(list(range(5))))
+    expected = TrackedSheets({"Card1": frame(list(range(5)))})
+    value = 100
+    # إدراج متكرر في نفس المكان يستهلك الفجوة حتى إعادة الترقيم
+    for position in [0, 2, 2, 5, 100] + [1] * 60:
+        rows = frame([value, value + 1])
+        value += 2
+        store.insert_rows("Card1", position, rows)
+        expected.insert_rows("Card1", position, rows)
+    for doomed in ([0], [3, 4, 50], [len(expected["Card1"]) - 1]):
+        store.delete_rows("Card1", doomed)
+        expected.delete_rows("Card1", doomed)
+    pd.testing.assert_frame_equal(store.read_sheet("Card1"), expected["Card1"].reset_index(drop=True))
+
+
+def test_insert_does_not_move_other_rows(tmp_path):
+    store = RecordStore(str(tmp_path / "store.db"))
+    store.replace_sheet("Card1", frame([0, 1, 2, 3]))
+    before = positions(store, "Card1")
+    assert sorted(before.values()) == [POS_GAP * i for i in range(1, 5)]
+    store.insert_rows("Card1", 1, frame([10, 11]))
+    after = positions(store, "Card1")
+    assert {data: after[data] for data in before} == before
+    assert store.read_sheet("Card1")["Tones"].tolist() == [0, 10, 11, 1, 2, 3]
+
+
+def test_save_sheets_replays_row_ops(tmp_path):
+    store = RecordStore(str(tmp_path / "store.db"))
+    store.replace_sheet("Card1", frame([0, 1, 2]))
+    sheets = TrackedSheets({"Card1": store.read_sheet("Card1")})
+    sheets.insert_many("Card1", [(0, frame([7])), (3, frame([8, 9]))])
+    sheets.delete_rows("Card1", [1])
+    expected = sheets["Card1"].copy()
+    store.save_sheets(sheets)
+    assert not sheets.dirty
+    pd.testing.assert_frame_equal(store.read_sheet("Card1"), expected)
+
+
+# -------------------------------
+# 🔎 استعلامات النطاق المفهرسة
+# -------------------------------
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    store = RecordStore(str(tmp_path_factory.mktemp("store") / "store.db"))
+    store.import_workbook(WORKBOOK)
+    return store
+
+
+def range_index(store, sheet_name, min_tons, max_tons):
+    """مثل app.range_events: أحداث النطاق بأنواع الشيت كاملاً ثم المخطط المضغوط"""
+    events = store.read_events(sheet_name, min_tons, max_tons)
+    return EventIndex(compact_frame(typed_frame(events, store.sheet_dtypes(sheet_name))))
+
+
+def test_range_queries_use_the_indexes(store):
+    plans = {
+        "SELECT data FROM rows WHERE card = ? AND Min_Tones <= ? AND Max_Tones >= ? AND sheet = ?": "idx_rows_card_range",
+        "SELECT sheet, data FROM rows WHERE Date >= ? AND Date <= ?": "idx_rows_date",
+    }
+    db = sqlite3.connect(store.path)
+    for query, index in plans.items():
+        plan = " ".join(r[-1] for r in db.execute(f"EXPLAIN QUERY PLAN {query}", (1,) * query.count("?")))
+        assert index in plan, plan
+    db.close()
+
+
+def test_range_status_matches_full_sheet(store):
+    """compute_status بأحداث النطاق فقط = نفس النتيجة من الشيت كاملاً"""
+    sheets = {name: store.read_sheet(name) for name in store.sheet_names()}
+    slice_index = SliceIndex(typed_frame(sheets["ServicePlan"]))
+    for name in (n for n in sheets if n.startswith("Card")):
+        card_num = int(name[4:])
+        full = EventIndex(compact_frame(typed_frame(sheets[name])))
+        for view in VIEW_OPTIONS:
+            for tons in (0, 450, 1000, 1600):
+                slice_pos = slice_index.select(view, tons, 150, 900)
+                lo = np.nanmin(slice_index.mins[slice_pos]) if len(slice_pos) else 0
+                hi = np.nanmax(slice_index.maxs[slice_pos]) if len(slice_pos) else 0
+                expected = compute_status(card_num, slice_index, full, view, tons, 150, 900)
+                actual = compute_status(card_num, slice_index, range_index(store, name, lo, hi), view, tons, 150, 900)
+                if expected is None:
+                    assert actual is None
+                else:
+                    pd.testing.assert_frame_equal(actual, expected, obj=f"{name} {view} {tons}")
+
+
+def test_read_events_matches_overlap_filter(store):
+    sheet = store.read_sheet("Card1")
+    mins = pd.to_numeric(sheet["Min_Tones"], errors="coerce").fillna(0)
+    maxs = pd.to_numeric(sheet["Max_Tones"], errors="coerce").fillna(0)
+    expected = sheet[(mins <= 900) & (maxs >= 400)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(store.read_events("Card1", 400, 900), expected)
+    with pytest.raises(ValueError):
+        store.read_events("ServicePlan", 0, 1000)
+
+
+def test_events_between_uses_date_keys(tmp_path):
+    store = RecordStore(str(tmp_path / "store.db"))
+    df = pd.DataFrame({
+        "card": [1, 1, 1, 1],
+        "Date": [datetime.datetime(2025, 3, 4, 8, 30), "5\\3\\2025", "31/2/2025", None],
+    }, dtype=object)
+    store.replace_sheet("Card1", df)
+    found = store.events_between("2025-03-04", "2025-03-05")
+    assert [row["Date"] for _, row in found] == [datetime.datetime(2025, 3, 4, 8, 30), "5\\3\\2025"]
+
+
+# -------------------------------
+# 🧬 أنواع الأعمدة بعد الإضافة/الحذف
+# -------------------------------
+@pytest.mark.parametrize("added", [
+    {"Tones": "1160", "Event": "x"},   # نص أرقام في عمود رقمي
+    {"Tones": 12.5, "Event": "y"},      # int -> float
+    {"Tones": "", "Event": ""},         # خلية فارغة من تبويب الإضافة -> object
+], ids=["numeric-text", "float", "blank"])
+def test_dtypes_follow_inserts_and_deletes(tmp_path, added):
+    store = RecordStore(str(tmp_path / "store.db"))
+    df = pd.DataFrame({"card": [1, 1, 1], "Tones": [100, 200, 300], "Event": ["a", None, "c"]}, dtype=object)
+    store.replace_sheet("Card1", df)
+    store.insert_rows("Card1", 1, pd.DataFrame([{"card": 1} | added], dtype=object))
+    expected = {c: str(t) for c, t in typed_frame(store.read_sheet("Card1")).dtypes.items()}
+    assert store.sheet_dtypes("Card1") == expected
+    store.delete_rows("Card1", [1])
+    expected = {c: str(t) for c, t in typed_frame(store.read_sheet("Card1")).dtypes.items()}
+    assert store.sheet_dtypes("Card1") == expected
+
+
+def test_old_database_is_migrated(tmp_path):
+    """قاعدة بدون الأعمدة المفهرسة (نسخة سابقة): تُضاف وتُملأ من data عند الفتح"""
+    path = str(tmp_path / "store.db")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE sheets (name TEXT PRIMARY KEY, position INTEGER NOT NULL, columns TEXT NOT NULL, version INTEGER NOT NULL);
+        CREATE TABLE rows (id INTEGER PRIMARY KEY, sheet TEXT NOT NULL, pos REAL NOT NULL, data TEXT NOT NULL);
+        INSERT INTO sheets VALUES ('Card7', 0, '["card", "Min_Tones", "Max_Tones", "Date"]', 3);
+        INSERT INTO rows (sheet, pos, data) VALUES ('Card7', 1, '[7, 100, 200, "1\\\\2\\\\2025"]');
+        INSERT INTO rows (sheet, pos, data) VALUES ('Card7', 2, '[7, 300, 400, null]');
+    """)
+    db.commit()
+    db.close()
+    store = RecordStore(path)
+    assert store.read_events("Card7", 150, 250)["Min_Tones"].tolist() == [100]
+    assert [sheet for sheet, _ in store.events_between("2025-02-01", "2025-02-01")] == ["Card7"]
+    assert store.sheet_dtypes("Card7")["Min_Tones"] == "int64"
@@ -0,0 +1,89 @@
+import datetime
+import importlib
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import report_export
+from report_export import EXPORT_FORMATS, available_formats, export_frame, to_csv, to_parquet, to_xlsx
+
+
+@pytest.fixture
+def table():
+    """مثل جدول الحالة: نصوص عربية، أعمدة مختلطة (أرقام + "-")، قيم فارغة وتواريخ"""
+    return pd.DataFrame({
+        "Card Number": np.array([3, 3, 12], dtype=np.int64),
+        "Min_Tons": [551.0, 701.0, 0.5],
+        "Service Needed": ["Revolving flats(X) + doffer(X)", "no_service", "تغيير سير"],
+        "Tones": pd.Series([573.0, "-", None], dtype=object),
+        "Date": pd.Series([datetime.datetime(2025, 4, 8), "8\\4\\2025", np.nan], dtype=object),
+        "Done": [True, False, True],
+    })
+
+
+def test_xlsx_round_trip(table):
+    data = to_xlsx(table, sheet_name="حالة الماكينة " * 4)
+    wb = load_workbook(io.BytesIO(data))
+    ws = wb.worksheets[0]
+    assert ws.title == ("حالة الماكينة " * 4)[:31]
+    rows = list(ws.values)
+    assert list(rows[0]) == list(table.columns)
+    assert [list(r) for r in rows[1:]] == [
+        [3, 551, "Revolving flats(X) + doffer(X)", 573, datetime.datetime(2025, 4, 8), True],
+        [3, 701, "no_service", "-", "8\\4\\2025", False],
+        [12, 0.5, "تغيير سير", None, None, True],
+    ]
+    back = pd.read_excel(io.BytesIO(data))
+    pd.testing.assert_series_equal(back["Card Number"], table["Card Number"])
+    pd.testing.assert_series_equal(back["Min_Tons"], table["Min_Tons"])
+
+
+def test_csv_round_trip(table):
+    data = to_csv(table)
+    assert data.startswith("﻿".encode("utf-8"))
+    back = pd.read_csv(io.BytesIO(data), encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    assert list(back.columns) == list(table.columns)
+    assert back["Service Needed"].tolist() == table["Service Needed"].tolist()
+    assert back["Tones"].tolist() == ["573.0", "-", ""]
+    assert back["Date"].tolist() == ["2025-04-08 00:00:00", "8\\4\\2025", ""]
+    assert export_frame(table, "csv") == data
+
+
+def test_parquet_round_trip(table):
+    pytest.importorskip("pyarrow")
+    back = pd.read_parquet(io.BytesIO(to_parquet(table)))
+    assert list(back.columns) == list(table.columns)
+    pd.testing.assert_series_equal(back["Card Number"], table["Card Number"])
+    pd.testing.assert_series_equal(back["Min_Tons"], table["Min_Tons"])
+    pd.testing.assert_series_equal(back["Done"], table["Done"])
+    # الأعمدة المختلطة تُحفظ كنص والفارغ يبقى فارغاً
+    assert back["Tones"].tolist()[:2] == ["573.0", "-"]
+    assert back["Date"].tolist()[:2] == ["2025-04-08 00:00:00", "8\\4\\2025"]
+    assert back[["Tones", "Date"]].isna().values.tolist() == [[False, False], [False, False], [True, True]]
+    assert back["Service Needed"].tolist() == table["Service Needed"].tolist()
+
+
+def test_without_pyarrow_parquet_is_not_offered(table, monkeypatch):
+    # None في sys.modules: الاستيراد يفشل كأن المكتبة غير مثبتة
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    try:
+        module = importlib.reload(report_export)
+        assert not module.PARQUET_AVAILABLE
+        assert module.available_formats() == ["xlsx", "csv"]
+        with pytest.raises(RuntimeError):
+            module.export_frame(table, "parquet")
+        # باقي الصيغ تعمل كالمعتاد
+        assert module.export_frame(table, "csv") == to_csv(table)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(report_export)
+
+
+def test_formats():
+    assert set(available_formats()) <= set(EXPORT_FORMATS)
+    with pytest.raises(ValueError):
+        export_frame(pd.DataFrame(), "pdf")
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+from baseline import baseline_insert_position
+from conftest import WORKBOOK
+from row_index import InsertIndex
+from sheet_cache import read_workbook
+
+
+@pytest.fixture(scope="module")
+def card_sheets():
+    sheets = read_workbook(WORKBOOK, dtype=object)
+    return {name: df.reset_index(drop=True) for name, df in sheets.items() if name.startswith("Card")}
+
+
+def with_rows(df, rows):
+    """الشيت مع صفوف إضافية (لمفاتيح نصية ومكررة ليست في ملف العمل)"""
+    return pd.concat([df, pd.DataFrame(rows, dtype=object)], ignore_index=True).astype(object)
+
+
+def new_rows(df):
+    """صفوف جديدة تغطي فروع القاعدة: مطابقة رقمية/نصية، بدون مطابقة، رينج غير رقمي، كارت فارغ"""
+    card = str(df["card"].iloc[0]) if len(df) else "1"
+    return [
+        {"card": card, "Min_Tones": "451", "Max_Tones": "550"},     # مطابقة رقمية
+        {"card": card, "Min_Tones": "451.0", "Max_Tones": "550"},   # نفس الرقم بنص مختلف
+        {"card": card, "Min_Tones": "abc", "Max_Tones": "def"},     # مطابقة نصية
+        {"card": card, "Min_Tones": "abc", "Max_Tones": "x"},       # نص بدون مطابقة -> آخر الشيت
+        {"card": card, "Min_Tones": "600", "Max_Tones": "640"},     # بدون مطابقة -> عدد الأقل
+        {"card": card, "Min_Tones": "-5", "Max_Tones": "0"},        # أقل من كل الصفوف
+        {"card": card, "Min_Tones": "99999", "Max_Tones": "99999"}, # أكبر من كل الصفوف
+        {"card": card, "Min_Tones": "", "Max_Tones": ""},           # رينج فارغ
+        {"card": "", "Min_Tones": "451", "Max_Tones": "550"},       # كارت فارغ -> لا مطابقة
+        {"card": "77", "Min_Tones": "451", "Max_Tones": "550"},     # كارت آخر
+    ]
+
+
+def sheet_variants(df):
+    card = df["card"].iloc[0]
+    return {
+        "workbook": df,
+        # مفاتيح مكررة (آخر صف مطابق) ومفاتيح نصية وخلايا فارغة
+        "duplicates": with_rows(df, [
+            {"card": card, "Min_Tones": 451, "Max_Tones": 550},
+            {"card": card, "Min_Tones": "abc", "Max_Tones": "def"},
+            {"card": card, "Min_Tones": " abc ", "Max_Tones": "def"},
+            {"card": card, "Min_Tones": None, "Max_Tones": None},
+            {"card": None, "Min_Tones": 451, "Max_Tones": 550},
+        ]),
+        "empty": df.iloc[:0],
+    }
+
+
+def test_positions_match_baseline_rule(card_sheets):
+    for name, sheet in card_sheets.items():
+        for variant, df in sheet_variants(sheet).items():
+            index = InsertIndex(df)
+            assert index.ready
+            for row in new_rows(sheet):
+                assert index.position(row) == baseline_insert_position(df, row), (name, variant, row)
+
+
+def test_plan_matches_baseline_on_sheet_before_insert(card_sheets):
+    """كل كتلة في plan في الموضع الذي تعطيه القاعدة الأصلية على الشيت قبل الإدراج"""
+    for name, sheet in card_sheets.items():
+        for variant, df in sheet_variants(sheet).items():
+            rows = pd.DataFrame(new_rows(sheet), dtype=object)
+            plan = InsertIndex(df).plan(rows)
+            expected = sorted(
+                (baseline_insert_position(df, row), i) for i, row in enumerate(rows.to_dict("records"))
+            )
+            actual = [(pos, i) for pos, block in plan for i in block.index]
+            assert actual == expected, (name, variant)
+
+
+def test_apply_matches_repeated_baseline_inserts(card_sheets):
+    """إدراج صف صف مع apply = القاعدة الأصلية على الشيت بعد كل إدراج"""
+    for name in ("Card1", "Card3"):
+        sheet = card_sheets[name]
+        for variant, df in sheet_variants(sheet).items():
+            index = InsertIndex(df)
+            for row in new_rows(sheet) * 2:
+                position = baseline_insert_position(df, row)
+                assert index.position(row) == position, (name, variant, row)
+                block = pd.DataFrame([row], dtype=object)
+                index.apply([(position, block)])
+                df = pd.concat([df.iloc[:position], block, df.iloc[position:]], ignore_index=True).astype(object)
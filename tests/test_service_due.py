@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from machine_status import SliceIndex
+from service_due import FleetDue
+from sheet_cache import read_workbook, sheet_versions, typed_view
+from sheet_schema import compact_sheets
+from workbook_writer import TrackedSheets, save_sheets
+
+CARD = "Card1"
+
+
+def load(path):
+    """الشيتات الخام (للتحرير) ونسخة التحليل المضغوطة، كما في التطبيق"""
+    raw = read_workbook(path, dtype=object)
+    return raw, compact_sheets(typed_view(raw))
+
+
+def card_versions(path):
+    versions = dict(sheet_versions(path, dtype=object))
+    return {int(name[4:]): version for name, version in versions.items() if name.startswith("Card")}
+
+
+def rebuilt(path):
+    """جدول الاستحقاق محسوباً من الصفر من الملف المحفوظ"""
+    _, sheets = load(path)
+    due = FleetDue(SliceIndex(sheets["ServicePlan"]))
+    due.sync(card_versions(path), lambda num: sheets[f"Card{num}"])
+    return due.table()
+
+
+@pytest.fixture
+def fleet(workbook):
+    _, sheets = load(workbook)
+    due = FleetDue(SliceIndex(sheets["ServicePlan"]))
+    due.sync(card_versions(workbook), lambda num: sheets[f"Card{num}"])
+    return due
+
+
+def new_rows(columns, values):
+    """صفوف مثل تبويب الإضافة: كل الخلايا نصوص والحقول غير المكتوبة "" """
+    rows = pd.DataFrame([{col: "" for col in columns} | row for row in values])
+    return rows.astype(str)
+
+
+@pytest.mark.parametrize("values", [
+    # رينج فارغ (بدون أطنان ولا تاريخ ولا خدمات) ليس حدثاً
+    {"Min_Tones": "1301", "Max_Tones": "1500"},
+    {"Min_Tones": "1501", "Max_Tones": "1650", "Tones": "  ", "Date": " "},
+    {"Min_Tones": "1151", "Max_Tones": "1300", "Tones": "1160", "Date": "1\\5\\2026", "service": "✔"},
+], ids=["blank", "whitespace", "event"])
+def test_update_after_insert_matches_rebuild(workbook, fleet, values):
+    raw, _ = load(workbook)
+    sheets = TrackedSheets(raw)
+    columns = list(raw[CARD].columns)
+    values = {columns[4] if col == "service" else col: value for col, value in values.items()}
+    added = new_rows(columns, [{"card": "1"} | values])
+    old_version = card_versions(workbook)[1]
+    sheets.insert_rows(CARD, len(raw[CARD]), added)
+    save_sheets(workbook, sheets)
+
+    assert fleet.update(1, old_version, card_versions(workbook)[1], added=added)
+    pd.testing.assert_frame_equal(fleet.table(), rebuilt(workbook))
+
+
+def test_update_after_delete_matches_rebuild(workbook, fleet):
+    raw, _ = load(workbook)
+    sheets = TrackedSheets(raw)
+    # حدث مسجل + رينج فارغ (الصف 7 بدون أطنان ولا تاريخ)
+    positions = [1, 7]
+    removed = raw[CARD].iloc[positions]
+    old_version = card_versions(workbook)[1]
+    sheets.delete_rows(CARD, positions)
+    save_sheets(workbook, sheets)
+
+    assert fleet.update(1, old_version, card_versions(workbook)[1], removed=removed)
+    pd.testing.assert_frame_equal(fleet.table(), rebuilt(workbook))
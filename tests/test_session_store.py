@@ -0,0 +1,118 @@
+import threading
+import types
+from datetime import timedelta
+
+import pytest
+
+import session_store
+from session_store import LOGIN_ALREADY_ACTIVE, LOGIN_FULL, LOGIN_OK, SessionStore
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", types.SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return SessionStore(str(tmp_path / "sessions.db"), timedelta(minutes=10), ttl=5.0)
+
+
+# -------------------------------
+# 🔐 تسجيل الدخول والحد الأقصى
+# -------------------------------
+def test_login_respects_the_limit(store):
+    assert store.login("a", max_active=2) == LOGIN_OK
+    assert store.login("a", max_active=2) == LOGIN_ALREADY_ACTIVE
+    assert store.login("b", max_active=2) == LOGIN_OK
+    assert store.login("c", max_active=2) == LOGIN_FULL
+    assert store.active_users() == ["a", "b"]
+
+
+def test_force_skips_the_limit_and_renews(store, clock):
+    store.login("a", max_active=1)
+    assert store.login("admin", max_active=1, force=True) == LOGIN_OK
+    clock.now += 300
+    assert store.login("admin", max_active=1, force=True) == LOGIN_OK
+    assert store.remaining("admin") == timedelta(minutes=10)
+    assert store.active_users() == ["a", "admin"]
+
+
+def test_logout_releases_the_slot(store):
+    store.login("a", max_active=1)
+    assert store.remaining("a") is not None
+    store.logout("a")
+    # الخروج يمسح كاش remaining فوراً (بدون انتظار ttl)
+    assert store.remaining("a") is None
+    assert store.login("b", max_active=1) == LOGIN_OK
+
+
+# -------------------------------
+# ⏰ انتهاء الجلسة وكاش remaining
+# -------------------------------
+def test_sessions_expire_after_duration(store, clock):
+    store.login("a", max_active=1)
+    clock.now += 599
+    assert store.remaining("a") == timedelta(seconds=1)
+    assert store.login("b", max_active=1) == LOGIN_FULL
+    clock.now += 1
+    assert store.remaining("a") is None
+    assert store.active_users() == []
+    # الجلسة المنتهية تُحذف داخل معاملة الدخول نفسها
+    assert store.login("b", max_active=1) == LOGIN_OK
+    assert store.expire() == 0
+
+
+def test_expire_removes_old_rows(store, clock):
+    store.login("a")
+    store.login("b")
+    clock.now += 600
+    assert store.expire() == 2
+    assert store.active_users() == []
+
+
+def test_remaining_is_cached_for_ttl(store, clock):
+    store.login("a", max_active=2)
+    assert store.remaining("a") == timedelta(minutes=10)
+    # عملية أخرى تُخرج المستخدم: الكاش يبقى حتى ttl ثانية ثم يُقرأ من القاعدة
+    SessionStore(store.path, timedelta(minutes=10)).logout("a")
+    clock.now += 5
+    assert store.remaining("a") == timedelta(seconds=595)
+    clock.now += 0.5
+    assert store.remaining("a") is None
+
+
+# -------------------------------
+# 🧵 دخول متزامن (BEGIN IMMEDIATE)
+# -------------------------------
+def test_concurrent_logins_never_exceed_the_limit(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SessionStore(path, timedelta(minutes=10))
+    users = [f"user{i}" for i in range(8)]
+    barrier = threading.Barrier(len(users))
+    results = {}
+
+    def login(username):
+        # متجر لكل خيط = اتصال منفصل مثل العمليات المختلفة
+        store = SessionStore(path, timedelta(minutes=10))
+        barrier.wait()
+        results[username] = store.login(username, max_active=2)
+
+    threads = [threading.Thread(target=login, args=(u,)) for u in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert sorted(results.values()).count(LOGIN_OK) == 2
+    assert set(results.values()) == {LOGIN_OK, LOGIN_FULL}
+    assert len(SessionStore(path, timedelta(minutes=10)).active_users()) == 2
@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+
+import sheet_cache
+from sheet_cache import close_workbooks, read_sheet
+from workbook_writer import TrackedSheets, save_sheets
+
+
+def open_versions(path):
+    return [key for key in sheet_cache._open_workbooks if key[0] == os.path.abspath(path)]
+
+
+def test_close_workbooks_drops_only_stale_versions(workbook):
+    read_sheet(workbook, "Card1", dtype=object)
+    old = open_versions(workbook)
+    assert len(old) == 1
+
+    # نسخة جديدة من الملف (مثل الحفظ أو التحديث من GitHub): تُفتح بجوار القديمة
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    read_sheet(workbook, "Card2", dtype=object)
+    assert len(open_versions(workbook)) == 2
+
+    close_workbooks(workbook)
+    current = open_versions(workbook)
+    assert len(current) == 1 and current != old
+    close_workbooks()
+    assert open_versions(workbook) == []
+
+
+# -------------------------------
+# 📦 كاش القرص: تعديل شيت يعيد بناء pickle الخاص به فقط
+# -------------------------------
+def edit_sheet(path, name, value):
+    """تعديل خلية في شيت واحد وحفظه كما يحفظ التطبيق (الشيتات المعدلة فقط)"""
+    sheets = TrackedSheets(sheet_cache.load_cached_sheets(path, dtype=object))
+    df = sheets[name].copy()
+    df.loc[0, "Tones"] = value
+    sheets[name] = df
+    stat = os.stat(path)
+    save_sheets(path, sheets)
+    # mtime مختلف حتى لو تم الحفظ في نفس الجزء من الثانية
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def pickles(path):
+    cache_dir = sheet_cache._cache_dir_for(path)
+    return {f: os.stat(os.path.join(cache_dir, f)).st_mtime_ns for f in os.listdir(cache_dir) if f.endswith(".pkl")}
+
+
+def spy(monkeypatch, module, name):
+    """تسجيل استدعاءات module.name مع تنفيذها كالمعتاد"""
+    calls = []
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append((args, kwargs))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+
+def test_load_cached_sheets_reparses_only_the_edited_sheet(workbook, monkeypatch):
+    first = sheet_cache.load_cached_sheets(workbook, dtype=object)
+    before_fp = dict(sheet_cache.sheet_fingerprints(workbook, sheet_cache._variant({"dtype": object})))
+    before = pickles(workbook)
+    assert sorted(before) == sorted(f"{fp}.pkl" for fp in before_fp.values())
+
+    edit_sheet(workbook, "Card2", 4321)
+    after_fp = dict(sheet_cache.sheet_fingerprints(workbook, sheet_cache._variant({"dtype": object})))
+    assert [name for name in before_fp if before_fp[name] != after_fp[name]] == ["Card2"]
+
+    reads = spy(monkeypatch, sheet_cache.pd, "read_excel")
+    sheets = sheet_cache.load_cached_sheets(workbook, dtype=object)
+    assert [kwargs["sheet_name"] for _, kwargs in reads] == [["Card2"]]
+    assert sheets["Card2"].loc[0, "Tones"] == 4321
+    for name in first:
+        if name != "Card2":
+            pd.testing.assert_frame_equal(sheets[name], first[name])
+
+    # pickle الشيت القديم يُحذف والجديد يُكتب؛ باقي الملفات لم تُلمس
+    after = pickles(workbook)
+    assert set(before) - set(after) == {f"{before_fp['Card2']}.pkl"}
+    assert set(after) - set(before) == {f"{after_fp['Card2']}.pkl"}
+    assert {f: after[f] for f in before if f in after} == {f: before[f] for f in before if f in after}
+
+    # بدون تعديل: لا تحليل إطلاقاً
+    reads.clear()
+    sheet_cache.load_cached_sheets(workbook, dtype=object)
+    assert reads == []
+
+
+def test_load_sheet_rebuilds_only_the_edited_sheet(workbook, monkeypatch):
+    versions = dict(sheet_cache.sheet_versions(workbook, dtype=object))
+    for name, fp in versions.items():
+        sheet_cache.load_sheet(workbook, name, fp, dtype=object)
+    before = pickles(workbook)
+    assert len(before) == len(versions)
+
+    edit_sheet(workbook, "Card5", 9876)
+    reads = spy(monkeypatch, sheet_cache, "read_sheet")
+    after_versions = dict(sheet_cache.sheet_versions(workbook, dtype=object))
+    assert [name for name in versions if versions[name] != after_versions[name]] == ["Card5"]
+    loaded = {name: sheet_cache.load_sheet(workbook, name, fp, dtype=object) for name, fp in after_versions.items()}
+    assert [args[1] for args, _ in reads] == ["Card5"]
+    assert loaded["Card5"].loc[0, "Tones"] == 9876
+
+    after = pickles(workbook)
+    assert set(after) == {f"{fp}.pkl" for fp in after_versions.values()}
+    assert {f: after[f] for f in before if f in after} == {f: before[f] for f in before if f in after}
+    close_workbooks()
@@ -0,0 +1,83 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import WORKBOOK
+from sheet_cache import read_workbook
+from sheet_pager import filter_positions, merge_page_edits, page_count, page_positions, page_view
+
+
+@pytest.fixture
+def sheet():
+    """Card1 و Card3 من ملف العمل في شيت واحد (كارتان للفلترة)"""
+    sheets = read_workbook(WORKBOOK, dtype=object)
+    return pd.concat([sheets["Card1"], sheets["Card3"]], ignore_index=True).astype(object)
+
+
+def page_two(df, page_size=3, **filters):
+    positions = filter_positions(df, **filters)
+    assert page_count(len(positions), page_size) >= 2
+    return page_view(df, page_positions(positions, 2, page_size))
+
+
+def test_filters_select_card_tons_and_dates(sheet):
+    card = sheet["card"].iloc[-1]
+    positions = filter_positions(sheet, card=str(card))
+    assert (sheet.loc[positions, "card"] == card).all()
+    assert len(positions) == (sheet["card"] == card).sum()
+
+    positions = filter_positions(sheet, min_tons=500, max_tons=800)
+    mins = pd.to_numeric(sheet["Min_Tones"], errors="coerce")
+    maxs = pd.to_numeric(sheet["Max_Tones"], errors="coerce")
+    assert positions.tolist() == np.flatnonzero((mins <= 800) & (maxs >= 500)).tolist()
+
+    positions = filter_positions(sheet, date_from=datetime.date(2025, 1, 1), date_to=datetime.date(2025, 7, 7))
+    years = [str(sheet.loc[p, "Date"]).replace("\\", "/").split("/") for p in positions]
+    assert len(positions) and all(y[-1] == "2025" and int(y[1]) <= 7 for y in years)
+
+
+def test_page_is_clamped_to_last_page():
+    positions = np.arange(10)
+    assert page_positions(positions, 9, 4).tolist() == [8, 9]
+    assert page_positions(positions[:0], 3, 4).tolist() == []
+
+
+def test_edit_filtered_page_two_merges_by_row(sheet):
+    card = str(sheet["card"].iloc[-1])
+    view = page_two(sheet, card=card, min_tons=300)
+    edited = view.copy()
+    first, second = view.index[0], view.index[1]
+    edited.loc[first, "Tones"] = "999"
+
+    out = merge_page_edits(sheet, view, edited)
+    assert out.loc[first, "Tones"] == "999"
+    # باقي الشيت (خارج الصفحة والفلتر) بنفس القيم والأنواع
+    others = sheet.index != first
+    pd.testing.assert_frame_equal(out.loc[others], sheet.loc[others])
+    assert out.loc[second, "Min_Tones"] == sheet.loc[second, "Min_Tones"]
+
+
+def test_delete_and_add_on_filtered_page_two(sheet):
+    view = page_two(sheet, card=str(sheet["card"].iloc[0]))
+    doomed, last = view.index[0], view.index[-1]
+    edited = view.drop(index=doomed)
+    added = pd.DataFrame([{"card": "1", "Min_Tones": "1501", "Max_Tones": "1600"}], index=[10**6])
+    edited = pd.concat([edited, added])
+
+    out = merge_page_edits(sheet, view, edited)
+    assert len(out) == len(sheet)
+    expected = sheet.drop(index=doomed).reset_index(drop=True)
+    new_pos = last  # بعد حذف صف قبله، الصف الجديد يقع مكان last + 1 - 1
+    assert out.loc[new_pos, "Min_Tones"] == "1501"
+    pd.testing.assert_frame_equal(out.drop(index=new_pos).reset_index(drop=True), expected)
+
+
+def test_unchanged_page_returns_none(sheet):
+    view = page_two(sheet, max_tons=1000)
+    assert merge_page_edits(sheet, view, view.copy()) is None
+    # None من المحرر لخلية NaN ليس تعديلاً
+    edited = view.copy()
+    edited[edited == "nan"] = None
+    assert merge_page_edits(sheet, view, edited) is None
@@ -0,0 +1,158 @@
+import datetime
+import shutil
+import zipfile
+
+import pandas as pd
+import pytest
+
+import workbook_writer
+from conftest import WORKBOOK
+from sheet_cache import clean_columns, sheet_fingerprints, sheet_parts
+from workbook_writer import TrackedSheets, save_sheets
+
+
+def read(path):
+    """الشيتات كما يقرؤها التطبيق (dtype=object وأسماء أعمدة منظفة)"""
+    return {name: clean_columns(df) for name, df in pd.read_excel(path, sheet_name=None, dtype=object).items()}
+
+
+def parts(path):
+    """{اسم الشيت: بايتات XML الخاص به}"""
+    with zipfile.ZipFile(path) as zf:
+        return {name: zf.read(part) for name, part in sheet_parts(zf)}
+
+
+@pytest.fixture
+def full_writes(monkeypatch):
+    """استدعاءات الكتابة الكاملة عبر openpyxl (أسماء الشيتات في كل استدعاء)"""
+    calls = []
+    write = workbook_writer.write_workbook
+
+    def spy(path, sheets):
+        calls.append(list(sheets.keys()))
+        write(path, sheets)
+
+    monkeypatch.setattr(workbook_writer, "write_workbook", spy)
+    return calls
+
+
+def edit(sheets, name="Card1"):
+    """تعديل خلية وإضافة صف بنصوص وأرقام (بدون تواريخ)"""
+    df = sheets[name].copy()
+    df.iloc[0, df.columns.get_loc("Tones")] = 7
+    extra = df.iloc[[0]].copy()
+    extra.iloc[0, df.columns.get_loc("Other")] = "ملاحظة <جديدة> & رموز"
+    sheets[name] = pd.concat([df, extra], ignore_index=True)
+    return sheets[name]
+
+
+# -------------------------------
+# ✏ الشيتات المعدلة فقط
+# -------------------------------
+def test_only_dirty_sheets_are_rewritten(workbook, full_writes):
+    before_parts, before_fp = parts(workbook), dict(sheet_fingerprints(workbook))
+    sheets = TrackedSheets(read(workbook))
+    expected = edit(sheets)
+    save_sheets(workbook, sheets)
+
+    assert full_writes == []
+    assert not sheets.dirty
+    after_parts, after_fp = parts(workbook), dict(sheet_fingerprints(workbook))
+    for name in before_parts:
+        if name == "Card1":
+            assert after_fp[name] != before_fp[name]
+        else:
+            assert after_parts[name] == before_parts[name], name
+            assert after_fp[name] == before_fp[name], name
+
+    saved = read(workbook)
+    assert list(saved) == list(sheets)
+    pd.testing.assert_frame_equal(saved["Card1"], expected.astype(object), check_dtype=False)
+    original = read(WORKBOOK)
+    for name in original:
+        if name != "Card1":
+            pd.testing.assert_frame_equal(saved[name], original[name], obj=name)
+
+
+def test_clean_sheets_leave_file_untouched(workbook, full_writes):
+    with open(workbook, "rb") as f:
+        data = f.read()
+    save_sheets(workbook, TrackedSheets(read(workbook)))
+    with open(workbook, "rb") as f:
+        assert f.read() == data
+    assert full_writes == []
+
+
+def test_row_ops_are_saved_in_place(workbook, full_writes):
+    before_fp = dict(sheet_fingerprints(workbook))
+    sheets = TrackedSheets(read(workbook))
+    sheets.insert_rows("Card2", 1, sheets["Card2"].iloc[[3]])
+    sheets.delete_rows("Card2", [0])
+    expected = sheets["Card2"]
+    save_sheets(workbook, sheets)
+
+    assert full_writes == []
+    pd.testing.assert_frame_equal(read(workbook)["Card2"], expected, check_dtype=False)
+    after_fp = dict(sheet_fingerprints(workbook))
+    assert {n: fp for n, fp in after_fp.items() if n != "Card2"} == {n: fp for n, fp in before_fp.items() if n != "Card2"}
+
+
+# -------------------------------
+# 🔁 الرجوع للكتابة الكاملة
+# -------------------------------
+def test_dates_fall_back_to_full_write(workbook, full_writes):
+    sheets = TrackedSheets(read(workbook))
+    df = edit(sheets)
+    df.iloc[0, df.columns.get_loc("Date")] = datetime.datetime(2025, 3, 4, 8, 30)
+    sheets["Card1"] = df
+    save_sheets(workbook, sheets)
+
+    assert len(full_writes) == 1
+    saved = read(workbook)
+    assert list(saved) == list(sheets)
+    assert saved["Card1"]["Date"][0] == datetime.datetime(2025, 3, 4, 8, 30)
+    assert saved["Card1"]["Other"].iloc[-1] == "ملاحظة <جديدة> & رموز"
+
+
+def test_formulas_fall_back_to_full_write(workbook, tmp_path, full_writes):
+    # مصنف فيه calcChain.xml (صيغ): الكتابة الجزئية قد تترك نتائج صيغ قديمة
+    source = tmp_path / "source.xlsx"
+    shutil.move(workbook, source)
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(workbook, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            zout.writestr(info, zin.read(info.filename))
+        zout.writestr("xl/calcChain.xml", '<?xml version="1.0"?><calcChain xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"/>')
+    sheets = TrackedSheets(read(workbook))
+    expected = edit(sheets)
+    save_sheets(workbook, sheets)
+
+    assert len(full_writes) == 1
+    pd.testing.assert_frame_equal(read(workbook)["Card1"], expected.astype(object), check_dtype=False)
+
+
+@pytest.mark.parametrize("change", ["add", "delete", "rename"])
+def test_sheet_list_change_falls_back_to_full_write(workbook, full_writes, change):
+    sheets = TrackedSheets(read(workbook))
+    if change == "add":
+        sheets["Card99"] = sheets["Card1"].head(2)
+    elif change == "delete":
+        del sheets["Card2"]
+    else:
+        sheets["Card2 old"] = sheets["Card2"]
+        del sheets["Card2"]
+    expected = {name: df for name, df in sheets.items()}
+    save_sheets(workbook, sheets)
+
+    assert len(full_writes) == 1
+    saved = read(workbook)
+    assert list(saved) == list(expected)
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(saved[name], df.reset_index(drop=True), check_dtype=False, obj=name)
+
+
+def test_missing_file_is_written_in_full(tmp_path, workbook, full_writes):
+    sheets = read(workbook)
+    target = str(tmp_path / "new.xlsx")
+    save_sheets(target, TrackedSheets(sheets))
+    assert len(full_writes) == 1
+    assert list(read(target)) == list(sheets)
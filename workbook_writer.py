@@ -0,0 +1,274 @@
+import datetime
+import os
+import re
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from sheet_cache import sheet_parts
+
+# حروف غير مسموحة في XML (نفس ما يرفضه openpyxl)
+_ILLEGAL_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_FOOTER = "</sheetData></worksheet>"
+
+
+class _NeedsFullWrite(Exception):
+    """الشيت يحتاج كتابة كاملة عبر openpyxl (تواريخ، صيغ، تغيير في قائمة الشيتات...)"""
+
+
+# -------------------------------
+# 📝 تتبع الشيتات المعدلة
+# -------------------------------
+class TrackedSheets(dict):
+    """dict للشيتات يسجل أسماء الشيتات التي تم تعيينها (dirty)
+
+    insert_rows / delete_rows تسجل أيضاً العملية نفسها في row_ops، فالمخزن
+    الذي يدعم التعديل على مستوى الصف (record_store) لا يعيد كتابة الشيت كله.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = set()
+        self.row_ops = {}
+
+    def __setitem__(self, name, df):
+        super().__setitem__(name, df)
+        self.dirty.add(name)
+        self.row_ops.pop(name, None)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.dirty.add(name)
+        self.row_ops.pop(name, None)
+
+    def _record(self, name, df, *ops):
+        recorded = self.row_ops.get(name) if name in self.dirty else []
+        super().__setitem__(name, df)
+        if recorded is not None:
+            self.row_ops[name] = recorded + list(ops)
+        self.dirty.add(name)
+
+    def insert_rows(self, name, position, rows):
+        """إدراج صفوف rows (DataFrame) قبل الصف رقم position"""
+        self.insert_many(name, [(position, rows)])
+
+    def insert_many(self, name, blocks):
+        """إدراج عدة كتل [(position, rows)] في مرور واحد
+
+        المواضع محسوبة على الشيت قبل الإدراج؛ الكتل في نفس الموضع تبقى بترتيبها.
+        """
+        df = self[name].reset_index(drop=True)
+        blocks = sorted(
+            ((max(0, min(int(position), len(df))), rows.reset_index(drop=True).reindex(columns=df.columns))
+             for position, rows in blocks),
+            key=lambda block: block[0],
+        )
+        parts, start = [], 0
+        for position, rows in blocks:
+            parts += [df.iloc[start:position], rows.astype(object)]
+            start = position
+        parts.append(df.iloc[start:])
+        new_df = pd.concat(parts, ignore_index=True)
+        # من الأعلى للأدنى: كل عملية تبقى صحيحة بمواضع الشيت الأصلي
+        self._record(name, new_df, *[("insert", position, rows) for position, rows in reversed(blocks)])
+
+    def delete_rows(self, name, positions):
+        """حذف الصفوف بأرقامها (0 = أول صف)"""
+        df = self[name].reset_index(drop=True)
+        positions = sorted({int(p) for p in positions if 0 <= int(p) < len(df)})
+        self._record(name, df.drop(positions).reset_index(drop=True), ("delete", positions))
+
+    def mark_clean(self):
+        self.dirty.clear()
+        self.row_ops.clear()
+
+
+class _Unloaded:
+    """قيمة مكان شيت لم يُحمّل بعد (أو أُخرج من الذاكرة)"""
+
+
+_UNLOADED = _Unloaded()
+
+
+class LazySheets(TrackedSheets):
+    """TrackedSheets تُحمّل كل شيت عند أول طلب فقط، مع حد للذاكرة
+
+    loader(name) يرجع الشيت. إذا تجاوز حجم الشيتات المحملة budget_bytes
+    تُخرج الشيتات غير المعدلة الأقدم استخداماً (وتُحمّل مرة أخرى عند طلبها)،
+    أما المعدلة فتبقى حتى الحفظ.
+    """
+
+    def __init__(self, names, loader, budget_bytes=None):
+        super().__init__((name, _UNLOADED) for name in names)
+        self._loader = loader
+        self._budget = budget_bytes
+        self._sizes = {}  # name -> حجم الشيت المحمل بالبايت (بترتيب آخر استخدام)
+
+    def __getitem__(self, name):
+        df = super().__getitem__(name)
+        if df is _UNLOADED:
+            df = self._loader(name)
+            dict.__setitem__(self, name, df)
+            self._sizes[name] = int(df.memory_usage(deep=True).sum())
+            self._evict(keep=name)
+        elif name in self._sizes:
+            self._sizes[name] = self._sizes.pop(name)
+        return df
+
+    def __setitem__(self, name, df):
+        super().__setitem__(name, df)
+        self._sizes.pop(name, None)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._sizes.pop(name, None)
+
+    def _record(self, name, df, *ops):
+        super()._record(name, df, *ops)
+        self._sizes.pop(name, None)
+
+    def _evict(self, keep):
+        if self._budget is None:
+            return
+        for name in list(self._sizes):
+            if sum(self._sizes.values()) <= self._budget:
+                break
+            if name != keep and name not in self.dirty:
+                dict.__setitem__(self, name, _UNLOADED)
+                del self._sizes[name]
+
+    def loaded(self):
+        """أسماء الشيتات الموجودة في الذاكرة الآن"""
+        return [name for name, df in dict.items(self) if df is not _UNLOADED]
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+# -------------------------------
+# 💾 الكتابة الذرية
+# -------------------------------
+def _atomic_target(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".~", suffix=".xlsx", dir=directory)
+    os.close(fd)
+    return tmp
+
+def _replace(tmp, path):
+    try:
+        os.replace(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
+
+def write_workbook(path, sheets):
+    """كتابة جميع الشيتات إلى ملف Excel (ملف مؤقت ثم إعادة تسمية ذرية)"""
+    tmp = _atomic_target(path)
+    try:
+        with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+            for name, sh in sheets.items():
+                try:
+                    sh.to_excel(writer, sheet_name=name, index=False)
+                except Exception:
+                    sh.astype(object).to_excel(writer, sheet_name=name, index=False)
+    except Exception:
+        os.remove(tmp)
+        raise
+    _replace(tmp, path)
+
+
+# -------------------------------
+# ✏ إعادة كتابة الشيتات المعدلة فقط
+# -------------------------------
+def _col_letter(i):
+    letters = ""
+    i += 1
+    while i:
+        i, rem = divmod(i - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _cell_xml(ref, value):
+    if value is None:
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}"><v>{int(value)}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return ""
+        if np.isfinite(value):
+            return f'<c r="{ref}"><v>{float(value)!r}</v></c>'
+    elif isinstance(value, (datetime.date, datetime.time, datetime.timedelta, np.datetime64, np.timedelta64)):
+        raise _NeedsFullWrite("date/time cell")
+    elif value is pd.NaT or value is pd.NA:
+        return ""
+    text = escape(_ILLEGAL_XML_RE.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def sheet_xml(df):
+    """XML ورقة عمل بنصوص inline (لا تمس جدول sharedStrings المشترك)"""
+    letters = [_col_letter(i) for i in range(len(df.columns))]
+    out = [_SHEET_HEADER, '<row r="1">']
+    out.extend(_cell_xml(f"{c}1", str(name)) for c, name in zip(letters, df.columns))
+    out.append("</row>")
+    for r, values in enumerate(df.itertuples(index=False, name=None), start=2):
+        out.append(f'<row r="{r}">')
+        out.extend(_cell_xml(f"{c}{r}", v) for c, v in zip(letters, values))
+        out.append("</row>")
+    out.append(_SHEET_FOOTER)
+    return "".join(out).encode("utf-8")
+
+def _write_dirty_sheets(path, sheets, dirty):
+    with zipfile.ZipFile(path) as zin:
+        names = zin.namelist()
+        if "xl/calcChain.xml" in names:
+            raise _NeedsFullWrite("workbook has formulas")
+        parts = sheet_parts(zin)
+        if [name for name, _ in parts] != list(sheets.keys()):
+            raise _NeedsFullWrite("sheet list changed")
+        new_parts = {part: sheet_xml(sheets[name]) for name, part in parts if name in dirty}
+
+        tmp = _atomic_target(path)
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    data = new_parts.get(info.filename)
+                    zout.writestr(info, data if data is not None else zin.read(info.filename))
+        except Exception:
+            os.remove(tmp)
+            raise
+    _replace(tmp, path)
+
+def save_sheets(path, sheets, dirty=None):
+    """حفظ الشيتات: إعادة كتابة الشيتات المعدلة فقط إن أمكن، وإلا كتابة كاملة
+
+    dirty: أسماء الشيتات المعدلة (افتراضياً sheets.dirty إن وجد، وإلا كل الشيتات).
+    """
+    if dirty is None:
+        dirty = getattr(sheets, "dirty", None)
+    if dirty is not None and os.path.exists(path):
+        if not dirty:
+            return
+        try:
+            _write_dirty_sheets(path, sheets, set(dirty))
+        except (_NeedsFullWrite, KeyError, zipfile.BadZipFile):
+            write_workbook(path, sheets)
+    else:
+        write_workbook(path, sheets)
+    if isinstance(sheets, TrackedSheets):
+        sheets.mark_clean()